@@ -0,0 +1,326 @@
+# ai_client.py
+# Shared Groq client with a resilience layer: per-call deadlines, bounded
+# retries with jittered backoff for retryable errors, a circuit breaker that
+# fails fast while Groq is degraded, and a concurrency limit so AI calls can
+# never tie up every worker thread.
+
+import asyncio
+import os
+import random
+import threading
+import time
+import logging
+import groq
+from groq import Groq, AsyncGroq
+import ai_telemetry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "llama3-8b-8192"
+
+# Timeout for a single attempt, and overall deadline including retries (seconds)
+AI_TIMEOUT_SECONDS = float(os.getenv("AI_TIMEOUT_SECONDS", 20))
+AI_DEADLINE_SECONDS = float(os.getenv("AI_DEADLINE_SECONDS", 45))
+# Retries after the first attempt, and full-jitter exponential backoff bounds
+AI_MAX_RETRIES = int(os.getenv("AI_MAX_RETRIES", 2))
+AI_BACKOFF_BASE_SECONDS = float(os.getenv("AI_BACKOFF_BASE_SECONDS", 0.5))
+AI_BACKOFF_MAX_SECONDS = float(os.getenv("AI_BACKOFF_MAX_SECONDS", 4))
+# Consecutive failures that open the breaker, and how long it stays open
+AI_BREAKER_THRESHOLD = int(os.getenv("AI_BREAKER_THRESHOLD", 5))
+AI_BREAKER_RESET_SECONDS = float(os.getenv("AI_BREAKER_RESET_SECONDS", 30))
+# Maximum concurrent upstream calls per process, and how long a caller may
+# wait for a free slot before failing fast
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", 8))
+AI_QUEUE_TIMEOUT_SECONDS = float(os.getenv("AI_QUEUE_TIMEOUT_SECONDS", 2))
+# Maximum concurrent upstream calls per process from async handlers (asgi.py).
+# Waiting calls hold no thread, so this can be much higher
+AI_ASYNC_MAX_CONCURRENCY = int(os.getenv("AI_ASYNC_MAX_CONCURRENCY", 256))
+
+# Errors worth retrying: timeouts, connection failures, 429s and 5xxs
+RETRYABLE_ERRORS = (
+  groq.APIConnectionError,
+  groq.RateLimitError,
+  groq.InternalServerError,
+)
+
+# Raised when the AI call cannot be made or did not succeed in time
+class AIUnavailableError(Exception):
+  def __init__(self, message, retry_after=None):
+    super().__init__(message)
+    self.retry_after = retry_after
+
+class CircuitBreaker:
+  CLOSED = "closed"
+  OPEN = "open"
+  HALF_OPEN = "half_open"
+
+  def __init__(self, failure_threshold, reset_timeout):
+    self.failure_threshold = failure_threshold
+    self.reset_timeout = reset_timeout
+    self.state = self.CLOSED
+    self.consecutive_failures = 0
+    self.opened_at = 0.0
+    self.times_opened = 0
+    self._probe_in_flight = False
+    self._lock = threading.Lock()
+
+  # Whether a call may go upstream now. While open, a single probe is let
+  # through once reset_timeout has elapsed
+  def allow_request(self):
+    with self._lock:
+      if self.state == self.CLOSED:
+        return True
+      if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+        self.state = self.HALF_OPEN
+        self._probe_in_flight = False
+      if self.state == self.HALF_OPEN and not self._probe_in_flight:
+        self._probe_in_flight = True
+        return True
+      return False
+
+  def record_success(self):
+    with self._lock:
+      self.state = self.CLOSED
+      self.consecutive_failures = 0
+      self._probe_in_flight = False
+
+  def record_failure(self):
+    with self._lock:
+      self.consecutive_failures += 1
+      if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+        if self.state != self.OPEN:
+          self.times_opened += 1
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self._probe_in_flight = False
+
+  # The call let through neither succeeded nor failed in a way that says
+  # anything about Groq's health (e.g. a 400). If it was the half-open probe,
+  # let the next call probe instead
+  def release_probe(self):
+    with self._lock:
+      if self.state == self.HALF_OPEN:
+        self._probe_in_flight = False
+
+  # Seconds until the breaker lets a probe through
+  def retry_after(self):
+    with self._lock:
+      if self.state != self.OPEN:
+        return 0
+      return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+  def snapshot(self):
+    with self._lock:
+      return {
+        "state": self.state,
+        "consecutive_failures": self.consecutive_failures,
+        "times_opened": self.times_opened,
+      }
+
+breaker = CircuitBreaker(AI_BREAKER_THRESHOLD, AI_BREAKER_RESET_SECONDS)
+_slots = threading.BoundedSemaphore(AI_MAX_CONCURRENCY)
+_client = None
+_client_lock = threading.Lock()
+# Async client and slots, bound to the event loop that first uses them
+_async_client = None
+_async_slots = None
+_stats_lock = threading.Lock()
+_stats = {
+  "calls": 0,
+  "succeeded": 0,
+  "failed": 0,
+  "retries": 0,
+  "rejected_breaker_open": 0,
+  "rejected_saturated": 0,
+  "in_flight": 0,
+}
+
+def _count(key, amount=1):
+  with _stats_lock:
+    _stats[key] += amount
+
+# Lazily create one Groq client per process. Retries are handled here, so the
+# SDK's own retry loop is disabled
+def get_client():
+  global _client
+  with _client_lock:
+    if _client is None:
+      _client = Groq(api_key=os.getenv("GROQ_KEY"), max_retries=0, timeout=AI_TIMEOUT_SECONDS)
+    return _client
+
+def get_async_client():
+  global _async_client
+  if _async_client is None:
+    _async_client = AsyncGroq(api_key=os.getenv("GROQ_KEY"), max_retries=0, timeout=AI_TIMEOUT_SECONDS)
+  return _async_client
+
+def get_async_slots():
+  global _async_slots
+  if _async_slots is None:
+    _async_slots = asyncio.BoundedSemaphore(AI_ASYNC_MAX_CONCURRENCY)
+  return _async_slots
+
+# Drop the shared clients (and their connection pools), e.g. after a fork
+def reset_client():
+  global _client, _async_client, _async_slots
+  with _client_lock:
+    _client = None
+    _async_client = None
+    _async_slots = None
+
+def backoff_delay(attempt):
+  return random.uniform(0, min(AI_BACKOFF_MAX_SECONDS, AI_BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+# Honour Retry-After on 429s when the server sends one
+def retry_after_seconds(error):
+  response = getattr(error, "response", None)
+  if response is None:
+    return None
+  try:
+    return float(response.headers.get("retry-after"))
+  except (TypeError, ValueError):
+    return None
+
+# Classify a failed call for telemetry
+def failure_outcome(error):
+  if isinstance(error, groq.APITimeoutError):
+    return "timeout"
+  if isinstance(error, groq.RateLimitError):
+    return "rate_limited"
+  return "error"
+
+# Record a finished call, reading token usage and upstream timings from the
+# response's usage field when there is one
+def record_telemetry(endpoint, user, model, outcome, start, queue_s, response=None):
+  total_s = time.monotonic() - start
+  usage = getattr(response, "usage", None)
+  ttft_s = None
+  prompt_tokens = completion_tokens = 0
+  if usage is not None:
+    prompt_tokens = usage.prompt_tokens or 0
+    completion_tokens = usage.completion_tokens or 0
+    queue_s += getattr(usage, "queue_time", None) or 0
+    # Non-streaming: tokens started arriving once everything but the
+    # completion phase had elapsed
+    completion_time = getattr(usage, "completion_time", None)
+    if completion_time is not None:
+      ttft_s = max(0.0, total_s - completion_time)
+  ai_telemetry.record_call(endpoint, user, model, outcome, queue_s, ttft_s, total_s,
+                           prompt_tokens, completion_tokens)
+
+# Create a chat completion through the resilience layer. Raises
+# AIUnavailableError if the breaker is open, no slot frees up in time, or every
+# attempt failed; non-retryable API errors are raised as-is.
+# endpoint and user label the call in ai_telemetry
+def create_chat_completion(messages, model=DEFAULT_MODEL, endpoint="unknown", user=None, **kwargs):
+  _count("calls")
+  start = time.monotonic()
+  if not _slots.acquire(timeout=AI_QUEUE_TIMEOUT_SECONDS):
+    _count("rejected_saturated")
+    record_telemetry(endpoint, user, model, "rejected_saturated", start, time.monotonic() - start)
+    raise AIUnavailableError("AI service is at capacity", AI_QUEUE_TIMEOUT_SECONDS)
+  queue_s = time.monotonic() - start
+  # Checked after taking a slot so a half-open probe is never stranded waiting
+  if not breaker.allow_request():
+    _slots.release()
+    _count("rejected_breaker_open")
+    record_telemetry(endpoint, user, model, "rejected_open", start, queue_s)
+    raise AIUnavailableError("AI service temporarily unavailable", breaker.retry_after())
+
+  _count("in_flight")
+  try:
+    deadline = time.monotonic() + AI_DEADLINE_SECONDS
+    attempt = 0
+    while True:
+      remaining = deadline - time.monotonic()
+      try:
+        response = get_client().with_options(timeout=min(AI_TIMEOUT_SECONDS, remaining)).chat.completions.create(
+          messages=messages, model=model, **kwargs
+        )
+        breaker.record_success()
+        _count("succeeded")
+        record_telemetry(endpoint, user, model, "ok", start, queue_s, response)
+        return response
+      except RETRYABLE_ERRORS as e:
+        breaker.record_failure()
+        delay = retry_after_seconds(e) or backoff_delay(attempt)
+        if attempt >= AI_MAX_RETRIES or time.monotonic() + delay >= deadline or not breaker.allow_request():
+          _count("failed")
+          record_telemetry(endpoint, user, model, failure_outcome(e), start, queue_s)
+          logger.warning("AI call failed after %d attempt(s): %s", attempt + 1, e)
+          raise AIUnavailableError("AI service failed to respond", breaker.retry_after() or None) from e
+        attempt += 1
+        _count("retries")
+        time.sleep(delay)
+      except Exception:
+        breaker.release_probe()
+        _count("failed")
+        record_telemetry(endpoint, user, model, "error", start, queue_s)
+        raise
+  finally:
+    _count("in_flight", -1)
+    _slots.release()
+
+# Async variant of create_chat_completion for the ASGI handlers. Shares the
+# breaker, counters and telemetry with the sync path
+async def acreate_chat_completion(messages, model=DEFAULT_MODEL, endpoint="unknown", user=None, **kwargs):
+  _count("calls")
+  start = time.monotonic()
+  slots = get_async_slots()
+  try:
+    await asyncio.wait_for(slots.acquire(), AI_QUEUE_TIMEOUT_SECONDS)
+  except asyncio.TimeoutError:
+    _count("rejected_saturated")
+    record_telemetry(endpoint, user, model, "rejected_saturated", start, time.monotonic() - start)
+    raise AIUnavailableError("AI service is at capacity", AI_QUEUE_TIMEOUT_SECONDS)
+  queue_s = time.monotonic() - start
+  if not breaker.allow_request():
+    slots.release()
+    _count("rejected_breaker_open")
+    record_telemetry(endpoint, user, model, "rejected_open", start, queue_s)
+    raise AIUnavailableError("AI service temporarily unavailable", breaker.retry_after())
+
+  _count("in_flight")
+  try:
+    deadline = time.monotonic() + AI_DEADLINE_SECONDS
+    attempt = 0
+    while True:
+      remaining = deadline - time.monotonic()
+      try:
+        response = await get_async_client().with_options(timeout=min(AI_TIMEOUT_SECONDS, remaining)).chat.completions.create(
+          messages=messages, model=model, **kwargs
+        )
+        breaker.record_success()
+        _count("succeeded")
+        record_telemetry(endpoint, user, model, "ok", start, queue_s, response)
+        return response
+      except RETRYABLE_ERRORS as e:
+        breaker.record_failure()
+        delay = retry_after_seconds(e) or backoff_delay(attempt)
+        if attempt >= AI_MAX_RETRIES or time.monotonic() + delay >= deadline or not breaker.allow_request():
+          _count("failed")
+          record_telemetry(endpoint, user, model, failure_outcome(e), start, queue_s)
+          logger.warning("AI call failed after %d attempt(s): %s", attempt + 1, e)
+          raise AIUnavailableError("AI service failed to respond", breaker.retry_after() or None) from e
+        attempt += 1
+        _count("retries")
+        await asyncio.sleep(delay)
+      except asyncio.CancelledError:
+        # The client went away mid-call
+        breaker.release_probe()
+        raise
+      except Exception:
+        breaker.release_probe()
+        _count("failed")
+        record_telemetry(endpoint, user, model, "error", start, queue_s)
+        raise
+  finally:
+    _count("in_flight", -1)
+    slots.release()
+
+def get_stats():
+  with _stats_lock:
+    stats = dict(_stats)
+  stats["breaker"] = breaker.snapshot()
+  stats["max_concurrency"] = AI_MAX_CONCURRENCY
+  return stats
@@ -0,0 +1,197 @@
+# ai_output.py
+# Validation and local repair of LLM output. Generations are parsed
+# tolerantly (code fences, trailing text, truncated JSON, alternative key
+# names) and validated against the pydantic models in helpers, so a slightly
+# malformed response no longer costs the user another multi-second LLM call.
+
+import json
+import re
+import threading
+from pydantic import ValidationError
+from helpers import ProjectIdea, TasksLists
+
+# Alternative key names seen in generations, mapped to the schema's names
+PROJECT_IDEA_KEYS = {
+  "title": "project_title",
+  "project_name": "project_title",
+  "name": "project_title",
+  "projecttitle": "project_title",
+  "summary": "description",
+  "project_description": "description",
+  "technologies": "languages",
+  "tech_stack": "languages",
+  "languages_technologies": "languages",
+  "project_steps": "steps",
+  "scale_up": "scale_up_ideas",
+  "scaling_ideas": "scale_up_ideas",
+  "scale_ups": "scale_up_ideas",
+  "scaleupideas": "scale_up_ideas",
+}
+TASKS_LISTS_KEYS = {
+  "tasks_list": "tasks_lists",
+  "task_lists": "tasks_lists",
+  "taskslists": "tasks_lists",
+  "task_list": "tasks_lists",
+  "steps": "tasks_lists",
+}
+TASK_LIST_KEYS = {
+  "step": "title",
+  "name": "title",
+  "step_title": "title",
+  "task_list": "tasks",
+  "tasks_list": "tasks",
+  "items": "tasks",
+  "subtasks": "tasks",
+}
+
+CODE_FENCE = re.compile(r"^```[a-zA-Z]*\s*|\s*```\s*$")
+TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+# Raised when output cannot be repaired into the expected schema
+class AIOutputError(ValueError):
+  pass
+
+_stats_lock = threading.Lock()
+# clean: valid as generated, repaired: fixed locally, failed: not repairable,
+# rejected_upstream: Groq refused the output as invalid JSON (see below)
+_stats = {"clean": 0, "repaired": 0, "failed": 0, "reprompted": 0, "rejected_upstream": 0}
+
+def count(outcome):
+  with _stats_lock:
+    _stats[outcome] += 1
+
+def get_stats():
+  with _stats_lock:
+    return dict(_stats)
+
+# The output Groq rejected in JSON mode. Output that fails its JSON check comes
+# back as a 400 error (code json_validate_failed) carrying the text as
+# failed_generation, instead of as a completion. None for any other error
+def failed_generation(error):
+  body = getattr(error, "body", None)
+  if not isinstance(body, dict):
+    return None
+  detail = body.get("error", body)
+  if isinstance(detail, dict) and detail.get("code") == "json_validate_failed":
+    return detail.get("failed_generation")
+  return None
+
+# Close a JSON document cut off mid-generation: finish an open string, drop a
+# dangling key or separator, and close every open object/array
+def close_truncated_json(text):
+  stack = []
+  in_string = False
+  escaped = False
+  for char in text:
+    if in_string:
+      if escaped:
+        escaped = False
+      elif char == "\\":
+        escaped = True
+      elif char == '"':
+        in_string = False
+    elif char == '"':
+      in_string = True
+    elif char in "{[":
+      stack.append("}" if char == "{" else "]")
+    elif char in "}]" and stack:
+      stack.pop()
+  if in_string:
+    text += '"'
+  text = text.rstrip()
+  # A trailing separator, or an object key with no value, cannot be completed
+  text = re.sub(r'(,|:|,\s*"[^"]*"\s*:?|\{\s*"[^"]*"\s*:?)$',
+                lambda m: "{" if m.group(0).startswith("{") else "", text)
+  return text + "".join(reversed(stack))
+
+# Find and decode the JSON object in a generation. Returns (object, repaired)
+def extract_json(text):
+  text = CODE_FENCE.sub("", text.strip())
+  try:
+    return json.loads(text, strict=False), False
+  except json.JSONDecodeError:
+    pass
+  start = min((i for i in (text.find("{"), text.find("[")) if i >= 0), default=-1)
+  if start < 0:
+    raise AIOutputError("No JSON found in output")
+  candidate = text[start:]
+  # strict=False accepts raw newlines inside strings
+  decoder = json.JSONDecoder(strict=False)
+  # Complete document followed by trailing text
+  try:
+    return decoder.raw_decode(candidate)[0], True
+  except json.JSONDecodeError:
+    pass
+  # Trailing commas and/or truncation
+  for attempt in (TRAILING_COMMA.sub(r"\1", candidate), close_truncated_json(candidate)):
+    try:
+      return decoder.raw_decode(TRAILING_COMMA.sub(r"\1", attempt))[0], True
+    except json.JSONDecodeError:
+      continue
+  raise AIOutputError("Output is not repairable JSON")
+
+def normalize_key(key):
+  return re.sub(r"[\s\-/]+", "_", key.strip().lower())
+
+def rename_keys(obj, aliases):
+  if not isinstance(obj, dict):
+    return obj, False
+  renamed = {}
+  changed = False
+  for key, value in obj.items():
+    new_key = normalize_key(key)
+    new_key = aliases.get(new_key, aliases.get(new_key.replace("_", ""), new_key))
+    changed = changed or new_key != key
+    renamed.setdefault(new_key, value)
+  return renamed, changed
+
+def parse_project_idea(text):
+  try:
+    obj, repaired = extract_json(text)
+    # Some generations wrap the idea, e.g. {"project": {...}}
+    if isinstance(obj, dict) and len(obj) == 1 and isinstance(next(iter(obj.values())), dict):
+      obj, repaired = next(iter(obj.values())), True
+    obj, renamed = rename_keys(obj, PROJECT_IDEA_KEYS)
+    idea = ProjectIdea.model_validate(obj)
+  except (AIOutputError, ValidationError) as e:
+    count("failed")
+    raise AIOutputError(f"Invalid project idea: {e}") from e
+  count("repaired" if repaired or renamed else "clean")
+  return idea
+
+# Parse task generation output into a list of {'title', 'tasks'} dicts
+def parse_tasks_lists(text):
+  try:
+    obj, repaired = extract_json(text)
+    if isinstance(obj, list):
+      obj, repaired = {"tasks_lists": obj}, True
+    obj, renamed = rename_keys(obj, TASKS_LISTS_KEYS)
+    tasks_lists = obj.get("tasks_lists")
+    if isinstance(tasks_lists, dict):
+      # {"Step 1": [...], "Step 2": [...]}
+      tasks_lists = [{"title": title, "tasks": tasks} for title, tasks in tasks_lists.items()]
+      renamed = True
+    if isinstance(tasks_lists, list):
+      normalized = []
+      for tasks_list in tasks_lists:
+        if isinstance(tasks_list, list):
+          tasks_list, changed = {"tasks": tasks_list}, True
+        else:
+          tasks_list, changed = rename_keys(tasks_list, TASK_LIST_KEYS)
+        renamed = renamed or changed
+        # Entries cut off before their tasks (truncated output) are dropped
+        if isinstance(tasks_list, dict) and "tasks" not in tasks_list:
+          repaired = True
+          continue
+        normalized.append(tasks_list)
+      obj["tasks_lists"] = normalized
+    result = TasksLists.model_validate(obj)
+    # Only asked for with steps to fill, so no tasks at all is a failed
+    # generation, not an empty plan
+    if not any(tasks_list.tasks for tasks_list in result.tasks_lists):
+      raise AIOutputError("No tasks in output")
+  except (AIOutputError, ValidationError, AttributeError) as e:
+    count("failed")
+    raise AIOutputError(f"Invalid tasks lists: {e}") from e
+  count("repaired" if repaired or renamed else "clean")
+  return [tasks_list.model_dump() for tasks_list in result.tasks_lists]
@@ -0,0 +1,144 @@
+# ai_telemetry.py
+# In-process aggregation of AI call telemetry: latency histograms (queue,
+# time-to-first-token, total), token counters and estimated cost, broken down
+# by endpoint/model/outcome and by user.
+
+import os
+import threading
+
+# Histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, float("inf"))
+
+# USD per million tokens, used for cost estimates (Groq llama3-8b-8192 list prices)
+AI_PRICE_PROMPT_PER_MTOK = float(os.getenv("AI_PRICE_PROMPT_PER_MTOK", 0.05))
+AI_PRICE_COMPLETION_PER_MTOK = float(os.getenv("AI_PRICE_COMPLETION_PER_MTOK", 0.08))
+# Distinct users tracked individually; the rest are aggregated as OTHER_USER
+AI_TELEMETRY_MAX_USERS = int(os.getenv("AI_TELEMETRY_MAX_USERS", 1000))
+OTHER_USER = "__other__"
+
+class Histogram:
+  def __init__(self, buckets=LATENCY_BUCKETS):
+    self.buckets = buckets
+    self.counts = [0] * len(buckets)
+    self.count = 0
+    self.sum = 0.0
+
+  def observe(self, value):
+    self.count += 1
+    self.sum += value
+    for i, bound in enumerate(self.buckets):
+      if value <= bound:
+        self.counts[i] += 1
+        break
+
+  # Upper bound of the bucket containing the given quantile. The last bucket
+  # is unbounded and reported as "+Inf", since JSON has no infinity
+  def quantile(self, q):
+    if not self.count:
+      return None
+    target = q * self.count
+    seen = 0
+    for bound, count in zip(self.buckets, self.counts):
+      seen += count
+      if seen >= target:
+        break
+    return "+Inf" if bound == float("inf") else bound
+
+  def to_dict(self):
+    return {
+      "count": self.count,
+      "sum": round(self.sum, 4),
+      "buckets": {("+Inf" if b == float("inf") else str(b)): c for b, c in zip(self.buckets, self.counts)},
+      "p50_le": self.quantile(0.5),
+      "p95_le": self.quantile(0.95),
+    }
+
+def estimate_cost(prompt_tokens, completion_tokens):
+  return (prompt_tokens * AI_PRICE_PROMPT_PER_MTOK + completion_tokens * AI_PRICE_COMPLETION_PER_MTOK) / 1_000_000
+
+class CallSeries:
+  def __init__(self):
+    self.calls = 0
+    self.prompt_tokens = 0
+    self.completion_tokens = 0
+    self.cost_usd = 0.0
+    self.queue = Histogram()
+    self.ttft = Histogram()
+    self.total = Histogram()
+
+  def add(self, queue_s, ttft_s, total_s, prompt_tokens, completion_tokens):
+    self.calls += 1
+    self.prompt_tokens += prompt_tokens
+    self.completion_tokens += completion_tokens
+    self.cost_usd += estimate_cost(prompt_tokens, completion_tokens)
+    self.queue.observe(queue_s)
+    if ttft_s is not None:
+      self.ttft.observe(ttft_s)
+    self.total.observe(total_s)
+
+  def to_dict(self, histograms=True):
+    data = {
+      "calls": self.calls,
+      "prompt_tokens": self.prompt_tokens,
+      "completion_tokens": self.completion_tokens,
+      "cost_usd": round(self.cost_usd, 6),
+      "total_seconds": round(self.total.sum, 4),
+    }
+    if histograms:
+      data["queue_seconds"] = self.queue.to_dict()
+      data["ttft_seconds"] = self.ttft.to_dict()
+      data["total_seconds_histogram"] = self.total.to_dict()
+    return data
+
+_lock = threading.Lock()
+# (endpoint, model, outcome) -> CallSeries
+_by_endpoint = {}
+# user -> CallSeries
+_by_user = {}
+# Hooks called with each recorded call's fields (e.g. metrics exporters)
+_listeners = []
+
+def add_listener(listener):
+  _listeners.append(listener)
+
+# Record one AI call
+#   endpoint: logical prompt name (e.g. 'brainstorm', 'taskgen')
+#   outcome:  'ok', 'error', 'timeout', 'rate_limited', 'rejected_open', ...
+#   queue_s:  time spent waiting before the request was processed (local slot
+#             wait plus upstream queue time reported by Groq)
+#   ttft_s:   time until the first completion token, None if unknown
+#   total_s:  wall-clock time of the whole call, retries included
+def record_call(endpoint, user, model, outcome, queue_s, ttft_s, total_s,
+                prompt_tokens=0, completion_tokens=0):
+  user = user or "anonymous"
+  with _lock:
+    series = _by_endpoint.get((endpoint, model, outcome))
+    if series is None:
+      series = _by_endpoint[(endpoint, model, outcome)] = CallSeries()
+    series.add(queue_s, ttft_s, total_s, prompt_tokens, completion_tokens)
+
+    if user not in _by_user and len(_by_user) >= AI_TELEMETRY_MAX_USERS:
+      user = OTHER_USER
+    user_series = _by_user.get(user)
+    if user_series is None:
+      user_series = _by_user[user] = CallSeries()
+    user_series.add(queue_s, ttft_s, total_s, prompt_tokens, completion_tokens)
+
+  for listener in _listeners:
+    listener(endpoint, user, model, outcome, queue_s, ttft_s, total_s, prompt_tokens, completion_tokens)
+
+# Export aggregated telemetry. Users are sorted by cost and limited to top_users
+def snapshot(top_users=50):
+  with _lock:
+    endpoints = [
+      {"endpoint": endpoint, "model": model, "outcome": outcome, **series.to_dict()}
+      for (endpoint, model, outcome), series in sorted(_by_endpoint.items())
+    ]
+    users = sorted(_by_user.items(), key=lambda item: item[1].cost_usd, reverse=True)[:top_users]
+    users = [{"user": user, **series.to_dict(histograms=False)} for user, series in users]
+  return {"endpoints": endpoints, "users": users}
+
+def reset():
+  with _lock:
+    _by_endpoint.clear()
+    _by_user.clear()
@@ -1,13 +1,25 @@
 # app.py
 import os
+import threading
 import redis
-from flask import Flask
+from flask import Flask, jsonify
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from flask_bcrypt import Bcrypt
 from flask_mail import Mail
 from datetime import timedelta
 from dotenv import load_dotenv
+from idea_index import IdeaIndex
+from password_hasher import PasswordHasher, PasswordHasherBusyError
+from revocation_cache import RevocationCache
+from email_outbox import EmailOutbox
+from task_writes import TaskWrites
+from mail_renderer import MailRenderer
+from project_events import ProjectEventHub
+import log_pipeline
+import query_stats
+import metrics
+import profiler
 
 # Load environment variables
 load_dotenv() 
@@ -21,6 +33,23 @@ jwt = JWTManager()
 # Create mail object
 mail = Mail()
 
+# Bounded Redis connection pool for one database. `timeout` overrides the
+# connect, socket and pool wait timeouts, e.g. for latency-critical lookups
+def make_redis_pool(config, db, timeout=None):
+    return redis.BlockingConnectionPool(
+        host=config['REDIS_HOST'],
+        port=config['REDIS_PORT'],
+        db=db,
+        decode_responses=True,
+        max_connections=config['REDIS_MAX_CONNECTIONS'],
+        timeout=timeout or config['REDIS_POOL_TIMEOUT_SECONDS'],
+        socket_connect_timeout=timeout or config['REDIS_CONNECT_TIMEOUT_SECONDS'],
+        socket_timeout=timeout or config['REDIS_SOCKET_TIMEOUT_SECONDS'],
+        socket_keepalive=True,
+        health_check_interval=config['REDIS_HEALTH_CHECK_SECONDS'],
+        retry_on_timeout=True
+    )
+
 def create_app():  
     app = Flask(__name__)
 
@@ -30,6 +59,7 @@ def create_app():
         r'/user/*': {'origins': os.getenv("FRONTEND")},
         r'/register': {'origins': os.getenv("FRONTEND")},
         r'/api/prompt': {'origins': os.getenv("FRONTEND")},
+        r'/api/ai/*': {'origins': os.getenv("FRONTEND")},
         r'/login': {'origins': os.getenv("FRONTEND")},
         r'/logout': {'origins': os.getenv("FRONTEND")},
         r'/token/*': {'origins': os.getenv("FRONTEND")},
@@ -38,21 +68,188 @@ def create_app():
         r'/task': {'origins': os.getenv("FRONTEND")},
         r'/task/*': {'origins': os.getenv("FRONTEND")},
         r'/confirm/*': {'origins': os.getenv("FRONTEND")},
+        r'/admin/*': {'origins': os.getenv("FRONTEND")},
+        r'/sync': {'origins': os.getenv("FRONTEND")},
         r'/get_csrf_tokens': {'origins': os.getenv("FRONTEND")}
     }, supports_credentials=True)
     
     app.config['FRONTEND_URL'] = os.getenv("FRONTEND")
+    # Comma-separated usernames allowed to use the admin/observability endpoints
+    app.config['ADMIN_USERS'] = {
+        name.strip() for name in os.getenv("ADMIN_USERS", "").split(",") if name.strip()
+    }
     app.config['ITSDANGEROUS_SECRET_KEY'] = os.getenv("ITSDANGEROUS_SECRET_KEY")
     app.config['ITSDANGEROUS_PASSWORD_SALT'] = os.getenv("ITSDANGEROUS_PASSWORD_SALT")
     
+    # Leave background threads to the server's post-fork hook (gunicorn.conf.py)
+    app.config['DEFER_BACKGROUND_WORKERS'] = os.getenv("DEFER_BACKGROUND_WORKERS", "false").lower() == "true"
+    
+    # Logging (see log_pipeline.py): level for all modules, per-module
+    # overrides ("query_stats=WARNING,ai_client=DEBUG") and json/text output
+    app.config['LOG_LEVEL'] = os.getenv("LOG_LEVEL", "INFO").upper()
+    app.config['LOG_LEVELS'] = os.getenv("LOG_LEVELS", "")
+    app.config['LOG_FORMAT'] = os.getenv("LOG_FORMAT", "json")
+    # Records waiting for the writer thread; beyond this they are dropped
+    app.config['LOG_QUEUE_SIZE'] = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+    # Warnings/errors logged per call site every LOG_RATE_LIMIT_SECONDS (0: no limit)
+    app.config['LOG_RATE_LIMIT'] = int(os.getenv("LOG_RATE_LIMIT", 10))
+    app.config['LOG_RATE_LIMIT_SECONDS'] = float(os.getenv("LOG_RATE_LIMIT_SECONDS", 60))
+    # Log every request with its status and duration
+    app.config['LOG_REQUESTS'] = os.getenv("LOG_REQUESTS", "false").lower() == "true"
+    
+    # Per-request SQL statistics (Server-Timing header, logs, N+1 warnings)
+    app.config['QUERY_STATS_ENABLED'] = os.getenv("QUERY_STATS_ENABLED", "true").lower() == "true"
+    # Warn when one statement runs more than this many times in a request
+    app.config['QUERY_REPEAT_WARN_THRESHOLD'] = int(os.getenv("QUERY_REPEAT_WARN_THRESHOLD", 10))
+    
+    # Prometheus metrics at /metrics (see metrics.py)
+    app.config['METRICS_ENABLED'] = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    # Seconds between copies of pool and cache stats into the metrics
+    app.config['METRICS_SYNC_SECONDS'] = float(os.getenv("METRICS_SYNC_SECONDS", 5))
+    # Bearer token required to scrape /metrics (unset: local scrapes only)
+    app.config['METRICS_TOKEN'] = os.getenv("METRICS_TOKEN")
+    # Serve /metrics to anyone when no token is set. Explicit opt-in
+    app.config['METRICS_PUBLIC'] = os.getenv("METRICS_PUBLIC", "false").lower() == "true"
+    
+    # Sampling profiler (see profiler.py). Off unless PROFILER_ENABLED is set
+    app.config['PROFILER_ENABLED'] = os.getenv("PROFILER_ENABLED", "false").lower() == "true"
+    # Fraction of requests to profile, e.g. 0.01
+    app.config['PROFILER_SAMPLE_RATE'] = float(os.getenv("PROFILER_SAMPLE_RATE", 0))
+    # Requests sending this value in an X-Profile header are always profiled
+    app.config['PROFILER_TOKEN'] = os.getenv("PROFILER_TOKEN")
+    app.config['PROFILER_INTERVAL_MS'] = float(os.getenv("PROFILER_INTERVAL_MS", 5))
+    app.config['PROFILER_FLUSH_SECONDS'] = float(os.getenv("PROFILER_FLUSH_SECONDS", 10))
+    # Distinct stacks kept per endpoint between flushes, and frames per stack
+    app.config['PROFILER_MAX_STACKS'] = int(os.getenv("PROFILER_MAX_STACKS", 2000))
+    app.config['PROFILER_MAX_DEPTH'] = int(os.getenv("PROFILER_MAX_DEPTH", 64))
+    app.config['PROFILER_TTL_SECONDS'] = int(os.getenv("PROFILER_TTL_SECONDS", 86400))
+    
+    # Task generation mode for new projects: 'single' or 'per-step'
+    app.config['TASKGEN_MODE'] = os.getenv("TASKGEN_MODE", "single")
+    # Maximum concurrent per-step task generation requests (shared by all requests)
+    app.config['TASKGEN_MAX_WORKERS'] = int(os.getenv("TASKGEN_MAX_WORKERS", 4))
+    # Number of project steps sent in each per-step request
+    app.config['TASKGEN_GROUP_SIZE'] = int(os.getenv("TASKGEN_GROUP_SIZE", 1))
+    
+    # bcrypt work factor for new password hashes; existing hashes with a
+    # different cost are upgraded on the next successful login
+    app.config['BCRYPT_LOG_ROUNDS'] = int(os.getenv("BCRYPT_LOG_ROUNDS", 12))
+    # Process pool for password hashing/verification: worker processes,
+    # maximum queued operations, and seconds a request waits for a result
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+    app.config['PASSWORD_HASH_MAX_QUEUE'] = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", 64))
+    app.config['PASSWORD_HASH_TIMEOUT_SECONDS'] = float(os.getenv("PASSWORD_HASH_TIMEOUT_SECONDS", 10))
+    
+    # Warm pool of pre-generated brainstorm ideas for popular input combinations
+    app.config['IDEA_POOL_ENABLED'] = os.getenv("IDEA_POOL_ENABLED", "false").lower() == "true"
+    # Ideas kept ready per combination, and how many combinations are kept warm
+    app.config['IDEA_POOL_DEPTH'] = int(os.getenv("IDEA_POOL_DEPTH", 3))
+    app.config['IDEA_POOL_TOP_N'] = int(os.getenv("IDEA_POOL_TOP_N", 20))
+    # Seconds a pre-generated idea may be served after it was generated
+    app.config['IDEA_POOL_TTL_SECONDS'] = int(os.getenv("IDEA_POOL_TTL_SECONDS", 86400))
+    # Upstream calls per minute the refill worker may spend (all processes)
+    app.config['IDEA_POOL_RATE_PER_MINUTE'] = int(os.getenv("IDEA_POOL_RATE_PER_MINUTE", 10))
+    app.config['IDEA_POOL_INTERVAL_SECONDS'] = int(os.getenv("IDEA_POOL_INTERVAL_SECONDS", 30))
+    # Sampling temperature for pooled ideas, so ideas for one combination differ
+    app.config['IDEA_POOL_TEMPERATURE'] = float(os.getenv("IDEA_POOL_TEMPERATURE", 0.8))
+    
+    # Redis server and connection pool settings (per process, per database)
+    app.config['REDIS_HOST'] = os.getenv("REDIS_HOST", "localhost")
+    app.config['REDIS_PORT'] = int(os.getenv("REDIS_PORT", 6379))
+    app.config['REDIS_MAX_CONNECTIONS'] = int(os.getenv("REDIS_MAX_CONNECTIONS", 32))
+    # Seconds to wait for a free pooled connection before failing
+    app.config['REDIS_POOL_TIMEOUT_SECONDS'] = float(os.getenv("REDIS_POOL_TIMEOUT_SECONDS", 2))
+    app.config['REDIS_CONNECT_TIMEOUT_SECONDS'] = float(os.getenv("REDIS_CONNECT_TIMEOUT_SECONDS", 1))
+    app.config['REDIS_SOCKET_TIMEOUT_SECONDS'] = float(os.getenv("REDIS_SOCKET_TIMEOUT_SECONDS", 2))
+    # Idle seconds after which a pooled connection is PINGed before reuse
+    app.config['REDIS_HEALTH_CHECK_SECONDS'] = int(os.getenv("REDIS_HEALTH_CHECK_SECONDS", 30))
+    
+    # Keep a local copy of the token blocklist, updated over Redis pub/sub, so
+    # authenticated requests do not each need a Redis round-trip
+    app.config['REVOCATION_CACHE_ENABLED'] = os.getenv("REVOCATION_CACHE_ENABLED", "true").lower() == "true"
+    # Seconds between full reloads of the local blocklist copy
+    app.config['REVOCATION_RESYNC_SECONDS'] = int(os.getenv("REVOCATION_RESYNC_SECONDS", 300))
+    # Timeout for blocklist lookups made while handling a request. When Redis
+    # fails, checks are answered from the local copy for REVOCATION_RETRY_SECONDS
+    # before Redis is tried again
+    app.config['REVOCATION_LOOKUP_TIMEOUT_MS'] = int(os.getenv("REVOCATION_LOOKUP_TIMEOUT_MS", 100))
+    app.config['REVOCATION_RETRY_SECONDS'] = float(os.getenv("REVOCATION_RETRY_SECONDS", 5))
+    
+    # Live project/task changes at /project/<id>/events (see project_events.py)
+    app.config['EVENTS_ENABLED'] = os.getenv("EVENTS_ENABLED", "true").lower() == "true"
+    # Events buffered per stream before the client is told to resync instead
+    app.config['EVENTS_QUEUE_SIZE'] = int(os.getenv("EVENTS_QUEUE_SIZE", 100))
+    app.config['EVENTS_HEARTBEAT_SECONDS'] = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", 15))
+    # Open streams per process; each holds a server thread (or greenlet)
+    app.config['EVENTS_MAX_STREAMS'] = int(os.getenv("EVENTS_MAX_STREAMS", 4))
+    # Open streams per process under asgi.py, where idle streams hold no thread
+    app.config['EVENTS_ASYNC_MAX_STREAMS'] = int(os.getenv("EVENTS_ASYNC_MAX_STREAMS", 2000))
+    # Seconds before a stream is closed (the browser reconnects)
+    app.config['EVENTS_MAX_SECONDS'] = int(os.getenv("EVENTS_MAX_SECONDS", 300))
+    
+    # Delta sync (GET /sync): changes returned per call, days of changes kept
+    # by `flask prune-changes`, and how old a change must be before a cursor
+    # moves past it (transactions may commit out of id order)
+    app.config['SYNC_MAX_CHANGES'] = int(os.getenv("SYNC_MAX_CHANGES", 5000))
+    app.config['SYNC_RETENTION_DAYS'] = int(os.getenv("SYNC_RETENTION_DAYS", 30))
+    app.config['SYNC_SETTLE_SECONDS'] = int(os.getenv("SYNC_SETTLE_SECONDS", 5))
+    
+    # Acknowledge task status/priority updates once they are in Redis and
+    # write them to MySQL in batches every TASK_WRITES_FLUSH_MS (see task_writes.py)
+    app.config['TASK_WRITES_COALESCE'] = os.getenv("TASK_WRITES_COALESCE", "false").lower() == "true"
+    app.config['TASK_WRITES_FLUSH_MS'] = int(os.getenv("TASK_WRITES_FLUSH_MS", 500))
+    # Updates applied per MySQL transaction
+    app.config['TASK_WRITES_BATCH_SIZE'] = int(os.getenv("TASK_WRITES_BATCH_SIZE", 500))
+    # Queued updates beyond which writes go straight to MySQL
+    app.config['TASK_WRITES_MAX_PENDING'] = int(os.getenv("TASK_WRITES_MAX_PENDING", 50000))
+    # Redis replicas that must confirm a queued update (WAIT) within
+    # TASK_WRITES_WAIT_MS before it is acknowledged; 0 trusts the primary
+    app.config['TASK_WRITES_WAIT_REPLICAS'] = int(os.getenv("TASK_WRITES_WAIT_REPLICAS", 0))
+    app.config['TASK_WRITES_WAIT_MS'] = int(os.getenv("TASK_WRITES_WAIT_MS", 50))
+    # Seconds a task's project and owner are cached for authorization
+    app.config['TASK_WRITES_OWNER_TTL_SECONDS'] = int(os.getenv("TASK_WRITES_OWNER_TTL_SECONDS", 300))
+    
+    # GET /user/export (see export_stream.py): rows read per fetch from the
+    # server-side cursor, bytes per response chunk, gzip level (when the
+    # client accepts gzip), and exports streamed at once per process; each
+    # holds a database connection until the download ends
+    app.config['EXPORT_FETCH_ROWS'] = int(os.getenv("EXPORT_FETCH_ROWS", 1000))
+    app.config['EXPORT_CHUNK_BYTES'] = int(os.getenv("EXPORT_CHUNK_BYTES", 65536))
+    app.config['EXPORT_GZIP_LEVEL'] = int(os.getenv("EXPORT_GZIP_LEVEL", 6))
+    app.config['EXPORT_MAX_STREAMS'] = int(os.getenv("EXPORT_MAX_STREAMS", 2))
+    
+    # POST /project/import and `flask import-projects` (see bulk_import.py):
+    # projects per transaction, largest upload, and how long the progress
+    # report is kept
+    app.config['IMPORT_BATCH_SIZE'] = int(os.getenv("IMPORT_BATCH_SIZE", 200))
+    app.config['IMPORT_MAX_BYTES'] = int(os.getenv("IMPORT_MAX_BYTES", 50 * 1024 * 1024))
+    app.config['IMPORT_PROGRESS_TTL_SECONDS'] = int(os.getenv("IMPORT_PROGRESS_TTL_SECONDS", 3600))
+    
+    # Memory-mapped similarity index over past project ideas
+    app.config['IDEA_INDEX_DIR'] = os.getenv("IDEA_INDEX_DIR", "data/idea_index")
+    app.config['IDEA_INDEX_DIM'] = int(os.getenv("IDEA_INDEX_DIM", 256))
+    # Minimum cosine similarity for /api/prompt to offer an existing idea
+    app.config['IDEA_SIMILARITY_THRESHOLD'] = float(os.getenv("IDEA_SIMILARITY_THRESHOLD", 0.35))
+    
     # Set up flask mail
-    app.config['MAIL_SERVER'] = 'smtp.gmail.com'
-    app.config['MAIL_PORT'] = 587
-    app.config['MAIL_USE_TLS'] = True
+    app.config['MAIL_SERVER'] = os.getenv("MAIL_SERVER", 'smtp.gmail.com')
+    app.config['MAIL_PORT'] = int(os.getenv("MAIL_PORT", 587))
+    app.config['MAIL_USE_TLS'] = os.getenv("MAIL_USE_TLS", "true").lower() == "true"
     app.config['MAIL_USE_SSL'] = False
     app.config['MAIL_USERNAME'] = os.getenv("MAIL_USERNAME")
     app.config['MAIL_PASSWORD'] = os.getenv("MAIL_PASSWORD")
     app.config['MAIL_DEFAULT_SENDER'] = os.getenv("MAIL_USERNAME")
+    # Queue outgoing email in Redis and send it from a background worker
+    app.config['MAIL_OUTBOX_ENABLED'] = os.getenv("MAIL_OUTBOX_ENABLED", "true").lower() == "true"
+    # Messages sent per batch over one SMTP session
+    app.config['MAIL_OUTBOX_BATCH_SIZE'] = int(os.getenv("MAIL_OUTBOX_BATCH_SIZE", 50))
+    # Delivery attempts before a message is set aside, and the first retry delay
+    app.config['MAIL_OUTBOX_MAX_ATTEMPTS'] = int(os.getenv("MAIL_OUTBOX_MAX_ATTEMPTS", 5))
+    app.config['MAIL_OUTBOX_RETRY_SECONDS'] = int(os.getenv("MAIL_OUTBOX_RETRY_SECONDS", 30))
+    # Idle seconds before the SMTP connection is closed
+    app.config['MAIL_OUTBOX_IDLE_SECONDS'] = int(os.getenv("MAIL_OUTBOX_IDLE_SECONDS", 60))
+    # SMTP socket timeout while sending; the sender lock outlives it by 10s
+    app.config['MAIL_OUTBOX_SEND_TIMEOUT_SECONDS'] = int(os.getenv("MAIL_OUTBOX_SEND_TIMEOUT_SECONDS", 20))
     
     # Setup the Flask-JWT-Extended extension
     app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY")
@@ -79,12 +276,99 @@ def create_app():
     # Explicitly set separate path for refresh tokens
     app.config['JWT_REFRESH_COOKIE_PATH'] = '/' 
     
-    # Create Redis client instance
+    # Create Redis client instance over an explicitly sized connection pool.
+    # Requests wait up to REDIS_POOL_TIMEOUT_SECONDS for a free connection
+    # instead of opening unbounded new ones
     #   decode_response=True -> tells Redis to return strings rather than bytes
     app.blocklist = redis.StrictRedis(
-        host="localhost", port=6379, db=0, decode_responses=True
+        connection_pool=make_redis_pool(app.config, db=0)
+    )
+    # Local copy of the blocklist consulted by token_in_blocklist
+    app.revocations = RevocationCache(
+        app.blocklist,
+        resync_seconds=app.config['REVOCATION_RESYNC_SECONDS'],
+        enabled=app.config['REVOCATION_CACHE_ENABLED'],
+        lookup_client=redis.StrictRedis(connection_pool=make_redis_pool(
+            app.config, db=0, timeout=app.config['REVOCATION_LOOKUP_TIMEOUT_MS'] / 1000
+        )),
+        retry_seconds=app.config['REVOCATION_RETRY_SECONDS']
+    )
+    # Separate Redis database for caches (idea pool, etc.) so they never mix
+    # with blocklisted JTIs
+    app.cache = redis.StrictRedis(
+        connection_pool=make_redis_pool(app.config, db=1)
+    )
+    # Dedicated process pool for bcrypt work
+    app.password_hasher = PasswordHasher(
+        rounds=app.config['BCRYPT_LOG_ROUNDS'],
+        max_workers=app.config['PASSWORD_HASH_WORKERS'],
+        max_queue=app.config['PASSWORD_HASH_MAX_QUEUE'],
+        timeout=app.config['PASSWORD_HASH_TIMEOUT_SECONDS']
+    )
+    
+    # Password work is queued; when the queue is full, fail fast rather than
+    # tying up the worker
+    @app.errorhandler(PasswordHasherBusyError)
+    def password_hasher_busy(e):
+        # 503 Service Unavailable: Too many logins/registrations in flight
+        response = jsonify({"error": "Server busy, please try again"})
+        response.headers['Retry-After'] = "1"
+        return response, 503
+    
+    # Local similarity index over previously generated project ideas
+    app.idea_index = IdeaIndex(
+        app.config['IDEA_INDEX_DIR'], dim=app.config['IDEA_INDEX_DIM']
     )
+    # Confirmation token serializer and precompiled email templates
+    app.mail_renderer = MailRenderer(app)
+    # Outgoing email queue; the sender is started in main.py
+    app.outbox = None
+    if app.config['MAIL_OUTBOX_ENABLED']:
+        app.outbox = EmailOutbox(
+            app, app.cache,
+            batch_size=app.config['MAIL_OUTBOX_BATCH_SIZE'],
+            max_attempts=app.config['MAIL_OUTBOX_MAX_ATTEMPTS'],
+            retry_seconds=app.config['MAIL_OUTBOX_RETRY_SECONDS'],
+            idle_timeout=app.config['MAIL_OUTBOX_IDLE_SECONDS'],
+            send_timeout=app.config['MAIL_OUTBOX_SEND_TIMEOUT_SECONDS']
+        )
+    # Fan-out of published project changes to this process's event streams
+    app.project_events = None
+    if app.config['EVENTS_ENABLED']:
+        app.project_events = ProjectEventHub(
+            app.cache,
+            queue_size=app.config['EVENTS_QUEUE_SIZE'],
+            heartbeat_seconds=app.config['EVENTS_HEARTBEAT_SECONDS'],
+            max_streams=app.config['EVENTS_MAX_STREAMS'],
+            max_seconds=app.config['EVENTS_MAX_SECONDS']
+        )
+    # Coalesced task status/priority writes; the flusher is started in main.py
+    app.task_writes = None
+    if app.config['TASK_WRITES_COALESCE']:
+        app.task_writes = TaskWrites(
+            app, app.cache,
+            flush_ms=app.config['TASK_WRITES_FLUSH_MS'],
+            batch_size=app.config['TASK_WRITES_BATCH_SIZE'],
+            max_pending=app.config['TASK_WRITES_MAX_PENDING'],
+            wait_replicas=app.config['TASK_WRITES_WAIT_REPLICAS'],
+            wait_ms=app.config['TASK_WRITES_WAIT_MS'],
+            owner_ttl=app.config['TASK_WRITES_OWNER_TTL_SECONDS']
+        )
+    # Free export slots in this process
+    app.export_slots = threading.BoundedSemaphore(app.config['EXPORT_MAX_STREAMS'])
+    # Warm pool of pre-generated brainstorm ideas; created in main.py when
+    # IDEA_POOL_ENABLED is set
+    app.idea_pool = None
     
+    # Structured logging through a background writer; request ids
+    log_pipeline.init_app(app)
+    # Time SQL statements per request
+    query_stats.init_app(app)
+    # Opt-in sampling profiler
+    profiler.init_app(app)
+    # Request, database, Redis and AI metrics
+    if app.config['METRICS_ENABLED']:
+        metrics.init_app(app)
     # Initialize JWT with the app
     jwt.init_app(app)
     # Initialize bcrypt with the app
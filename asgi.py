@@ -0,0 +1,117 @@
+# asgi.py
+# Async serving mode:
+#   hypercorn asgi:app --bind 0.0.0.0:8000 --workers 2
+#
+# The I/O-bound routes (AI prompts, project creation, project and task reads
+# and writes) are served by async handlers (routes/async_routes.py), which use
+# aiomysql, redis.asyncio and the async Groq client, so a request waiting on
+# an upstream holds no thread. Every other route is still the Flask app,
+# run on a thread pool behind hypercorn's WSGI adapter. Both share one
+# process, so they share the idea index, revocation cache and idea pool.
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import redis.asyncio as aioredis
+from hypercorn.middleware import AsyncioWSGIMiddleware
+from quart import Quart, request
+from werkzeug.exceptions import HTTPException
+from main import app as flask_app
+from async_db import close_async_pool
+from project_events import AsyncProjectEventHub
+from routes.async_routes import async_bp
+import ai_client
+
+quart_app = Quart(__name__)
+# Share the Flask app's settings, without replacing Quart's own defaults
+quart_app.config.update({
+  key: value for key, value in flask_app.config.items() if key not in quart_app.config
+})
+# JWT decoding runs in the Flask app's context (see jwt_required_async)
+quart_app.flask_app = flask_app
+quart_app.idea_index = flask_app.idea_index
+quart_app.revocations = flask_app.revocations
+quart_app.idea_pool = flask_app.idea_pool
+quart_app.cache = flask_app.cache
+quart_app.task_writes = flask_app.task_writes
+quart_app.register_blueprint(async_bp)
+
+# Threads for the Flask (WSGI) routes and for blocking calls made from async
+# handlers (asyncio.to_thread)
+ASGI_WSGI_THREADS = int(os.getenv("ASGI_WSGI_THREADS", 32))
+# Largest request body accepted by the Flask routes
+ASGI_WSGI_MAX_BODY_BYTES = int(os.getenv("ASGI_WSGI_MAX_BODY_BYTES", 1024 * 1024))
+
+@quart_app.before_serving
+async def open_clients():
+  asyncio.get_running_loop().set_default_executor(
+    ThreadPoolExecutor(max_workers=ASGI_WSGI_THREADS, thread_name_prefix="wsgi")
+  )
+  # Async clients belong to the serving loop; drop any created at import
+  ai_client.reset_client()
+  quart_app.async_blocklist = aioredis.StrictRedis(
+    host=quart_app.config['REDIS_HOST'],
+    port=quart_app.config['REDIS_PORT'],
+    db=0,
+    decode_responses=True,
+    max_connections=quart_app.config['REDIS_MAX_CONNECTIONS'],
+    # Only used for blocklist lookups: same strict timeout as the sync ones
+    socket_connect_timeout=quart_app.config['REVOCATION_LOOKUP_TIMEOUT_MS'] / 1000,
+    socket_timeout=quart_app.config['REVOCATION_LOOKUP_TIMEOUT_MS'] / 1000,
+  )
+
+  # Live project events for the async stream handler, with their own
+  # subscription on the serving loop
+  quart_app.async_project_events = None
+  if quart_app.config['EVENTS_ENABLED']:
+    quart_app.async_project_events = AsyncProjectEventHub(
+      aioredis.StrictRedis(
+        host=quart_app.config['REDIS_HOST'],
+        port=quart_app.config['REDIS_PORT'],
+        db=1,
+        decode_responses=True,
+        socket_connect_timeout=quart_app.config['REDIS_CONNECT_TIMEOUT_SECONDS'],
+      ),
+      queue_size=quart_app.config['EVENTS_QUEUE_SIZE'],
+      heartbeat_seconds=quart_app.config['EVENTS_HEARTBEAT_SECONDS'],
+      max_streams=quart_app.config['EVENTS_ASYNC_MAX_STREAMS'],
+      max_seconds=quart_app.config['EVENTS_MAX_SECONDS'],
+    )
+
+@quart_app.after_serving
+async def close_clients():
+  await quart_app.async_blocklist.aclose()
+  if quart_app.async_project_events:
+    await quart_app.async_project_events.stop()
+    await quart_app.async_project_events.client.aclose()
+  await close_async_pool()
+
+# Same CORS policy as the Flask app (preflight requests are answered by Flask)
+@quart_app.after_request
+async def add_cors_headers(response):
+  origin = request.headers.get('Origin')
+  if origin and origin == quart_app.config['FRONTEND_URL']:
+    response.headers['Access-Control-Allow-Origin'] = origin
+    response.headers['Access-Control-Allow-Credentials'] = 'true'
+    response.headers['Vary'] = 'Origin'
+  return response
+
+wsgi_app = AsyncioWSGIMiddleware(flask_app, max_body_size=ASGI_WSGI_MAX_BODY_BYTES)
+async_routes = quart_app.url_map.bind("localhost")
+
+# True if the request is handled by an async route
+def is_async_route(scope):
+  if scope["method"] == "OPTIONS":
+    return False
+  try:
+    async_routes.match(scope["path"], scope["method"])
+    return True
+  except HTTPException:
+    return False
+
+# ASGI entry point: lifespan and async routes go to Quart, the rest to Flask
+async def app(scope, receive, send):
+  if scope["type"] == "lifespan" or (scope["type"] == "http" and is_async_route(scope)):
+    await quart_app(scope, receive, send)
+  else:
+    await wsgi_app(scope, receive, send)
@@ -0,0 +1,53 @@
+# async_db.py
+# aiomysql connection pool for the async handlers (asgi.py). Uses the same
+# settings as db.get_db_connection. The pool is created on first use, inside
+# the event loop that serves requests.
+
+import logging
+import os
+import aiomysql
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+
+async def get_async_pool():
+  global _pool
+  if _pool is None:
+    _pool = await aiomysql.create_pool(
+      user=os.getenv("ADMIN_USER"),
+      password=os.getenv("ADMIN_PASSWORD"),
+      host=os.getenv("ENDPOINT"),
+      port=int(os.getenv("DB_PORT", 3306)),
+      db=os.getenv("DB_NAME"),
+      minsize=1,
+      maxsize=int(os.getenv("ASYNC_DB_POOL_SIZE", 20)),
+      # Recycle connections before MySQL's wait_timeout closes them
+      pool_recycle=3600,
+      # Each statement commits on its own; handlers that need several writes
+      # to be atomic wrap them in connection.begin()/commit(). (aiomysql closes
+      # connections returned to the pool mid-transaction, so reads must not
+      # leave one open)
+      autocommit=True,
+    )
+  return _pool
+
+async def close_async_pool():
+  global _pool
+  if _pool is not None:
+    _pool.close()
+    await _pool.wait_closed()
+    _pool = None
+
+# A pooled connection, or None if the database is unreachable. Give it back
+# with release_async_connection
+async def get_async_connection():
+  try:
+    pool = await get_async_pool()
+    return await pool.acquire()
+  except Exception as e:
+    logger.error("MySQL error: %s", e)
+  return None
+
+def release_async_connection(connection):
+  _pool.release(connection)
@@ -0,0 +1,120 @@
+# bench_ai.py
+# Drive /api/prompt and /project/create against a running app and report
+# throughput and latency percentiles. Intended to run against the mock Groq
+# server (see mock_groq.py) so AI path changes can be measured offline:
+#
+#   GROQ_BASE_URL=http://127.0.0.1:8089 GROQ_KEY=mock flask run
+#   python bench/bench_ai.py --mock-port 8089 --latency lognormal:-0.5,0.4
+#
+# Each worker logs in as its own benchmark user; every project created by the
+# benchmark is deleted again, outside the timed section, so the per-user
+# project limit is never reached.
+
+import argparse
+import json
+import random
+import requests
+import time
+from loadgen import run_load, print_report
+from mock_groq import MockGroqConfig, start_mock_groq
+
+ROLES = ["Frontend Developer", "Backend Developer", "Data Scientist", "Game Developer"]
+TECHNOLOGIES = ["Python", "React", "Flask", "MySQL", "Unity", "TensorFlow"]
+INDUSTRIES = ["Healthcare", "Finance", "Education", "Entertainment"]
+
+# Log a benchmark user in, registering it first if needed. Returns a session
+# carrying the JWT cookies
+def login_session(base_url, username, password):
+  session = requests.Session()
+  session.post(f"{base_url}/register", json={
+    "email": f"{username}@bench.local", "username": username, "password": password
+  })
+  response = session.post(f"{base_url}/login", json={"username": username, "password": password})
+  response.raise_for_status()
+  return session
+
+# JWT cookies are CSRF protected; echo the CSRF cookie back as a header
+def csrf_headers(session):
+  return {"X-CSRF-TOKEN": session.cookies.get("csrf_access_token", "")}
+
+def random_prompt_inputs():
+  return {
+    "role": random.sample(ROLES, random.randint(1, 2)),
+    "technology": random.sample(TECHNOLOGIES, random.randint(1, 3)),
+    "industries": [random.choice(INDUSTRIES)],
+  }
+
+def sample_project(steps):
+  return {
+    "title": "Benchmark project",
+    "summary": "Project created by bench_ai.py",
+    "languages": random.sample(TECHNOLOGIES, 2),
+    "steps": [f"Step {i}: implement part {i}" for i in range(1, steps + 1)],
+  }
+
+def main():
+  parser = argparse.ArgumentParser(description="Benchmark the AI-backed routes")
+  parser.add_argument("--base-url", default="http://127.0.0.1:5000")
+  parser.add_argument("--endpoint", choices=["prompt", "create", "both"], default="both")
+  parser.add_argument("--concurrency", type=int, default=8)
+  parser.add_argument("--requests", type=int, default=100)
+  parser.add_argument("--steps", type=int, default=6, help="Steps per created project")
+  parser.add_argument("--user-prefix", default="bench_ai_user")
+  parser.add_argument("--password", default="bench-password")
+  parser.add_argument("--mock-port", type=int, default=None,
+                      help="Also start the mock Groq server on this port")
+  parser.add_argument("--latency", default="fixed:0.5", help="Mock latency distribution")
+  parser.add_argument("--error-rate", type=float, default=0.0)
+  parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+  parser.add_argument("--json", action="store_true", help="Print results as JSON")
+  args = parser.parse_args()
+
+  mock = None
+  if args.mock_port is not None:
+    mock, mock_url = start_mock_groq(
+      MockGroqConfig(latency=args.latency, error_rate=args.error_rate,
+                     rate_limit_rate=args.rate_limit_rate),
+      port=args.mock_port,
+    )
+    print(f"Mock Groq running at {mock_url}")
+
+  sessions = [
+    login_session(args.base_url, f"{args.user_prefix}_{i}", args.password)
+    for i in range(args.concurrency)
+  ]
+
+  def prompt_task(worker, iteration):
+    session = sessions[worker]
+    response = session.post(f"{args.base_url}/api/prompt", json=random_prompt_inputs(),
+                            headers=csrf_headers(session))
+    return response.status_code == 200 and bool(json.loads(response.json()["response"]))
+
+  def create_task(worker, iteration):
+    session = sessions[worker]
+    start = time.perf_counter()
+    response = session.post(f"{args.base_url}/project/create", json=sample_project(args.steps),
+                            headers=csrf_headers(session))
+    duration = time.perf_counter() - start
+    if response.status_code != 201:
+      return False
+    session.delete(f"{args.base_url}/project/{response.json()['id']}/delete",
+                   headers=csrf_headers(session))
+    return duration
+
+  results = {}
+  if args.endpoint in ("prompt", "both"):
+    results["/api/prompt"] = run_load(prompt_task, args.concurrency, args.requests)
+  if args.endpoint in ("create", "both"):
+    results["/project/create"] = run_load(create_task, args.concurrency, args.requests)
+
+  if args.json:
+    print(json.dumps(results, indent=2))
+  else:
+    for name, summary in results.items():
+      print_report(name, summary)
+  if mock:
+    print(f"Mock stats: {mock.config.stats}")
+    mock.shutdown()
+
+if __name__ == "__main__":
+  main()
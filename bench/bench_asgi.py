@@ -0,0 +1,98 @@
+# bench_asgi.py
+# Side-by-side load test of the sync handlers (gunicorn, main:app) against the
+# async handlers (hypercorn, asgi:app). The Groq API is replaced by the
+# in-process mock (see mock_groq.py) and the same load is driven against:
+#   /api/prompt       dominated by waiting on the (mock) AI upstream
+#   /project/by-user  three small MySQL queries
+#
+# Needs MySQL and Redis configured as for the app itself.
+#
+#   python bench/bench_asgi.py --sync gthread:2:8 --asgi-workers 2 \
+#     --concurrency 64 --requests 800 --latency lognormal:-0.5,0.4
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import requests
+from loadgen import run_load, print_report
+from mock_groq import MockGroqConfig, start_mock_groq
+from bench_ai import login_session, csrf_headers, random_prompt_inputs
+from bench_workers import start_server, stop_server, ROOT
+
+def start_asgi_server(workers, port, mock_url):
+  env = dict(os.environ, GROQ_BASE_URL=mock_url, GROQ_KEY=os.getenv("GROQ_KEY", "mock"))
+  process = subprocess.Popen(
+    [sys.executable, "-m", "hypercorn", "asgi:app", "--bind", f"127.0.0.1:{port}",
+     "--workers", str(workers)],
+    cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+  )
+  base_url = f"http://127.0.0.1:{port}"
+  deadline = time.monotonic() + 60
+  while time.monotonic() < deadline:
+    try:
+      requests.get(f"{base_url}/api/ai/health", timeout=1)
+      return process, base_url
+    except requests.RequestException:
+      time.sleep(0.5)
+  process.terminate()
+  raise RuntimeError("hypercorn did not start")
+
+def run_routes(base_url, args):
+  sessions = [
+    login_session(base_url, f"{args.user_prefix}_{i}", args.password)
+    for i in range(args.concurrency)
+  ]
+
+  def prompt_task(worker, iteration):
+    session = sessions[worker]
+    response = session.post(f"{base_url}/api/prompt", json=random_prompt_inputs(),
+                            headers=csrf_headers(session))
+    return response.status_code == 200
+
+  def projects_task(worker, iteration):
+    return sessions[worker].get(f"{base_url}/project/by-user").status_code == 200
+
+  return {
+    "/api/prompt": run_load(prompt_task, args.concurrency, args.requests),
+    "/project/by-user": run_load(projects_task, args.concurrency, args.requests),
+  }
+
+def main():
+  parser = argparse.ArgumentParser(description="Benchmark sync (gunicorn) vs async (hypercorn) handlers")
+  parser.add_argument("--sync", default="gthread:2:8", help="gunicorn worker model (see bench_workers.py)")
+  parser.add_argument("--asgi-workers", type=int, default=2)
+  parser.add_argument("--port", type=int, default=8300)
+  parser.add_argument("--concurrency", type=int, default=64)
+  parser.add_argument("--requests", type=int, default=800)
+  parser.add_argument("--latency", default="lognormal:-0.5,0.4", help="Mock AI latency distribution")
+  parser.add_argument("--user-prefix", default="bench_asgi_user")
+  parser.add_argument("--password", default="bench-password")
+  parser.add_argument("--json", action="store_true", help="Print results as JSON")
+  args = parser.parse_args()
+
+  mock, mock_url = start_mock_groq(MockGroqConfig(latency=args.latency))
+  servers = {
+    f"sync {args.sync}": lambda: start_server(args.sync, args.port, mock_url),
+    f"asgi hypercorn:{args.asgi_workers}": lambda: start_asgi_server(args.asgi_workers, args.port, mock_url),
+  }
+  results = {}
+  for name, start in servers.items():
+    process, base_url = start()
+    try:
+      results[name] = run_routes(base_url, args)
+    finally:
+      stop_server(process)
+
+  mock.shutdown()
+  if args.json:
+    print(json.dumps(results, indent=2))
+    return
+  for name, summaries in results.items():
+    for route, summary in summaries.items():
+      print_report(f"{name} {route}", summary)
+
+if __name__ == "__main__":
+  main()
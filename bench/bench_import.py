@@ -0,0 +1,119 @@
+# bench_import.py
+# Throughput of the bulk importer (bulk_import.py): the same generated file
+# imported into MySQL once per batch size. Batch size 1 commits every project
+# on its own, close to what one POST /project/create per project costs in
+# transactions and counter updates; larger batches show what batching saves.
+# AI task generation is off, as with --skip-ai.
+#
+#   python bench/bench_import.py --mysql-start --projects 2000 --tasks 10 --batch-sizes 1,50,200
+#   python bench/bench_import.py --parse-only --projects 100000
+#
+# --parse-only measures reading and validation alone, without a database.
+# Otherwise MySQL is a throwaway mysqld (--mysql-start) or a local server
+# whose devstorm_e2e database is dropped and recreated (see e2e/stack.py).
+
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "e2e"))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import mysql.connector
+from bulk_import import BulkImporter, read_records, validate
+
+OWNER = "bench_import"
+WORDS = ("api", "auth", "cache", "deploy", "docs", "queue", "schema", "search", "tests", "ui")
+
+# NDJSON with `projects` projects of `tasks` tasks each
+def make_file(projects, tasks, seed=1234):
+  rng = random.Random(seed)
+  lines = []
+  for i in range(projects):
+    steps = [f"Step {n}: {rng.choice(WORDS)}" for n in range(1, 6)]
+    lines.append(json.dumps({
+      "title": f"Imported project {i}",
+      "summary": " ".join(rng.choice(WORDS) for _ in range(20)),
+      "steps": steps,
+      "languages": rng.sample(["Python", "JavaScript", "SQL", "Go", "Rust"], 2),
+      "status": 0,
+      "tasks": [
+        {"description": f"{rng.choice(WORDS)} task {n}", "priority": rng.randint(1, 5), "status": 1}
+        for n in range(tasks)
+      ]
+    }))
+  return ("\n".join(lines) + "\n").encode("utf-8")
+
+def parse_only(data):
+  start = time.perf_counter()
+  records = 0
+  for _, record, error in read_records(io.BytesIO(data)):
+    if error is None:
+      validate(record, OWNER)
+    records += 1
+  seconds = time.perf_counter() - start
+  print(f"parse+validate: {records} records, {len(data) / 1e6:.1f} MB in {seconds:.2f}s "
+        f"({records / seconds:.0f} records/s, {len(data) / 1e6 / seconds:.1f} MB/s)")
+
+def reset(connection):
+  cursor = connection.cursor()
+  cursor.execute("DELETE FROM changes")
+  cursor.execute("DELETE FROM tasks")
+  cursor.execute("DELETE FROM projects")
+  cursor.execute("UPDATE users SET projects = 0, projects_completed = 0 WHERE username = %s", (OWNER,))
+  connection.commit()
+  cursor.close()
+
+def main():
+  parser = argparse.ArgumentParser(description="Benchmark bulk project import")
+  parser.add_argument("--projects", type=int, default=2000)
+  parser.add_argument("--tasks", type=int, default=10, help="Tasks per project")
+  parser.add_argument("--batch-sizes", default="1,50,200")
+  parser.add_argument("--parse-only", action="store_true")
+  parser.add_argument("--mysql-start", action="store_true", help="Start a throwaway mysqld")
+  parser.add_argument("--mysql-host", default="127.0.0.1")
+  parser.add_argument("--mysql-port", type=int, default=3306)
+  parser.add_argument("--mysql-user", default="root")
+  parser.add_argument("--mysql-password", default="")
+  args = parser.parse_args()
+
+  data = make_file(args.projects, args.tasks)
+  if args.parse_only:
+    parse_only(data)
+    return
+
+  from stack import Stack
+  with Stack(mysql_start=args.mysql_start, mysql_host=args.mysql_host, mysql_port=args.mysql_port,
+             mysql_user=args.mysql_user, mysql_password=args.mysql_password) as stack:
+    # Create the schema with the app's own code
+    os.environ.update(stack.app_env())
+    from db import create_users_table, create_projects_table, create_tasks_table, create_changes_table
+    create_users_table()
+    create_projects_table()
+    create_tasks_table()
+    create_changes_table()
+    connection = mysql.connector.connect(**stack.mysql, database=stack.database)
+    try:
+      cursor = connection.cursor()
+      cursor.execute("INSERT INTO users (email, username, password, confirmed, membership) VALUES (%s, %s, %s, 1, 'STANDARD')",
+                     (f"{OWNER}@bench.local", OWNER, "x"))
+      connection.commit()
+      cursor.close()
+      print(f"{args.projects} projects x {args.tasks} tasks ({len(data) / 1e6:.1f} MB)")
+      for batch_size in (int(size) for size in args.batch_sizes.split(",")):
+        reset(connection)
+        report = BulkImporter(connection, owner=OWNER, batch_size=batch_size).run(read_records(io.BytesIO(data)))
+        seconds = report["seconds"] or 1e-9
+        print(f"batch {batch_size:>5}: {seconds:7.2f}s  {report['projects'] / seconds:8.0f} projects/s  "
+              f"{report['tasks'] / seconds:9.0f} tasks/s  {report['batches']} transactions  "
+              f"{report['invalid']} invalid")
+    finally:
+      connection.close()
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,98 @@
+# bench_mail.py
+# Compare sending registration emails inline (one SMTP session per message,
+# as register_user used to) with queueing them in the email outbox and
+# letting the background sender drain the queue over one session.
+#
+# Needs a local Redis; uses a scratch database (15 by default) and clears the
+# outbox keys there first. SMTP is the in-process mock (see mock_smtp.py).
+#
+#   python bench/bench_mail.py --messages 200 --concurrency 8 --connect-latency fixed:0.3
+
+import argparse
+import json
+import os
+import sys
+import time
+import redis
+from flask import Flask
+from flask_mail import Mail
+from loadgen import run_load, print_report
+from mock_smtp import MockSMTPConfig, start_mock_smtp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from email_outbox import EmailOutbox, OUTBOX_KEY, PROCESSING_KEY, RETRY_KEY, DEAD_KEY, SENDER_KEY
+from helpers import deliver_email
+
+HTML = "<p>Welcome to DevStorm! Please confirm your account.</p>" * 20
+
+def make_app(port):
+  app = Flask(__name__)
+  app.config.update(
+    MAIL_SERVER="127.0.0.1", MAIL_PORT=port, MAIL_USE_TLS=False, MAIL_USE_SSL=False,
+    MAIL_USERNAME=None, MAIL_PASSWORD=None, MAIL_DEFAULT_SENDER="bench@devstorm.local"
+  )
+  Mail(app)
+  return app
+
+def main():
+  parser = argparse.ArgumentParser(description="Benchmark inline email vs the email outbox")
+  parser.add_argument("--messages", type=int, default=200)
+  parser.add_argument("--concurrency", type=int, default=8)
+  parser.add_argument("--latency", default="fixed:0.01", help="Mock per-message latency")
+  parser.add_argument("--connect-latency", default="fixed:0.2",
+                      help="Mock session setup latency (stands in for TLS + AUTH)")
+  parser.add_argument("--error-rate", type=float, default=0.0)
+  parser.add_argument("--batch-size", type=int, default=50)
+  parser.add_argument("--redis-db", type=int, default=15)
+  parser.add_argument("--json", action="store_true", help="Print results as JSON")
+  args = parser.parse_args()
+
+  config = MockSMTPConfig(args.latency, args.connect_latency, args.error_rate)
+  server, port = start_mock_smtp(config)
+  app = make_app(port)
+  cache = redis.StrictRedis(db=args.redis_db, decode_responses=True)
+  cache.delete(OUTBOX_KEY, PROCESSING_KEY, RETRY_KEY, DEAD_KEY, SENDER_KEY)
+  results = {}
+
+  # Inline: what each registration request used to wait for
+  def send_inline(worker, i):
+    with app.app_context():
+      deliver_email(f"user{i}@bench.local", "Please verify your DevStorm account", HTML)
+    return True
+  results["inline_send"] = run_load(send_inline, args.concurrency, args.messages)
+
+  # Outbox: what a registration request waits for now
+  outbox = EmailOutbox(app, cache, batch_size=args.batch_size, retry_seconds=1)
+  def enqueue(worker, i):
+    outbox.enqueue(f"user{i}@bench.local", "Please verify your DevStorm account", HTML)
+    return True
+  results["outbox_enqueue"] = run_load(enqueue, args.concurrency, args.messages)
+
+  # Background delivery of everything queued above
+  sent_before = config.stats["messages"]
+  start = time.perf_counter()
+  outbox.start()
+  while outbox.stats["sent"] + outbox.stats["dead"] < args.messages:
+    time.sleep(0.01)
+  elapsed = time.perf_counter() - start
+  outbox.stop()
+  results["outbox_drain"] = {
+    "messages": config.stats["messages"] - sent_before,
+    "elapsed_s": round(elapsed, 3),
+    "throughput_mps": round(args.messages / elapsed, 2) if elapsed else 0.0,
+    "smtp_connections": outbox.stats["connections"],
+    "retries": outbox.stats["failed"],
+  }
+  server.shutdown()
+
+  if args.json:
+    print(json.dumps(results, indent=2))
+    return
+  print_report("inline send", results["inline_send"])
+  print_report("outbox enqueue", results["outbox_enqueue"])
+  drain = results["outbox_drain"]
+  print(f"{'outbox drain':<28} n={drain['messages']:<6} {drain['elapsed_s']}s "
+        f"mps={drain['throughput_mps']} connections={drain['smtp_connections']} retries={drain['retries']}")
+
+if __name__ == "__main__":
+  main()
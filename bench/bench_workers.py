@@ -0,0 +1,111 @@
+# bench_workers.py
+# Compare gunicorn worker models on the existing endpoints. For each model the
+# app is started under gunicorn.conf.py with the given worker settings, the
+# Groq API is replaced by the in-process mock (see mock_groq.py), and the same
+# load is driven against:
+#   /api/ai/health  cheap, CPU-only request
+#   /api/prompt     dominated by waiting on the (mock) AI upstream
+#
+# Needs MySQL and Redis configured as for the app itself.
+#
+#   python bench/bench_workers.py --models sync:4 gthread:2:8 gevent:2:200 \
+#     --concurrency 32 --requests 400 --latency lognormal:-0.5,0.4
+#
+# Model specs: sync:WORKERS, gthread:WORKERS:THREADS, gevent:WORKERS:CONNECTIONS
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import requests
+from loadgen import run_load, print_report
+from mock_groq import MockGroqConfig, start_mock_groq
+from bench_ai import login_session, csrf_headers, random_prompt_inputs
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def model_env(spec):
+  kind, *values = spec.split(":")
+  env = {"GUNICORN_WORKER_CLASS": kind}
+  if values:
+    env["GUNICORN_WORKERS"] = values[0]
+  if len(values) > 1:
+    env["GUNICORN_THREADS" if kind == "gthread" else "GUNICORN_WORKER_CONNECTIONS"] = values[1]
+  return env
+
+def start_server(spec, port, mock_url):
+  env = dict(os.environ, **model_env(spec))
+  env.update(GUNICORN_BIND=f"127.0.0.1:{port}", GUNICORN_ACCESS_LOG="/dev/null",
+             GROQ_BASE_URL=mock_url, GROQ_KEY=env.get("GROQ_KEY", "mock"))
+  process = subprocess.Popen(
+    [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "main:app"],
+    cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+  )
+  base_url = f"http://127.0.0.1:{port}"
+  deadline = time.monotonic() + 60
+  while time.monotonic() < deadline:
+    try:
+      requests.get(f"{base_url}/api/ai/health", timeout=1)
+      return process, base_url
+    except requests.RequestException:
+      time.sleep(0.5)
+  process.terminate()
+  raise RuntimeError(f"gunicorn ({spec}) did not start")
+
+def stop_server(process):
+  process.terminate()
+  try:
+    process.wait(timeout=30)
+  except subprocess.TimeoutExpired:
+    process.kill()
+
+def main():
+  parser = argparse.ArgumentParser(description="Benchmark gunicorn worker models")
+  parser.add_argument("--models", nargs="+", default=["sync:4", "gthread:2:8", "gevent:2:200"])
+  parser.add_argument("--port", type=int, default=8200)
+  parser.add_argument("--concurrency", type=int, default=32)
+  parser.add_argument("--requests", type=int, default=400)
+  parser.add_argument("--latency", default="lognormal:-0.5,0.4", help="Mock AI latency distribution")
+  parser.add_argument("--user-prefix", default="bench_workers_user")
+  parser.add_argument("--password", default="bench-password")
+  parser.add_argument("--json", action="store_true", help="Print results as JSON")
+  args = parser.parse_args()
+
+  mock, mock_url = start_mock_groq(MockGroqConfig(latency=args.latency))
+  results = {}
+  for spec in args.models:
+    process, base_url = start_server(spec, args.port, mock_url)
+    try:
+      sessions = [
+        login_session(base_url, f"{args.user_prefix}_{i}", args.password)
+        for i in range(args.concurrency)
+      ]
+
+      def health_task(worker, iteration):
+        return sessions[worker].get(f"{base_url}/api/ai/health").status_code == 200
+
+      def prompt_task(worker, iteration):
+        session = sessions[worker]
+        response = session.post(f"{base_url}/api/prompt", json=random_prompt_inputs(),
+                                headers=csrf_headers(session))
+        return response.status_code == 200
+
+      results[spec] = {
+        "/api/ai/health": run_load(health_task, args.concurrency, args.requests),
+        "/api/prompt": run_load(prompt_task, args.concurrency, args.requests),
+      }
+    finally:
+      stop_server(process)
+
+  mock.shutdown()
+  if args.json:
+    print(json.dumps(results, indent=2))
+    return
+  for spec, summaries in results.items():
+    for route, summary in summaries.items():
+      print_report(f"{spec} {route}", summary)
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,139 @@
+# run.py
+# End-to-end load test: start local stand-ins (see stack.py), seed the
+# database (seed.py), start the app, drive the mixed workload (workload.py)
+# and report throughput and latency percentiles per route.
+#
+#   python bench/e2e/run.py --mysql-start --users 200 --concurrency 16 --requests 2000
+#
+# Baselines are JSON files in bench/e2e/baselines/. Record one from a known
+# good build, then compare later runs against it; the exit status is 1 if any
+# route regressed beyond the tolerances:
+#
+#   python bench/e2e/run.py --mysql-start --save-baseline main
+#   python bench/e2e/run.py --mysql-start --compare main
+#
+# Without --mysql-start, a local MySQL server is used (--mysql-host/--mysql-port,
+# user and password from --mysql-user/--mysql-password); its devstorm_e2e
+# database is dropped and recreated on every run.
+
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import mysql.connector
+from loadgen import print_report
+from stack import Stack
+from seed import SeedConfig, seed
+from workload import run_mixed, parse_weights
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+def baseline_path(name):
+  return os.path.join(BASELINE_DIR, f"{name}.json")
+
+def save_baseline(name, settings, results):
+  os.makedirs(BASELINE_DIR, exist_ok=True)
+  with open(baseline_path(name), "w") as f:
+    json.dump({"recorded": datetime.now().isoformat(timespec="seconds"), "settings": settings,
+               "routes": results}, f, indent=2, sort_keys=True)
+    f.write("\n")
+
+# Routes that got slower, lost throughput or failed more than the baseline.
+# Latency changes below `min_ms` are ignored as noise
+def compare(baseline, results, latency_tolerance, throughput_tolerance, min_ms):
+  regressions = []
+  for route, before in baseline["routes"].items():
+    after = results.get(route)
+    if after is None:
+      continue
+    for key in ("p50_ms", "p95_ms"):
+      if after[key] > before[key] * (1 + latency_tolerance) and after[key] - before[key] > min_ms:
+        regressions.append(f"{route}: {key} {before[key]} -> {after[key]}")
+    if after["throughput_rps"] < before["throughput_rps"] * (1 - throughput_tolerance):
+      regressions.append(f"{route}: throughput_rps {before['throughput_rps']} -> {after['throughput_rps']}")
+    error_rate = after["errors"] / after["requests"] if after["requests"] else 0
+    before_rate = before["errors"] / before["requests"] if before["requests"] else 0
+    if error_rate > before_rate + 0.01:
+      regressions.append(f"{route}: error rate {before_rate:.2%} -> {error_rate:.2%}")
+  return regressions
+
+def main():
+  parser = argparse.ArgumentParser(description="End-to-end load test against local stand-ins")
+  parser.add_argument("--server", choices=["gunicorn", "asgi"], default="gunicorn")
+  parser.add_argument("--workers", type=int, default=2)
+  parser.add_argument("--threads", type=int, default=8, help="Threads per gunicorn worker")
+  parser.add_argument("--mysql-start", action="store_true", help="Start a throwaway mysqld")
+  parser.add_argument("--mysql-host", default="127.0.0.1")
+  parser.add_argument("--mysql-port", type=int, default=3306)
+  parser.add_argument("--mysql-user", default="root")
+  parser.add_argument("--mysql-password", default="")
+  parser.add_argument("--users", type=int, default=200)
+  parser.add_argument("--bcrypt-rounds", type=int, default=10)
+  parser.add_argument("--concurrency", type=int, default=16)
+  parser.add_argument("--requests", type=int, default=2000, help="Operations to run")
+  parser.add_argument("--weights", default="", help='Operation weight overrides, e.g. "prompt=0,login=10"')
+  parser.add_argument("--ai-latency", default="fixed:0.2", help="Mock Groq latency distribution")
+  parser.add_argument("--seed", type=int, default=1234)
+  parser.add_argument("--save-baseline", metavar="NAME")
+  parser.add_argument("--compare", metavar="NAME")
+  parser.add_argument("--latency-tolerance", type=float, default=0.25, help="Allowed p50/p95 increase")
+  parser.add_argument("--throughput-tolerance", type=float, default=0.2, help="Allowed throughput drop")
+  parser.add_argument("--min-ms", type=float, default=5.0, help="Ignore latency changes smaller than this")
+  parser.add_argument("--json", action="store_true", help="Print results as JSON")
+  args = parser.parse_args()
+
+  settings = {key: getattr(args, key) for key in (
+    "server", "workers", "threads", "users", "bcrypt_rounds", "concurrency", "requests",
+    "weights", "ai_latency", "seed"
+  )}
+  weights = parse_weights(args.weights)
+  with Stack(mysql_start=args.mysql_start, mysql_host=args.mysql_host, mysql_port=args.mysql_port,
+             mysql_user=args.mysql_user, mysql_password=args.mysql_password,
+             groq_latency=args.ai_latency) as stack:
+    env = stack.app_env(BCRYPT_LOG_ROUNDS=args.bcrypt_rounds)
+    # Create the schema with the app's own code, then seed it
+    os.environ.update(env)
+    from db import create_users_table, create_projects_table, create_tasks_table, create_changes_table
+    create_users_table()
+    create_projects_table()
+    create_tasks_table()
+    create_changes_table()
+    connection = mysql.connector.connect(**stack.mysql, database=stack.database)
+    try:
+      data = seed(connection, SeedConfig(users=args.users, bcrypt_rounds=args.bcrypt_rounds, seed=args.seed))
+    finally:
+      connection.close()
+    stack.flask("rebuild-idea-index", env=env)
+
+    base_url = stack.start_app(args.server, env, workers=args.workers, threads=args.threads)
+    results = run_mixed(base_url, data, args.concurrency, args.requests, weights, seed=args.seed)
+
+  if args.json:
+    print(json.dumps(results, indent=2))
+  else:
+    for route, summary in results.items():
+      print_report(route, summary)
+
+  if args.save_baseline:
+    save_baseline(args.save_baseline, settings, results)
+    print(f"Saved baseline {baseline_path(args.save_baseline)}")
+  if args.compare:
+    with open(baseline_path(args.compare)) as f:
+      baseline = json.load(f)
+    if baseline["settings"] != settings:
+      print(f"Warning: baseline was recorded with different settings: {baseline['settings']}")
+    regressions = compare(baseline, results, args.latency_tolerance, args.throughput_tolerance, args.min_ms)
+    for regression in regressions:
+      print(f"REGRESSION {regression}")
+    if regressions:
+      sys.exit(1)
+    print(f"No regressions against baseline {args.compare}")
+
+if __name__ == "__main__":
+  main()
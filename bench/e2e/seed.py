@@ -0,0 +1,114 @@
+# seed.py
+# Deterministic, realistic test data: users with bios, projects (some shared
+# with collaborators, some completed) and their tasks. Written straight to
+# MySQL in bulk so seeding large datasets takes seconds, not a load test of
+# its own. All users share one password, hashed once.
+
+import json
+import random
+from datetime import datetime, timedelta
+import bcrypt
+
+ROLES = ["Frontend Developer", "Backend Developer", "Data Scientist", "Game Developer"]
+LANGUAGES = ["Python", "JavaScript", "TypeScript", "Go", "Rust", "Java", "C#", "SQL"]
+SUBJECTS = ["habit tracker", "budget planner", "recipe finder", "study group matcher",
+            "pet adoption portal", "workout log", "event scheduler", "bug tracker",
+            "plant care reminder", "carpool organizer", "book club hub", "job board"]
+VERBS = ["Design", "Implement", "Test", "Document", "Refactor", "Deploy", "Review"]
+PARTS = ["database schema", "REST API", "login flow", "dashboard", "search", "notifications",
+         "settings page", "CI pipeline", "error handling", "data import"]
+
+class SeedConfig:
+  def __init__(self, users=200, max_projects=4, min_steps=3, max_steps=8,
+               tasks_per_step=(2, 5), password="e2e-password", bcrypt_rounds=10, seed=1234):
+    self.users = users
+    self.max_projects = max_projects
+    self.min_steps = min_steps
+    self.max_steps = max_steps
+    self.tasks_per_step = tasks_per_step
+    self.password = password
+    self.bcrypt_rounds = bcrypt_rounds
+    self.seed = seed
+
+# Seeded data, as the workload needs it: usernames, and for each user the ids
+# of the projects they own and of those projects' tasks
+class SeedData:
+  def __init__(self, password):
+    self.password = password
+    self.usernames = []
+    self.projects = {}
+    self.tasks = {}
+
+def username(i):
+  return f"e2e_user_{i:05d}"
+
+# Insert the dataset into an empty database. Returns SeedData
+def seed(connection, config):
+  rng = random.Random(config.seed)
+  data = SeedData(config.password)
+  hashed = bcrypt.hashpw(config.password.encode("utf-8"),
+                         bcrypt.gensalt(config.bcrypt_rounds)).decode("utf-8")
+  cursor = connection.cursor()
+  now = datetime.now()
+
+  users = []
+  for i in range(config.users):
+    name = username(i)
+    joined = now - timedelta(days=rng.randint(1, 365))
+    confirmed = rng.random() < 0.8
+    users.append((
+      f"{name}@e2e.local", name, hashed, int(confirmed), joined if confirmed else None,
+      "STANDARD", joined, f"{rng.choice(ROLES)} who likes {rng.choice(SUBJECTS)}s"
+    ))
+    data.usernames.append(name)
+  cursor.executemany(
+    "INSERT INTO users (email, username, password, confirmed, confirmed_on, membership, date_joined, bio) "
+    "VALUES (%s, %s, %s, %s, %s, %s, %s, %s)", users
+  )
+
+  project_counts = dict.fromkeys(data.usernames, 0)
+  completed_counts = dict.fromkeys(data.usernames, 0)
+  for owner in data.usernames:
+    data.projects[owner] = []
+    # Nobody is left at the app's limit of in-progress projects, so the
+    # workload can still create projects for every user
+    for _ in range(min(rng.randint(0, config.max_projects), config.max_projects - project_counts[owner])):
+      others = rng.sample(data.usernames, min(2, len(data.usernames)))
+      collaborators = [
+        name for name in others if name != owner and project_counts[name] < config.max_projects
+      ][:rng.choice([0, 0, 1, 2])]
+      collaborators += [None] * (2 - len(collaborators))
+      subject = rng.choice(SUBJECTS)
+      steps = [f"Step {n}: {rng.choice(VERBS)} the {rng.choice(PARTS)}"
+               for n in range(1, rng.randint(config.min_steps, config.max_steps) + 1)]
+      languages = rng.sample(LANGUAGES, rng.randint(1, 3))
+      status = int(rng.random() < 0.25)
+      cursor.execute(
+        "INSERT INTO projects (owner, collaborator1, collaborator2, title, summary, steps, languages, status, date_created) "
+        "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)",
+        (owner, *collaborators, f"{subject.title()} for {rng.choice(ROLES)}s",
+         f"A {subject} built with {', '.join(languages)}", json.dumps(steps), json.dumps(languages),
+         status, now - timedelta(days=rng.randint(0, 180)))
+      )
+      pid = cursor.lastrowid
+      data.projects[owner].append(pid)
+      for member in [owner] + [name for name in collaborators if name]:
+        project_counts[member] += 1
+        completed_counts[member] += status
+      tasks = [
+        (pid, f"{rng.choice(VERBS)} {rng.choice(PARTS)} for {step.split(': ')[1].lower()}",
+         priority, rng.choice([1, 1, 2, 3]))
+        for priority, step in enumerate(steps, start=1)
+        for _ in range(rng.randint(*config.tasks_per_step))
+      ]
+      cursor.executemany("INSERT INTO tasks (pid, description, priority, status) VALUES (%s, %s, %s, %s)", tasks)
+      first_id = cursor.lastrowid
+      data.tasks[pid] = list(range(first_id, first_id + len(tasks)))
+
+  cursor.executemany(
+    "UPDATE users SET projects = %s, projects_completed = %s WHERE username = %s",
+    [(project_counts[name], completed_counts[name], name) for name in data.usernames]
+  )
+  connection.commit()
+  cursor.close()
+  return data
@@ -0,0 +1,178 @@
+# stack.py
+# Local stand-ins for everything the app talks to, and the app server itself:
+#   MySQL  a throwaway mysqld (--mysql-start) or an existing local server;
+#          the benchmark database is dropped and recreated on every run
+#   Redis  redis-server if it is on PATH, otherwise fakeredis' TCP server
+#   Groq   mock_groq.py
+#   SMTP   mock_smtp.py
+
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import mysql.connector
+import requests
+from mock_groq import MockGroqConfig, start_mock_groq
+from mock_smtp import MockSMTPConfig, start_mock_smtp
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def free_port():
+  with socket.socket() as sock:
+    sock.bind(("127.0.0.1", 0))
+    return sock.getsockname()[1]
+
+def wait_for(check, timeout, what):
+  deadline = time.monotonic() + timeout
+  while time.monotonic() < deadline:
+    try:
+      if check():
+        return
+    except Exception:
+      pass
+    time.sleep(0.25)
+  raise RuntimeError(f"{what} did not start within {timeout}s")
+
+class Stack:
+  def __init__(self, mysql_start=False, mysql_host="127.0.0.1", mysql_port=3306,
+               mysql_user="root", mysql_password="", database="devstorm_e2e",
+               groq_latency="fixed:0.2", smtp_latency="fixed:0.01"):
+    self.mysql_start = mysql_start
+    self.mysql = {"host": mysql_host, "port": mysql_port, "user": mysql_user, "password": mysql_password}
+    self.database = database
+    self.groq_latency = groq_latency
+    self.smtp_latency = smtp_latency
+    self._processes = []
+    self._servers = []
+    self._tempdir = None
+    self.redis_port = None
+    self.groq_url = None
+    self.smtp_port = None
+
+  def __enter__(self):
+    try:
+      self.start()
+    except BaseException:
+      self.stop()
+      raise
+    return self
+
+  def __exit__(self, *exc):
+    self.stop()
+
+  def start(self):
+    self._tempdir = tempfile.mkdtemp(prefix="devstorm-e2e-")
+    if self.mysql_start:
+      self._start_mysqld()
+    self._reset_database()
+    self._start_redis()
+    groq, self.groq_url = start_mock_groq(MockGroqConfig(latency=self.groq_latency))
+    smtp, self.smtp_port = start_mock_smtp(MockSMTPConfig(latency=self.smtp_latency))
+    self._servers += [groq, smtp]
+
+  def stop(self):
+    for process in reversed(self._processes):
+      process.terminate()
+      try:
+        process.wait(timeout=30)
+      except subprocess.TimeoutExpired:
+        process.kill()
+    for server in self._servers:
+      server.shutdown()
+    self._processes = []
+    self._servers = []
+    if self._tempdir:
+      shutil.rmtree(self._tempdir, ignore_errors=True)
+      self._tempdir = None
+
+  def _start_mysqld(self):
+    mysqld = shutil.which("mysqld") or shutil.which("mariadbd")
+    if not mysqld:
+      raise RuntimeError("--mysql-start needs mysqld (or mariadbd) on PATH")
+    datadir = os.path.join(self._tempdir, "mysql")
+    subprocess.run([mysqld, "--no-defaults", "--initialize-insecure", f"--datadir={datadir}"],
+                   check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    self.mysql.update(host="127.0.0.1", port=free_port(), user="root", password="")
+    self._processes.append(subprocess.Popen(
+      [mysqld, "--no-defaults", f"--datadir={datadir}", f"--port={self.mysql['port']}",
+       "--bind-address=127.0.0.1", f"--socket={os.path.join(self._tempdir, 'mysql.sock')}",
+       "--mysqlx=OFF", "--skip-log-bin"],
+      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    ))
+    wait_for(lambda: mysql.connector.connect(**self.mysql).close() or True, 60, "mysqld")
+
+  def _reset_database(self):
+    connection = mysql.connector.connect(**self.mysql)
+    try:
+      cursor = connection.cursor()
+      cursor.execute(f"DROP DATABASE IF EXISTS `{self.database}`")
+      cursor.execute(f"CREATE DATABASE `{self.database}`")
+    finally:
+      connection.close()
+
+  def _start_redis(self):
+    self.redis_port = free_port()
+    redis_server = shutil.which("redis-server")
+    if redis_server:
+      self._processes.append(subprocess.Popen(
+        [redis_server, "--port", str(self.redis_port), "--bind", "127.0.0.1", "--save", "",
+         "--appendonly", "no"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+      ))
+    else:
+      from fakeredis import TcpFakeServer
+      server = TcpFakeServer(("127.0.0.1", self.redis_port))
+      threading.Thread(target=server.serve_forever, daemon=True).start()
+      self._servers.append(server)
+    wait_for(lambda: socket.create_connection(("127.0.0.1", self.redis_port), 1).close() or True,
+             10, "Redis")
+
+  # Environment for the app (and its CLI) pointed at the stand-ins
+  def app_env(self, **overrides):
+    env = dict(os.environ)
+    env.update(
+      ENDPOINT=self.mysql["host"], DB_PORT=str(self.mysql["port"]), DB_NAME=self.database,
+      ADMIN_USER=self.mysql["user"], ADMIN_PASSWORD=self.mysql["password"],
+      REDIS_HOST="127.0.0.1", REDIS_PORT=str(self.redis_port),
+      GROQ_BASE_URL=self.groq_url, GROQ_KEY="mock",
+      MAIL_SERVER="127.0.0.1", MAIL_PORT=str(self.smtp_port), MAIL_USE_TLS="false",
+      MAIL_USERNAME="noreply@e2e.local", MAIL_PASSWORD="",
+      JWT_SECRET_KEY="e2e-jwt-secret-key-e2e-jwt-secret-key",
+      ITSDANGEROUS_SECRET_KEY="e2e-itsdangerous-key", ITSDANGEROUS_PASSWORD_SALT="e2e-salt",
+      FRONTEND="http://127.0.0.1", IDEA_INDEX_DIR=os.path.join(self._tempdir, "idea_index"),
+    )
+    env.update({key: str(value) for key, value in overrides.items()})
+    return env
+
+  # Run a Flask CLI command against the stand-ins
+  def flask(self, *args, env):
+    subprocess.run([sys.executable, "-m", "flask", "--app", "main", *args],
+                   cwd=ROOT, env=env, check=True, stdout=subprocess.DEVNULL)
+
+  # Start the app under gunicorn (main:app) or hypercorn (asgi:app). Returns
+  # its base URL
+  def start_app(self, server, env, workers=2, threads=8):
+    port = free_port()
+    if server == "asgi":
+      command = [sys.executable, "-m", "hypercorn", "asgi:app", "--bind", f"127.0.0.1:{port}",
+                 "--workers", str(workers)]
+    else:
+      env = dict(env, GUNICORN_BIND=f"127.0.0.1:{port}", GUNICORN_WORKERS=workers,
+                 GUNICORN_THREADS=threads, GUNICORN_ACCESS_LOG="/dev/null")
+      command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "main:app"]
+    log = open(os.path.join(self._tempdir, f"{server}.log"), "w")
+    self._processes.append(subprocess.Popen(
+      command, cwd=ROOT, env={key: str(value) for key, value in env.items()},
+      stdout=log, stderr=subprocess.STDOUT
+    ))
+    base_url = f"http://127.0.0.1:{port}"
+    wait_for(lambda: requests.get(f"{base_url}/api/ai/health", timeout=1).ok, 60, server)
+    return base_url
+
+  def app_log(self, server):
+    with open(os.path.join(self._tempdir, f"{server}.log")) as log:
+      return log.read()
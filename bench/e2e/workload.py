@@ -0,0 +1,279 @@
+# workload.py
+# Mixed workload across every blueprint. Each worker is logged in as one of
+# the seeded users and repeatedly picks an operation by weight; every HTTP
+# request is timed and recorded under its route, so one run reports
+# throughput and latency percentiles per route.
+
+import random
+import threading
+import time
+import requests
+from loadgen import summarize
+
+ROLES = ["Frontend Developer", "Backend Developer", "Data Scientist", "Game Developer"]
+TECHNOLOGIES = ["Python", "React", "Flask", "MySQL", "Unity", "TensorFlow"]
+INDUSTRIES = ["Healthcare", "Finance", "Education", "Entertainment"]
+
+class Recorder:
+  def __init__(self):
+    self._lock = threading.Lock()
+    self._routes = {}
+
+  def record(self, route, latency, ok):
+    with self._lock:
+      latencies, errors = self._routes.setdefault(route, ([], [0]))
+      if ok:
+        latencies.append(latency)
+      else:
+        errors[0] += 1
+
+  def summaries(self, elapsed):
+    with self._lock:
+      return {
+        route: summarize(latencies, errors[0], elapsed)
+        for route, (latencies, errors) in sorted(self._routes.items())
+      }
+
+# One worker's session, logged in as a seeded user
+class Client:
+  def __init__(self, base_url, username, password, projects, tasks, recorder, rng):
+    self.base_url = base_url
+    self.username = username
+    self.password = password
+    self.projects = list(projects)
+    self.tasks = {pid: list(tasks.get(pid, [])) for pid in self.projects}
+    self.recorder = recorder
+    self.rng = rng
+    self.session = requests.Session()
+    # Cursor from the last GET /sync; 0 means a full load
+    self.sync_cursor = 0
+
+  # Timed request, recorded under `route`. A response with a status outside
+  # `expect` counts as an error
+  def request(self, route, method, path, expect=(200,), **kwargs):
+    if method != "GET":
+      headers = kwargs.setdefault("headers", {})
+      headers.setdefault("X-CSRF-TOKEN", self.session.cookies.get("csrf_access_token", ""))
+    start = time.perf_counter()
+    try:
+      response = self.session.request(method, f"{self.base_url}{path}", timeout=60, **kwargs)
+    except requests.RequestException:
+      self.recorder.record(route, time.perf_counter() - start, False)
+      return None
+    self.recorder.record(route, time.perf_counter() - start, response.status_code in expect)
+    return response
+
+  def login(self):
+    return self.request("POST /login", "POST", "/login",
+                        json={"username": self.username, "password": self.password})
+
+  def pick_project(self):
+    return self.rng.choice(self.projects) if self.projects else None
+
+  def pick_task(self):
+    pids = [pid for pid in self.projects if self.tasks[pid]]
+    if not pids:
+      return None, None
+    pid = self.rng.choice(pids)
+    return pid, self.rng.choice(self.tasks[pid])
+
+# Operations: each issues one or more requests through a Client
+def op_login(client):
+  client.login()
+
+def op_refresh(client):
+  client.request("POST /token/refresh", "POST", "/token/refresh", headers={
+    "X-CSRF-TOKEN": client.session.cookies.get("csrf_refresh_token", "")
+  })
+
+# A throwaway account: register, then log out (revoking its tokens)
+def op_register_logout(client):
+  name = f"e2e_new_{client.username}_{client.rng.getrandbits(32):08x}"
+  new_client = Client(client.base_url, name, client.password, [], {}, client.recorder, client.rng)
+  response = new_client.request("POST /register", "POST", "/register", expect=(201,), json={
+    "email": f"{name}@e2e.local", "username": name, "password": client.password
+  })
+  if response is not None and response.status_code == 201:
+    new_client.request("POST /logout", "POST", "/logout")
+
+def op_user_info(client):
+  client.request("GET /user/info", "GET", "/user/info")
+
+def op_set_bio(client):
+  client.request("PUT /user/set-bio", "PUT", "/user/set-bio",
+                 json={"data": f"{client.rng.choice(ROLES)} building {client.rng.choice(TECHNOLOGIES)} apps"})
+
+def op_projects_by_user(client):
+  client.request("GET /project/by-user", "GET", "/project/by-user")
+
+# Dashboard refresh: a full load first, deltas after that
+def op_sync(client):
+  route = "GET /sync (delta)" if client.sync_cursor else "GET /sync (full)"
+  response = client.request(route, "GET", f"/sync?since={client.sync_cursor}")
+  if response is not None and response.status_code == 200:
+    client.sync_cursor = response.json()["cursor"]
+
+def op_export(client):
+  # 503 when the per-process export limit is reached
+  client.request("GET /user/export", "GET", "/user/export", expect=(200, 503), params={"format": "ndjson"})
+
+def op_project_get(client):
+  pid = client.pick_project()
+  if pid is None:
+    return op_projects_by_user(client)
+  client.request("GET /project/<id>", "GET", f"/project/{pid}")
+
+def op_project_similar(client):
+  pid = client.pick_project()
+  if pid is None:
+    return op_projects_by_user(client)
+  client.request("GET /project/<id>/similar", "GET", f"/project/{pid}/similar")
+
+# Toggle a project's status twice, leaving it as it was
+def op_project_status(client):
+  pid = client.pick_project()
+  if pid is None:
+    return op_projects_by_user(client)
+  for _ in range(2):
+    client.request("PUT /project/<id>/update-status", "PUT", f"/project/{pid}/update-status")
+
+# Create a project (tasks generated by the mock AI), then delete it again
+def op_project_create_delete(client):
+  steps = [f"Step {n}: implement part {n}" for n in range(1, client.rng.randint(3, 6) + 1)]
+  response = client.request("POST /project/create", "POST", "/project/create", expect=(201,), json={
+    "title": "E2E project", "summary": "Created by the e2e load test",
+    "languages": client.rng.sample(TECHNOLOGIES, 2), "steps": steps
+  })
+  if response is not None and response.status_code == 201:
+    client.request("DELETE /project/<id>/delete", "DELETE", f"/project/{response.json()['id']}/delete")
+
+def op_project_tasks(client):
+  pid, _ = client.pick_task()
+  if pid is None:
+    return op_projects_by_user(client)
+  client.request("GET /task/<pid>", "GET", f"/task/{pid}")
+
+def op_task_get(client):
+  _, task_id = client.pick_task()
+  if task_id is None:
+    return op_projects_by_user(client)
+  client.request("GET /task/<id>/get", "GET", f"/task/{task_id}/get")
+
+def op_task_status(client):
+  _, task_id = client.pick_task()
+  if task_id is None:
+    return op_projects_by_user(client)
+  client.request("PUT /task/<id>/update-status", "PUT", f"/task/{task_id}/update-status",
+                 json={"status": client.rng.choice([1, 2, 3])})
+
+def op_task_priority(client):
+  _, task_id = client.pick_task()
+  if task_id is None:
+    return op_projects_by_user(client)
+  client.request("PUT /task/<id>/update-priority", "PUT", f"/task/{task_id}/update-priority",
+                 json={"priority": client.rng.randint(1, 5)})
+
+def op_task_description(client):
+  _, task_id = client.pick_task()
+  if task_id is None:
+    return op_projects_by_user(client)
+  client.request("PUT /task/<id>/update-description", "PUT", f"/task/{task_id}/update-description",
+                 json={"description": f"Updated by the e2e load test ({client.rng.random():.6f})"})
+
+def op_task_create_delete(client):
+  pid = client.pick_project()
+  if pid is None:
+    return op_projects_by_user(client)
+  response = client.request("POST /task/<pid>/create", "POST", f"/task/{pid}/create", expect=(201,), json={
+    "description": "Temporary e2e task", "priority": 1, "status": 1
+  })
+  if response is not None and response.status_code == 201:
+    client.request("DELETE /task/<id>/delete", "DELETE", f"/task/{response.json()['task']['id']}/delete")
+
+def op_prompt(client):
+  client.request("POST /api/prompt", "POST", "/api/prompt", json={
+    "role": client.rng.sample(ROLES, client.rng.randint(1, 2)),
+    "technology": client.rng.sample(TECHNOLOGIES, client.rng.randint(1, 3)),
+    "industries": [client.rng.choice(INDUSTRIES)],
+  })
+
+def op_ai_health(client):
+  client.request("GET /api/ai/health", "GET", "/api/ai/health")
+
+# Relative weights, roughly the mix of a browsing user: mostly reads, some
+# writes, occasional logins and AI generations
+OPERATIONS = {
+  "login": (op_login, 3),
+  "refresh": (op_refresh, 2),
+  "register_logout": (op_register_logout, 1),
+  "user_info": (op_user_info, 8),
+  "set_bio": (op_set_bio, 2),
+  "projects_by_user": (op_projects_by_user, 10),
+  "sync": (op_sync, 6),
+  "export": (op_export, 1),
+  "project_get": (op_project_get, 8),
+  "project_similar": (op_project_similar, 2),
+  "project_status": (op_project_status, 2),
+  "project_create_delete": (op_project_create_delete, 2),
+  "project_tasks": (op_project_tasks, 12),
+  "task_get": (op_task_get, 8),
+  "task_status": (op_task_status, 6),
+  "task_priority": (op_task_priority, 2),
+  "task_description": (op_task_description, 3),
+  "task_create_delete": (op_task_create_delete, 3),
+  "prompt": (op_prompt, 4),
+  "ai_health": (op_ai_health, 2),
+}
+
+# "name=weight,..." overrides, e.g. "prompt=0,login=10"
+def parse_weights(spec):
+  weights = {name: weight for name, (_, weight) in OPERATIONS.items()}
+  for item in filter(None, (spec or "").split(",")):
+    name, weight = item.split("=")
+    if name not in OPERATIONS:
+      raise ValueError(f"Unknown operation: {name}")
+    weights[name] = float(weight)
+  return weights
+
+# Log in one client per worker (untimed), then run `total` operations across
+# them. Returns {route: summary} (see loadgen.summarize)
+def run_mixed(base_url, data, concurrency, total, weights, seed=1234):
+  recorder = Recorder()
+  rng = random.Random(seed)
+  users = rng.sample(data.usernames, min(concurrency, len(data.usernames)))
+  clients = [
+    Client(base_url, name, data.password, data.projects[name], data.tasks, Recorder(), random.Random(seed + i))
+    for i, name in enumerate(users)
+  ]
+  for client in clients:
+    response = client.login()
+    if response is None or response.status_code != 200:
+      raise RuntimeError(f"Could not log in as {client.username}")
+    client.recorder = recorder
+
+  names = [name for name in weights if weights[name] > 0]
+  operations = [OPERATIONS[name][0] for name in names]
+  relative = [weights[name] for name in names]
+  counter = iter(range(total))
+  lock = threading.Lock()
+
+  def worker(client):
+    while True:
+      with lock:
+        iteration = next(counter, None)
+      if iteration is None:
+        return
+      operation = client.rng.choices(operations, weights=relative)[0]
+      try:
+        operation(client)
+      except Exception as e:
+        recorder.record(f"! {operation.__name__}", 0.0, False)
+        print(f"{operation.__name__} failed: {e}")
+
+  threads = [threading.Thread(target=worker, args=(client,)) for client in clients]
+  start = time.perf_counter()
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  return recorder.summaries(time.perf_counter() - start)
@@ -0,0 +1,74 @@
+# loadgen.py
+# Shared helpers for the benchmark scripts: run a callable under a fixed
+# concurrency and summarize throughput and latency percentiles.
+
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Nearest-rank percentile of an already sorted list
+def percentile(sorted_values, p):
+  if not sorted_values:
+    return 0.0
+  rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+  return sorted_values[rank - 1]
+
+def summarize(latencies, errors, elapsed):
+  latencies = sorted(latencies)
+  completed = len(latencies)
+  return {
+    "requests": completed + errors,
+    "errors": errors,
+    "elapsed_s": round(elapsed, 3),
+    "throughput_rps": round(completed / elapsed, 2) if elapsed else 0.0,
+    "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+    "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+    "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+    "max_ms": round(latencies[-1] * 1000, 1) if latencies else 0.0,
+  }
+
+# Call task(worker_index, iteration) `total` times using `concurrency` threads.
+# task returns True on success, or a float to report its own latency in seconds
+# (to leave untimed setup/cleanup out); False and exceptions count as errors.
+# Returns a summary dict (see summarize)
+def run_load(task, concurrency, total):
+  latencies = []
+  errors = 0
+  lock = threading.Lock()
+  counter = iter(range(total))
+
+  def worker(worker_index):
+    nonlocal errors
+    while True:
+      with lock:
+        iteration = next(counter, None)
+      if iteration is None:
+        return
+      start = time.perf_counter()
+      try:
+        ok = task(worker_index, iteration)
+      except Exception:
+        ok = False
+      duration = time.perf_counter() - start
+      if ok is not True and isinstance(ok, float):
+        duration = ok
+      with lock:
+        if ok:
+          latencies.append(duration)
+        else:
+          errors += 1
+
+  start = time.perf_counter()
+  with ThreadPoolExecutor(max_workers=concurrency) as executor:
+    for worker_index in range(concurrency):
+      executor.submit(worker, worker_index)
+  elapsed = time.perf_counter() - start
+  return summarize(latencies, errors, elapsed)
+
+def print_report(name, summary):
+  print(
+    f"{name:<28} n={summary['requests']:<6} err={summary['errors']:<5} "
+    f"rps={summary['throughput_rps']:<8} p50={summary['p50_ms']}ms "
+    f"p95={summary['p95_ms']}ms p99={summary['p99_ms']}ms max={summary['max_ms']}ms"
+  )
@@ -0,0 +1,275 @@
+# mock_groq.py
+# Local stand-in for Groq's OpenAI-compatible chat completions API, used to
+# benchmark the AI routes without spending real quota.
+#
+# Point the app at it with GROQ_BASE_URL (read by the Groq client):
+#   python bench/mock_groq.py --port 8089 --latency lognormal:-0.5,0.4
+#   GROQ_BASE_URL=http://127.0.0.1:8089 GROQ_KEY=mock flask run
+#
+# Responses are schema-valid for both prompts the app sends:
+#   - brainstorm prompts get a helpers.ProjectIdea JSON object
+#   - task generation prompts get {"tasks_lists": [...]} with one entry per step
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+COMPLETIONS_PATH = "/openai/v1/chat/completions"
+
+# Parse a latency spec into a sampler returning seconds
+#   fixed:S            always S seconds
+#   uniform:LO,HI      uniformly distributed between LO and HI
+#   normal:MEAN,STD    normally distributed, clamped at 0
+#   lognormal:MU,SIGMA log-normally distributed (long upstream tail)
+def parse_latency(spec):
+  kind, _, args = spec.partition(":")
+  values = [float(v) for v in args.split(",")] if args else []
+  if kind == "fixed":
+    return lambda: values[0]
+  if kind == "uniform":
+    return lambda: random.uniform(values[0], values[1])
+  if kind == "normal":
+    return lambda: max(0.0, random.gauss(values[0], values[1]))
+  if kind == "lognormal":
+    return lambda: random.lognormvariate(values[0], values[1])
+  raise ValueError(f"Unknown latency distribution: {spec}")
+
+class MockGroqConfig:
+  def __init__(self, latency="fixed:0.5", error_rate=0.0, rate_limit_rate=0.0,
+               rpm=0, chunk_delay=0.02, seed=None):
+    self.latency = latency
+    self.sample_latency = parse_latency(latency)
+    # Fraction of requests answered with 500 Internal Server Error
+    self.error_rate = error_rate
+    # Fraction of requests answered with 429 Too Many Requests
+    self.rate_limit_rate = rate_limit_rate
+    # Hard requests-per-minute limit (0 disables); excess requests get 429
+    self.rpm = rpm
+    # Delay between streamed chunks
+    self.chunk_delay = chunk_delay
+    if seed is not None:
+      random.seed(seed)
+    self._window_start = time.monotonic()
+    self._window_count = 0
+    self._lock = threading.Lock()
+    self.stats = {"requests": 0, "ok": 0, "errors": 0, "rate_limited": 0}
+
+  # Sliding one-minute window for the hard RPM limit
+  def admit(self):
+    with self._lock:
+      self.stats["requests"] += 1
+      if not self.rpm:
+        return True
+      now = time.monotonic()
+      if now - self._window_start >= 60:
+        self._window_start = now
+        self._window_count = 0
+      self._window_count += 1
+      return self._window_count <= self.rpm
+
+  def count(self, key):
+    with self._lock:
+      self.stats[key] += 1
+
+# Rough token estimate, good enough for usage accounting in benchmarks
+def estimate_tokens(text):
+  return max(1, len(text) // 4)
+
+# Steps are listed one per tab-indented line after "Steps:" by
+# helpers.engineer_taskgen_prompt
+def extract_steps(prompt):
+  _, _, tail = prompt.partition("Steps:")
+  return [line.strip() for line in tail.splitlines() if line.strip()]
+
+def generate_tasks_lists(prompt):
+  steps = extract_steps(prompt) or ["Step 1"]
+  return {
+    "tasks_lists": [
+      {
+        "title": step,
+        "tasks": [f"{step}: task {i}" for i in range(1, random.randint(3, 5) + 1)],
+      }
+      for step in steps
+    ]
+  }
+
+def generate_project_idea(prompt):
+  using = re.search(r"using (.+?) in the", prompt)
+  languages = [l.strip() for l in re.split(r",| and ", using.group(1)) if l.strip()] if using else ["Python"]
+  topic = random.choice(["Tracker", "Dashboard", "Assistant", "Planner", "Analyzer"])
+  return {
+    "project_title": f"Mock {topic} {random.randint(100, 999)}",
+    "description": "A generated project idea returned by the local mock LLM server.",
+    "languages": languages,
+    "steps": [f"Step {i}: build part {i}" for i in range(1, random.randint(4, 8) + 1)],
+    "scale_up_ideas": ["Add user accounts", "Deploy to the cloud"],
+  }
+
+def generate_content(messages):
+  system = next((m["content"] for m in messages if m.get("role") == "system"), "")
+  user = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+  if "tasks_lists" in system:
+    body = generate_tasks_lists(user)
+  else:
+    body = generate_project_idea(user)
+  return json.dumps(body), estimate_tokens(system + user)
+
+class MockGroqHandler(BaseHTTPRequestHandler):
+  # Set on the server instance by make_server
+  config = None
+  protocol_version = "HTTP/1.1"
+
+  def log_message(self, format, *args):
+    pass
+
+  def send_json(self, status, body, headers=None):
+    payload = json.dumps(body).encode()
+    self.send_response(status)
+    self.send_header("Content-Type", "application/json")
+    self.send_header("Content-Length", str(len(payload)))
+    for key, value in (headers or {}).items():
+      self.send_header(key, value)
+    self.end_headers()
+    self.wfile.write(payload)
+
+  def do_POST(self):
+    config = self.server.config
+    length = int(self.headers.get("Content-Length", 0))
+    request = json.loads(self.rfile.read(length) or b"{}")
+    if self.path.rstrip("/") != COMPLETIONS_PATH:
+      self.send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+      return
+
+    if not config.admit() or random.random() < config.rate_limit_rate:
+      config.count("rate_limited")
+      self.send_json(
+        429,
+        {"error": {"message": "Rate limit reached", "type": "tokens", "code": "rate_limit_exceeded"}},
+        {"retry-after": "1"},
+      )
+      return
+
+    queue_start = time.perf_counter()
+    time.sleep(config.sample_latency())
+    if random.random() < config.error_rate:
+      config.count("errors")
+      self.send_json(500, {"error": {"message": "Internal server error", "type": "internal_server_error"}})
+      return
+
+    content, prompt_tokens = generate_content(request.get("messages", []))
+    completion_tokens = estimate_tokens(content)
+    total_time = time.perf_counter() - queue_start
+    completion_id = f"chatcmpl-{uuid.uuid4()}"
+    model = request.get("model", "llama3-8b-8192")
+    created = int(time.time())
+    usage = {
+      "prompt_tokens": prompt_tokens,
+      "completion_tokens": completion_tokens,
+      "total_tokens": prompt_tokens + completion_tokens,
+      "queue_time": 0.0,
+      "prompt_time": round(total_time * 0.1, 4),
+      "completion_time": round(total_time * 0.9, 4),
+      "total_time": round(total_time, 4),
+    }
+    config.count("ok")
+
+    if request.get("stream"):
+      self.stream(completion_id, model, created, content, usage)
+      return
+
+    self.send_json(200, {
+      "id": completion_id,
+      "object": "chat.completion",
+      "created": created,
+      "model": model,
+      "system_fingerprint": "fp_mock",
+      "choices": [{
+        "index": 0,
+        "message": {"role": "assistant", "content": content},
+        "logprobs": None,
+        "finish_reason": "stop",
+      }],
+      "usage": usage,
+      "x_groq": {"id": f"req_{uuid.uuid4().hex}"},
+    })
+
+  # Server-sent events in the OpenAI chunk format, terminated by [DONE]
+  def stream(self, completion_id, model, created, content, usage):
+    config = self.server.config
+    self.send_response(200)
+    self.send_header("Content-Type", "text/event-stream")
+    self.send_header("Transfer-Encoding", "chunked")
+    self.end_headers()
+
+    def write_event(data):
+      payload = f"data: {data}\n\n".encode()
+      self.wfile.write(f"{len(payload):X}\r\n".encode() + payload + b"\r\n")
+      self.wfile.flush()
+
+    pieces = [content[i:i + 16] for i in range(0, len(content), 16)]
+    for index, piece in enumerate(pieces):
+      chunk = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": created,
+        "model": model,
+        "choices": [{
+          "index": 0,
+          "delta": {"role": "assistant", "content": piece} if index == 0 else {"content": piece},
+          "finish_reason": None,
+        }],
+      }
+      if index == len(pieces) - 1:
+        chunk["choices"][0]["finish_reason"] = "stop"
+        chunk["x_groq"] = {"id": f"req_{uuid.uuid4().hex}", "usage": usage}
+      write_event(json.dumps(chunk))
+      time.sleep(config.chunk_delay)
+    write_event("[DONE]")
+    self.wfile.write(b"0\r\n\r\n")
+
+def make_server(config, host="127.0.0.1", port=8089):
+  server = ThreadingHTTPServer((host, port), MockGroqHandler)
+  server.daemon_threads = True
+  server.config = config
+  return server
+
+# Start the mock in a daemon thread. Returns (server, base_url); call
+# server.shutdown() to stop it
+def start_mock_groq(config=None, host="127.0.0.1", port=0):
+  server = make_server(config or MockGroqConfig(), host, port)
+  thread = threading.Thread(target=server.serve_forever, name="mock-groq", daemon=True)
+  thread.start()
+  return server, f"http://{host}:{server.server_address[1]}"
+
+def build_arg_parser():
+  parser = argparse.ArgumentParser(description="Local mock of the Groq chat completions API")
+  parser.add_argument("--host", default="127.0.0.1")
+  parser.add_argument("--port", type=int, default=8089)
+  parser.add_argument("--latency", default="fixed:0.5",
+                      help="fixed:S | uniform:LO,HI | normal:MEAN,STD | lognormal:MU,SIGMA")
+  parser.add_argument("--error-rate", type=float, default=0.0)
+  parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+  parser.add_argument("--rpm", type=int, default=0, help="Hard requests-per-minute limit (0 disables)")
+  parser.add_argument("--chunk-delay", type=float, default=0.02)
+  parser.add_argument("--seed", type=int, default=None)
+  return parser
+
+if __name__ == "__main__":
+  args = build_arg_parser().parse_args()
+  config = MockGroqConfig(
+    latency=args.latency, error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+    rpm=args.rpm, chunk_delay=args.chunk_delay, seed=args.seed,
+  )
+  server = make_server(config, args.host, args.port)
+  print(f"Mock Groq listening on http://{args.host}:{args.port} (latency {args.latency})")
+  try:
+    server.serve_forever()
+  except KeyboardInterrupt:
+    pass
+  finally:
+    print(f"Stats: {config.stats}")
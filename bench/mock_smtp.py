@@ -0,0 +1,128 @@
+# mock_smtp.py
+# Local stand-in for the SMTP server, used to exercise and benchmark the email
+# outbox without sending real mail. Speaks enough plain SMTP for smtplib
+# (EHLO/HELO, MAIL, RCPT, DATA, RSET, NOOP, QUIT); no TLS or AUTH, so run the
+# app with MAIL_USE_TLS=false and no MAIL_PASSWORD.
+#
+#   python bench/mock_smtp.py --port 8025 --latency fixed:0.05
+#   MAIL_SERVER=127.0.0.1 MAIL_PORT=8025 MAIL_USE_TLS=false flask run
+
+import argparse
+import random
+import socketserver
+import threading
+import time
+from mock_groq import parse_latency
+
+class MockSMTPConfig:
+  def __init__(self, latency="fixed:0", connect_latency="fixed:0", error_rate=0.0, seed=None):
+    self.latency = latency
+    # Delay before accepting each message (after DATA)
+    self.sample_latency = parse_latency(latency)
+    # Delay before the greeting, standing in for TCP/TLS/AUTH setup
+    self.sample_connect_latency = parse_latency(connect_latency)
+    # Fraction of messages rejected with 451 (a transient failure)
+    self.error_rate = error_rate
+    if seed is not None:
+      random.seed(seed)
+    self._lock = threading.Lock()
+    self.stats = {"connections": 0, "messages": 0, "rejected": 0}
+    # (sender, recipients, data) of every accepted message
+    self.messages = []
+
+  def count(self, key):
+    with self._lock:
+      self.stats[key] += 1
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+  def reply(self, line):
+    self.wfile.write(f"{line}\r\n".encode())
+
+  def handle(self):
+    config = self.server.config
+    config.count("connections")
+    time.sleep(config.sample_connect_latency())
+    self.reply("220 mock-smtp ready")
+    sender, recipients = None, []
+    while True:
+      line = self.rfile.readline()
+      if not line:
+        return
+      command = line.decode(errors="replace").strip()
+      verb = command[:4].upper()
+      if verb == "EHLO":
+        self.reply("250-mock-smtp")
+        self.reply("250 8BITMIME")
+      elif verb == "HELO":
+        self.reply("250 mock-smtp")
+      elif verb == "MAIL":
+        sender, recipients = command.partition(":")[2].strip(), []
+        self.reply("250 OK")
+      elif verb == "RCPT":
+        recipients.append(command.partition(":")[2].strip())
+        self.reply("250 OK")
+      elif verb == "DATA":
+        self.reply("354 End data with <CR><LF>.<CR><LF>")
+        data = []
+        while True:
+          chunk = self.rfile.readline()
+          if not chunk or chunk in (b".\r\n", b".\n"):
+            break
+          data.append(chunk)
+        time.sleep(config.sample_latency())
+        if random.random() < config.error_rate:
+          config.count("rejected")
+          self.reply("451 Temporary failure, try again later")
+        else:
+          config.count("messages")
+          with config._lock:
+            config.messages.append((sender, recipients, b"".join(data)))
+          self.reply("250 OK queued")
+        sender, recipients = None, []
+      elif verb == "RSET":
+        sender, recipients = None, []
+        self.reply("250 OK")
+      elif verb == "NOOP":
+        self.reply("250 OK")
+      elif verb == "QUIT":
+        self.reply("221 Bye")
+        return
+      else:
+        self.reply("502 Command not implemented")
+
+class MockSMTPServer(socketserver.ThreadingTCPServer):
+  daemon_threads = True
+  allow_reuse_address = True
+
+  def __init__(self, address, config):
+    super().__init__(address, SMTPHandler)
+    self.config = config
+
+# Start a mock server in a background thread. Returns (server, port); use
+# port=0 to pick a free one
+def start_mock_smtp(config, host="127.0.0.1", port=0):
+  server = MockSMTPServer((host, port), config)
+  thread = threading.Thread(target=server.serve_forever, daemon=True)
+  thread.start()
+  return server, server.server_address[1]
+
+def main():
+  parser = argparse.ArgumentParser(description="Mock SMTP server")
+  parser.add_argument("--host", default="127.0.0.1")
+  parser.add_argument("--port", type=int, default=8025)
+  parser.add_argument("--latency", default="fixed:0", help="per-message delay, e.g. uniform:0.05,0.2")
+  parser.add_argument("--connect-latency", default="fixed:0", help="delay before the greeting")
+  parser.add_argument("--error-rate", type=float, default=0.0)
+  args = parser.parse_args()
+  config = MockSMTPConfig(args.latency, args.connect_latency, args.error_rate)
+  server = MockSMTPServer((args.host, args.port), config)
+  print(f"Mock SMTP listening on {args.host}:{args.port}")
+  try:
+    server.serve_forever()
+  except KeyboardInterrupt:
+    pass
+  finally:
+    print(config.stats)
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,458 @@
+# bulk_import.py
+# Bulk import of projects with their tasks, for POST /project/import and
+# `flask import-projects`. The input is either
+#   NDJSON  one project per line, or
+#   JSON    a list of projects, or an object with a "projects" list (the
+#           file written by GET /user/export?format=json)
+# where a project is
+#   {"title": ..., "summary": ..., "steps": [...], "languages": [...],
+#    "status": 0|1, "owner": ..., "collaborator1": ..., "collaborator2": ...,
+#    "tasks": [{"description": ..., "priority": 1, "status": 1}, ...]}
+# Files written by GET /user/export import as they are; ids and dates in them
+# are ignored.
+#
+# The input is read and validated one record at a time, so memory use does
+# not depend on the file's size. Invalid records are reported with their
+# position (line for NDJSON, list index for JSON, both from 1) and skipped.
+# Valid ones are inserted IMPORT_BATCH_SIZE at a time, one transaction per
+# batch: the projects, all their tasks in one multi-row INSERT, their change
+# log rows, and one UPDATE of the members' counters on `users`.
+#
+# Projects imported without tasks can have them generated by the AI, one
+# project at a time after their batch has committed.
+
+import io
+import json
+import logging
+import time
+from datetime import datetime
+import click
+import mysql.connector
+from db import get_db_connection
+from change_log import change, record_changes
+
+logger = logging.getLogger(__name__)
+
+INSERT_PROJECT = (
+  "INSERT INTO projects (owner, collaborator1, collaborator2, title, summary, steps, languages, status, date_created) "
+  "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)"
+)
+INSERT_TASK = "INSERT INTO tasks (pid, description, priority, status) VALUES (%s, %s, %s, %s)"
+
+# Progress of an import over HTTP, by uploader and request id: the latest
+# report as JSON. Request ids come from clients, so they are only unique per user
+PROGRESS_KEY = "import:{}:{}"
+
+# Errors listed in a report; the rest are only counted
+MAX_ERRORS = 100
+
+# A record that cannot be imported
+class RecordError(ValueError):
+  pass
+
+# The input cannot be read any further (malformed JSON outside a record)
+class ImportFormatError(ValueError):
+  pass
+
+def iter_ndjson(stream):
+  for number, line in enumerate(stream, start=1):
+    line = line.strip()
+    if not line:
+      continue
+    try:
+      yield number, json.loads(line), None
+    except ValueError as e:
+      yield number, None, RecordError(f"Invalid JSON: {e}")
+
+# Items of a top-level JSON list (or of the "projects" list of a top-level
+# object), decoded one at a time from a text stream
+class JsonListReader:
+  def __init__(self, stream, chunk_size=65536, max_record_bytes=1024 * 1024):
+    self.stream = stream
+    self.chunk_size = chunk_size
+    self.max_record_bytes = max_record_bytes
+    self.decoder = json.JSONDecoder()
+    self.buffer = ""
+    self.pos = 0
+    self.eof = False
+
+  def _fill(self):
+    data = self.stream.read(self.chunk_size)
+    if not data:
+      self.eof = True
+      return
+    self.buffer = self.buffer[self.pos:] + data
+    self.pos = 0
+    if len(self.buffer) > self.max_record_bytes + self.chunk_size:
+      raise ImportFormatError(f"Malformed JSON, or a record larger than {self.max_record_bytes} bytes")
+
+  # Next non-whitespace character, without consuming it ("" at the end)
+  def _peek(self):
+    while True:
+      while self.pos < len(self.buffer) and self.buffer[self.pos] in " \t\r\n":
+        self.pos += 1
+      if self.pos < len(self.buffer) or self.eof:
+        return self.buffer[self.pos:self.pos + 1]
+      self._fill()
+
+  def _expect(self, characters):
+    character = self._peek()
+    if not character or character not in characters:
+      raise ImportFormatError(f"Expected one of {characters!r} in JSON, found {character or 'end of input'!r}")
+    self.pos += 1
+    return character
+
+  def _value(self):
+    self._peek()
+    while True:
+      try:
+        value, end = self.decoder.raw_decode(self.buffer, self.pos)
+        # A value that ends the buffer (e.g. a number) may continue in the
+        # next chunk
+        if end < len(self.buffer) or self.eof:
+          self.pos = end
+          return value
+      except ValueError as e:
+        if self.eof:
+          raise ImportFormatError(f"Invalid JSON: {e}")
+      self._fill()
+
+  def _items(self):
+    self._expect("[")
+    if self._peek() == "]":
+      self.pos += 1
+      return
+    while True:
+      yield self._value()
+      if self._expect(",]") == "]":
+        return
+
+  def __iter__(self):
+    first = self._peek()
+    if first == "[":
+      yield from self._items()
+      return
+    if first != "{":
+      raise ImportFormatError("Expected a JSON list of projects, or an object with a \"projects\" list")
+    self.pos += 1
+    found = False
+    if self._peek() == "}":
+      self.pos += 1
+    else:
+      while True:
+        key = self._value()
+        self._expect(":")
+        if key == "projects":
+          found = True
+          yield from self._items()
+        else:
+          self._value()
+        if self._expect(",}") == "}":
+          break
+    if not found:
+      raise ImportFormatError("No \"projects\" list in the JSON object")
+
+def iter_json(stream):
+  for number, record in enumerate(JsonListReader(stream), start=1):
+    yield number, record, None
+
+# (position, record, error) for every record of a binary stream
+def read_records(stream, format="ndjson"):
+  text = io.TextIOWrapper(stream, encoding="utf-8", errors="strict", newline="")
+  return iter_ndjson(text) if format == "ndjson" else iter_json(text)
+
+def _text(record, key, max_length, required=True):
+  value = record.get(key)
+  if value is None and not required:
+    return None
+  if not isinstance(value, str) or not value.strip():
+    raise RecordError(f"'{key}' must be a non-empty string")
+  if len(value) > max_length:
+    raise RecordError(f"'{key}' is longer than {max_length} characters")
+  return value
+
+def _strings(record, key):
+  value = record.get(key, [])
+  if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+    raise RecordError(f"'{key}' must be a list of strings")
+  return value
+
+def _integer(record, key, default, allowed=None):
+  value = record.get(key, default)
+  # bool is an int subclass; true/false are not valid here
+  if not isinstance(value, int) or isinstance(value, bool) or (allowed and value not in allowed):
+    raise RecordError(f"'{key}' must be {'one of ' + str(list(allowed)) if allowed else 'an integer'}")
+  return value
+
+# A record checked and normalized for insertion
+def validate(record, owner=None, may_set_owner=False):
+  if not isinstance(record, dict):
+    raise RecordError("Expected a JSON object")
+  project = {
+    "title": _text(record, "title", 100),
+    "summary": _text(record, "summary", 255),
+    "steps": _strings(record, "steps"),
+    "languages": _strings(record, "languages"),
+    "status": _integer(record, "status", 0, (0, 1)),
+    "owner": _text(record, "owner", 100, required=False) or owner,
+    "collaborator1": _text(record, "collaborator1", 100, required=False),
+    "collaborator2": _text(record, "collaborator2", 100, required=False),
+  }
+  if not project["owner"]:
+    raise RecordError("'owner' is required")
+  if project["owner"] != owner and not may_set_owner:
+    raise RecordError("Only administrators may import projects for other users")
+  names = members(project)
+  if len(set(names)) != len(names):
+    raise RecordError("The owner and collaborators must be different users")
+  tasks = record.get("tasks", [])
+  if not isinstance(tasks, list):
+    raise RecordError("'tasks' must be a list")
+  project["tasks"] = []
+  for task in tasks:
+    if not isinstance(task, dict):
+      raise RecordError("Each task must be a JSON object")
+    project["tasks"].append({
+      "description": _text(task, "description", 65535),
+      "priority": _integer(task, "priority", 1),
+      "status": _integer(task, "status", 1, (1, 2, 3)),
+    })
+  return project
+
+def members(project):
+  return [member for member in (project["owner"], project["collaborator1"], project["collaborator2"]) if member]
+
+class BulkImporter:
+  # connection      MySQL connection, owned by the caller
+  # owner           owner of records that name none (the uploading user)
+  # may_set_owner   records may name other owners (administrators, the CLI)
+  # project_limit   for non-administrators: the /project/create rule, i.e. no
+  #                 new project once the owner has more than this many
+  # generate        fn(title, summary, languages, steps, username) returning
+  #                 tasks lists (see routes/project_routes.generate_tasks_lists),
+  #                 or None to import projects without tasks as they are
+  # index           IdeaIndex the new projects are added to
+  # progress        fn(report), called after every batch
+  def __init__(self, connection, owner=None, may_set_owner=False, project_limit=None, batch_size=200,
+               generate=None, index=None, progress=None):
+    self.connection = connection
+    self.owner = owner
+    self.may_set_owner = may_set_owner
+    self.project_limit = project_limit
+    self.batch_size = batch_size
+    self.generate = generate
+    self.index = index
+    self.progress = progress
+    self._projects_owned = None
+    self.report = {"records": 0, "projects": 0, "tasks": 0, "invalid": 0, "batches": 0,
+                   "generated": 0, "generation_failed": 0, "errors": [], "aborted": None,
+                   "done": False, "seconds": 0.0, "projects_per_second": 0.0}
+    self._start = None
+
+  def _error(self, position, message):
+    self.report["invalid"] += 1
+    if len(self.report["errors"]) < MAX_ERRORS:
+      self.report["errors"].append({"record": position, "error": message})
+
+  # The /project/create limit, counted as records are accepted
+  def _within_limit(self, cursor):
+    if self.project_limit is None:
+      return True
+    if self._projects_owned is None:
+      try:
+        cursor.execute("SELECT projects FROM users WHERE username = %s", (self.owner,))
+        rows = cursor.fetchall()
+      except mysql.connector.Error as e:
+        # Checked again for the next record
+        raise RecordError(f"Database error: {e}") from e
+      self._projects_owned = rows[0][0] if rows else 0
+    if self._projects_owned > self.project_limit:
+      return False
+    self._projects_owned += 1
+    return True
+
+  def _insert_batch(self, cursor, batch):
+    # A member that does not exist would fail the whole batch on a foreign key
+    names = sorted({member for _, project in batch for member in members(project)})
+    try:
+      cursor.execute(f"SELECT username FROM users WHERE username IN ({', '.join(['%s'] * len(names))})", tuple(names))
+      known = {row[0] for row in cursor.fetchall()}
+    except mysql.connector.Error as e:
+      logger.warning("Import: batch of %d projects failed: %s", len(batch), e)
+      for position, _ in batch:
+        self._error(position, f"Database error: {e}")
+      return []
+    valid = []
+    for position, project in batch:
+      unknown = [member for member in members(project) if member not in known]
+      if unknown:
+        self._error(position, f"Unknown user: {unknown[0]}")
+      else:
+        valid.append((position, project))
+    if not valid:
+      return []
+
+    date_created = datetime.now()
+    task_rows, changes, counters = [], [], {}
+    try:
+      for _, project in valid:
+        cursor.execute(INSERT_PROJECT, (
+          project["owner"], project["collaborator1"], project["collaborator2"], project["title"],
+          project["summary"], json.dumps(project["steps"]), json.dumps(project["languages"]),
+          project["status"], date_created
+        ))
+        project["id"] = cursor.lastrowid
+        task_rows += [
+          (project["id"], task["description"], task["priority"], task["status"]) for task in project["tasks"]
+        ]
+        # Sync clients fetch the new project with all its tasks
+        changes.append(change(project["id"], "project", project["id"], "full"))
+        for member in members(project):
+          counts = counters.setdefault(member, [0, 0])
+          counts[0] += 1
+          counts[1] += project["status"]
+      if task_rows:
+        cursor.executemany(INSERT_TASK, task_rows)
+      record_changes(cursor, changes)
+      # Every member's projects/projects_completed counters in one statement
+      cases = " ".join(["WHEN %s THEN %s"] * len(counters))
+      cursor.execute(
+        f"UPDATE users SET projects = projects + CASE username {cases} END, "
+        f"projects_completed = projects_completed + CASE username {cases} END "
+        f"WHERE username IN ({', '.join(['%s'] * len(counters))})",
+        tuple(arg for name, (projects, _) in counters.items() for arg in (name, projects))
+        + tuple(arg for name, (_, completed) in counters.items() for arg in (name, completed))
+        + tuple(counters)
+      )
+      self.connection.commit()
+    except mysql.connector.Error as e:
+      self.connection.rollback()
+      logger.warning("Import: batch of %d projects failed: %s", len(valid), e)
+      for position, _ in valid:
+        self._error(position, f"Database error: {e}")
+      return []
+    self.report["projects"] += len(valid)
+    self.report["tasks"] += len(task_rows)
+    return [project for _, project in valid]
+
+  # AI tasks for a project imported without any, in its own transaction
+  def _generate_tasks(self, cursor, project):
+    try:
+      tasks_lists = self.generate(project["title"], project["summary"], project["languages"],
+                                  project["steps"], project["owner"])
+    except Exception as e:
+      # e.g. a prompt that cannot be built from the project's fields
+      logger.warning("Import: task generation failed for project %s: %s", project["id"], e)
+      tasks_lists = None
+    if tasks_lists is None:
+      self.report["generation_failed"] += 1
+      return
+    # Priority is the step number; status 1 is "to-do"
+    rows = [
+      (project["id"], task, priority, 1)
+      for priority, tasks_list in enumerate(tasks_lists, start=1)
+      for task in tasks_list.get('tasks', [])
+    ]
+    try:
+      if rows:
+        cursor.executemany(INSERT_TASK, rows)
+      record_changes(cursor, [change(project["id"], "project", project["id"], "full")])
+      self.connection.commit()
+    except mysql.connector.Error as e:
+      self.connection.rollback()
+      self.report["generation_failed"] += 1
+      logger.warning("Import: could not save tasks for project %s: %s", project["id"], e)
+      return
+    self.report["generated"] += 1
+    self.report["tasks"] += len(rows)
+
+  def _flush(self, cursor, batch):
+    if not batch:
+      return
+    projects = self._insert_batch(cursor, batch)
+    self.report["batches"] += 1
+    for project in projects:
+      if self.index is not None:
+        try:
+          self.index.add(project["id"], project["title"], project["summary"], project["languages"], project["steps"])
+        except Exception as e:
+          logger.error("Error indexing project %s: %s", project["id"], e)
+      if self.generate and not project["tasks"]:
+        self._generate_tasks(cursor, project)
+    self._update_progress()
+
+  def _update_progress(self):
+    self.report["seconds"] = round(time.perf_counter() - self._start, 3)
+    if self.report["seconds"]:
+      self.report["projects_per_second"] = round(self.report["projects"] / self.report["seconds"], 1)
+    if self.progress:
+      self.progress(self.report)
+
+  # Import every (position, record, error) from read_records(). Returns the report
+  def run(self, records):
+    self._start = time.perf_counter()
+    cursor = self.connection.cursor()
+    batch = []
+    try:
+      for position, record, error in records:
+        self.report["records"] += 1
+        try:
+          if error:
+            raise error
+          project = validate(record, self.owner, self.may_set_owner)
+          if not self._within_limit(cursor):
+            raise RecordError(f"User {project['owner']} already has too many projects in progress")
+        except RecordError as e:
+          self._error(position, str(e))
+          continue
+        batch.append((position, project))
+        if len(batch) >= self.batch_size:
+          self._flush(cursor, batch)
+          batch = []
+      self._flush(cursor, batch)
+    except (ImportFormatError, UnicodeDecodeError) as e:
+      # Whole batches already imported stay imported
+      self._flush(cursor, batch)
+      self.report["aborted"] = str(e)
+    finally:
+      cursor.close()
+    self.report["done"] = True
+    self._update_progress()
+    return self.report
+
+def register_cli(app):
+  @app.cli.command("import-projects")
+  @click.argument("path", type=click.Path(exists=True, dir_okay=False))
+  @click.option("--owner", default=None, help="Owner of records that do not name one")
+  @click.option("--format", "format", type=click.Choice(["ndjson", "json"]), default=None,
+                help="Input format (default: from the file extension)")
+  @click.option("--batch-size", type=int, default=None, help="Projects per transaction (default IMPORT_BATCH_SIZE)")
+  @click.option("--skip-ai", is_flag=True, help="Do not generate tasks for projects imported without any")
+  def import_projects(path, owner, format, batch_size, skip_ai):
+    from routes.project_routes import generate_tasks_lists
+    format = format or ("json" if path.endswith(".json") else "ndjson")
+    connection = get_db_connection()
+    if not connection:
+      raise click.ClickException("Failed to connect to database")
+
+    def progress(report):
+      click.echo(
+        f"{report['records']} records: {report['projects']} projects, {report['tasks']} tasks, "
+        f"{report['invalid']} invalid ({report['projects_per_second']} projects/s)"
+      )
+
+    importer = BulkImporter(
+      connection, owner=owner, may_set_owner=True,
+      batch_size=batch_size or app.config['IMPORT_BATCH_SIZE'],
+      generate=None if skip_ai else generate_tasks_lists,
+      index=app.idea_index, progress=progress
+    )
+    try:
+      with open(path, "rb") as f:
+        report = importer.run(read_records(f, format))
+    finally:
+      connection.close()
+    for error in report["errors"]:
+      click.echo(f"Record {error['record']}: {error['error']}", err=True)
+    if report["aborted"]:
+      raise click.ClickException(f"Import stopped: {report['aborted']}")
@@ -0,0 +1,64 @@
+# change_log.py
+# Append-only log of project and task changes, read by GET /sync so clients
+# can fetch only what changed since their last load. Write routes add rows in
+# the same transaction as the change itself:
+#   entity   'project' or 'task'
+#   op       'upsert'  the row was created or updated
+#            'delete'  the row was deleted
+#            'full'    the project and all its tasks should be (re)sent, e.g.
+#                      a new project, or a project just shared with `member`
+#   member   NULL: applies to everyone on the project. Set: applies only to
+#            that user, e.g. a project deleted (the project row is gone, so
+#            its team can only be found here) or a collaborator removed
+#
+# Rows older than SYNC_RETENTION_DAYS are removed by `flask prune-changes`;
+# clients with an older cursor get a full reload.
+
+import click
+from db import get_db_connection
+
+INSERT_CHANGE = "INSERT INTO changes (pid, entity, entity_id, op, member) VALUES (%s, %s, %s, %s, %s)"
+
+def change(pid, entity, entity_id, op, member=None):
+  return (pid, entity, entity_id, op, member)
+
+# Changes for a project that is being deleted: one per team member
+def project_deleted(pid, *members):
+  return [change(pid, "project", pid, "delete", member) for member in members if member]
+
+# Append changes using the caller's cursor, inside its transaction
+def record_changes(cursor, changes):
+  if changes:
+    cursor.executemany(INSERT_CHANGE, changes)
+
+async def record_changes_async(cursor, changes):
+  if changes:
+    await cursor.executemany(INSERT_CHANGE, changes)
+
+def register_cli(app):
+  @app.cli.command("prune-changes")
+  @click.option("--days", type=int, default=None, help="Keep this many days (default SYNC_RETENTION_DAYS)")
+  def prune_changes(days):
+    days = app.config['SYNC_RETENTION_DAYS'] if days is None else days
+    connection = get_db_connection()
+    if not connection:
+      raise click.ClickException("Failed to connect to database")
+    try:
+      cursor = connection.cursor()
+      # The newest row is always kept, so the oldest remaining id tells /sync
+      # which cursors are too old
+      total = 0
+      while True:
+        cursor.execute(
+          "DELETE FROM changes WHERE created_at < NOW() - INTERVAL %s DAY "
+          "AND id < (SELECT max_id FROM (SELECT MAX(id) AS max_id FROM changes) AS newest) LIMIT 10000",
+          (days,)
+        )
+        connection.commit()
+        total += cursor.rowcount
+        if cursor.rowcount < 10000:
+          break
+      click.echo(f"Deleted {total} changes older than {days} days")
+    finally:
+      cursor.close()
+      connection.close()
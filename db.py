@@ -1,29 +1,70 @@
 # db.py
+import logging
 import os
+import threading
 import mysql.connector
 from mysql.connector import Error
+from mysql.connector.pooling import MySQLConnectionPool
+from query_stats import instrument
 
-# Connect to database
+logger = logging.getLogger(__name__)
+
+# Optional per-process connection pool (DB_POOL_SIZE > 0). Created lazily so a
+# pre-fork server never shares pooled sockets between workers
+_pool = None
+_pool_lock = threading.Lock()
+
+def connection_settings():
+  return {
+    "user": os.getenv("ADMIN_USER"),
+    "password": os.getenv("ADMIN_PASSWORD"),
+    "host": os.getenv("ENDPOINT"),
+    "port": int(os.getenv("DB_PORT", 3306)),
+    "database": os.getenv("DB_NAME"),
+    # The pure-Python driver cooperates with gevent's monkey patching
+    "use_pure": os.getenv("MYSQL_USE_PURE", "false").lower() == "true",
+  }
+
+def get_db_pool(pool_size):
+  global _pool
+  with _pool_lock:
+    if _pool is None:
+      _pool = MySQLConnectionPool(pool_name="devstorm", pool_size=pool_size, **connection_settings())
+    return _pool
+
+# Size and idle connections of this process's pool, or None if there is none
+def get_pool_stats():
+  pool = _pool
+  if pool is None:
+    return None
+  return {"size": pool.pool_size, "idle": pool._cnx_queue.qsize()}
+
+# Forget the pool, e.g. in a freshly forked worker
+def reset_db_pool():
+  global _pool
+  with _pool_lock:
+    _pool = None
+
+# Connect to database. With DB_POOL_SIZE set, connections come from the pool
+# and close() returns them to it. Inside a request, statements are timed (see
+# query_stats.py)
 def get_db_connection():
   try:
-    connection = mysql.connector.connect(
-      user=os.getenv("ADMIN_USER"), 
-      password=os.getenv("ADMIN_PASSWORD"), 
-      host=os.getenv("ENDPOINT"), 
-      port=3306, 
-      database=os.getenv("DB_NAME")
-    )
-    return connection
+    pool_size = int(os.getenv("DB_POOL_SIZE", 0))
+    if pool_size:
+      return instrument(get_db_pool(pool_size).get_connection())
+    connection = mysql.connector.connect(**connection_settings())
+    return instrument(connection)
   except mysql.connector.InterfaceError as e:
-    print(f"Interface error: {e}")
+    logger.error("Interface error: %s", e)
   except mysql.connector.ProgrammingError as e:
-    print(f"Programming error: {e}")
+    logger.error("Programming error: %s", e)
   except mysql.connector.DatabaseError as e:
-    print(f"Database error: {e}")
+    logger.error("Database error: %s", e)
   except Error as e:
-    print(f"MySQL error: {e}")
+    logger.error("MySQL error: %s", e)
   except Exception as e:
-    print(f"Unexpected error: {e}")
+    logger.error("Unexpected error: %s", e)
   return None
 
 # Generate table to store user information
@@ -52,20 +93,27 @@ def create_users_table():
                 projects INT DEFAULT 0,
                 projects_completed INT DEFAULT 0,
                 date_joined DATETIME,
-                bio VARCHAR(500) DEFAULT NULL
+                bio VARCHAR(500) DEFAULT NULL,
+                reminded_at DATETIME DEFAULT NULL
             );
         """)
+      # Tables created before confirmation reminders were recorded
+      cursor.execute(
+        "SELECT column_name FROM information_schema.columns WHERE table_schema = DATABASE() AND table_name = 'users'"
+      )
+      if "reminded_at" not in {row[0] for row in cursor.fetchall()}:
+        cursor.execute("ALTER TABLE users ADD COLUMN reminded_at DATETIME DEFAULT NULL")
       
       # Commit changes
       connection.commit()
     except mysql.connector.Error as e:
-      print(f"Error creating 'users' table: {e}")
+      logger.error("Error creating 'users' table: %s", e)
     finally:
       # Close resources
       cursor.close()
       connection.close()
   else:
-    print("Failed to connect to database. Could not create 'users' table.")
+    logger.error("Failed to connect to database. Could not create 'users' table.")
     
 def create_projects_table():
   connection = get_db_connection()
@@ -103,13 +151,13 @@ def create_projects_table():
       # Commit changes
       connection.commit()
     except mysql.connector.Error as e:
-      print(f"Error creating 'projects' table: {e}")
+      logger.error("Error creating 'projects' table: %s", e)
     finally:
       # Close resources
       cursor.close()
       connection.close()
   else:
-    print("Failed to connect to database. Could not create 'projects' table.")
+    logger.error("Failed to connect to database. Could not create 'projects' table.")
     
 def create_tasks_table():
   connection = get_db_connection()
@@ -126,6 +174,9 @@ def create_tasks_table():
       #             1: To-do
       #             2: In progress
       #             3: Completed
+      #   status_ts, priority_ts: when the current value was acknowledged
+      #             (epoch seconds), for ordering coalesced writes (see
+      #             task_writes.py)
       cursor.execute("""
           CREATE TABLE IF NOT EXISTS tasks (
                 id INT AUTO_INCREMENT PRIMARY KEY, 
@@ -133,47 +184,97 @@ def create_tasks_table():
                 description TEXT, 
                 priority INT,
                 status INT,
+                status_ts DOUBLE DEFAULT NULL,
+                priority_ts DOUBLE DEFAULT NULL,
                 FOREIGN KEY (pid) REFERENCES projects(id)
             );
         """)
+      # Tables created before the version columns existed
+      cursor.execute(
+        "SELECT column_name FROM information_schema.columns WHERE table_schema = DATABASE() AND table_name = 'tasks'"
+      )
+      columns = {row[0] for row in cursor.fetchall()}
+      for column in ("status_ts", "priority_ts"):
+        if column not in columns:
+          cursor.execute(f"ALTER TABLE tasks ADD COLUMN {column} DOUBLE DEFAULT NULL")
       # print("Created table 'tasks.'")
       
       # Commit changes
       connection.commit()
     except mysql.connector.Error as e:
-      print(f"Error creating 'tasks' table: {e}")
+      logger.error("Error creating 'tasks' table: %s", e)
+    finally:
+      # Close resources
+      cursor.close()
+      connection.close()
+  else:
+    logger.error("Failed to connect to database. Could not create 'tasks' table.")
+
+def create_changes_table():
+  connection = get_db_connection()
+  if connection:
+    cursor = connection.cursor()
+    try:
+      # Create table (see change_log.py)
+      #   entity:   'project' or 'task'
+      #   op:       'upsert', 'delete' or 'full'
+      #   member:   NULL for changes seen by the whole project team, else the
+      #             one user the change is for
+      # No foreign keys: rows outlive the projects and tasks they describe
+      cursor.execute("""
+          CREATE TABLE IF NOT EXISTS changes (
+                id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                pid INT NOT NULL,
+                entity VARCHAR(7) NOT NULL,
+                entity_id INT NOT NULL,
+                op VARCHAR(6) NOT NULL,
+                member VARCHAR(100) DEFAULT NULL,
+                created_at DATETIME(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3),
+                INDEX changes_pid (pid, id),
+                INDEX changes_member (member, id),
+                INDEX changes_created_at (created_at)
+            );
+        """)
+      
+      # Commit changes
+      connection.commit()
+    except mysql.connector.Error as e:
+      logger.error("Error creating 'changes' table: %s", e)
     finally:
       # Close resources
       cursor.close()
       connection.close()
   else:
-    print("Failed to connect to database. Could not create 'tasks' table.")
+    logger.error("Failed to connect to database. Could not create 'changes' table.")
     
 def drop_tables():
   connection = get_db_connection()
   if connection:
     cursor = connection.cursor()
     try:
+      cursor.execute("DROP TABLE IF EXISTS changes;")
+      logger.info("Finished dropping 'changes' table (if existed).")
+      
       # Drop the 'tasks' table first, as it has the foreign key constraint on 'projects'
       cursor.execute("DROP TABLE IF EXISTS tasks;")
-      print("Finished dropping 'tasks' table (if existed).")
+      logger.info("Finished dropping 'tasks' table (if existed).")
         
       # Now, drop the 'projects' table second, as it has the foreign key constraint on 'users'
       cursor.execute("DROP TABLE IF EXISTS projects;")
-      print("Finished dropping 'projects' table (if existed).")
+      logger.info("Finished dropping 'projects' table (if existed).")
         
       # Finally, drop the 'users' table
       cursor.execute("DROP TABLE IF EXISTS users;")
-      print("Finished dropping 'users' table (if existed).")
+      logger.info("Finished dropping 'users' table (if existed).")
         
       # Commit the changes
       connection.commit()
-      print("Tables dropped successfully.")
+      logger.info("Tables dropped successfully.")
     except Exception as e:
-      print(f"Error dropping tables: {str(e)}")
+      logger.error("Error dropping tables: %s", e)
     finally:
       # Close resources
       cursor.close()
       connection.close()
   else:
-    print("Failed to connect to database. Could not drop tables.")
+    logger.error("Failed to connect to database. Could not drop tables.")
@@ -0,0 +1,226 @@
+# email_outbox.py
+# Outbound email queue. Requests enqueue rendered messages in Redis and return
+# immediately; a background sender delivers them in batches over a persistent
+# SMTP connection, retrying failures with backoff. Only one process sends at
+# a time, so the SMTP server sees a single long-lived session.
+#
+# Redis keys (in the cache database):
+#   mail:outbox      list of pending messages (JSON), oldest at the right
+#   mail:processing  messages taken by the sender but not yet delivered
+#   mail:retry       sorted set of failed messages, scored by retry time
+#   mail:dead        messages that failed MAIL_OUTBOX_MAX_ATTEMPTS times
+#   mail:sender      held by the process currently sending. Renewed right
+#                    before every message, and SMTP socket operations time
+#                    out after send_timeout, so the lock does not lapse
+#                    mid-send and let another process requeue and resend the
+#                    batch
+
+import json
+import logging
+import smtplib
+import threading
+import time
+import uuid
+import redis
+from flask_mail import Message
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_KEY = "mail:outbox"
+PROCESSING_KEY = "mail:processing"
+RETRY_KEY = "mail:retry"
+DEAD_KEY = "mail:dead"
+SENDER_KEY = "mail:sender"
+
+class EmailOutbox:
+  def __init__(self, app, cache, batch_size=50, max_attempts=5, retry_seconds=30,
+               idle_timeout=60, send_timeout=20):
+    self.app = app
+    self.cache = cache
+    # Maximum messages taken from the outbox per batch
+    self.batch_size = batch_size
+    # Delivery attempts before a message is moved to mail:dead
+    self.max_attempts = max_attempts
+    # Delay before the first retry; doubled for every further attempt
+    self.retry_seconds = retry_seconds
+    # Seconds without mail after which the SMTP connection is closed
+    self.idle_timeout = idle_timeout
+    # SMTP socket timeout while sending. The sender lock lives longer than
+    # that, and is renewed before each message
+    self.send_timeout = send_timeout
+    self.lock_seconds = int(send_timeout) + 10
+    self.stats = {"enqueued": 0, "sent": 0, "failed": 0, "dead": 0, "batches": 0, "connections": 0,
+                  "lock_lost": 0}
+    self._connection = None
+    self._last_used = 0
+    self._token = uuid.uuid4().hex
+    self._stop = threading.Event()
+    self._thread = None
+
+  def _entry(self, to, subject, html):
+    return {
+      "id": uuid.uuid4().hex,
+      "to": to,
+      "subject": subject,
+      "html": html,
+      "attempts": 0,
+      "enqueued_at": time.time(),
+    }
+
+  def enqueue(self, to, subject, html):
+    entry = self._entry(to, subject, html)
+    self.cache.lpush(OUTBOX_KEY, json.dumps(entry))
+    self.stats["enqueued"] += 1
+    return entry["id"]
+
+  # Queue many (to, subject, html) messages in one round-trip
+  def enqueue_many(self, messages):
+    entries = [json.dumps(self._entry(*message)) for message in messages]
+    if entries:
+      self.cache.lpush(OUTBOX_KEY, *entries)
+      self.stats["enqueued"] += len(entries)
+    return len(entries)
+
+  def pending(self):
+    pipe = self.cache.pipeline(transaction=False)
+    pipe.llen(OUTBOX_KEY)
+    pipe.llen(PROCESSING_KEY)
+    pipe.zcard(RETRY_KEY)
+    pipe.llen(DEAD_KEY)
+    outbox, processing, retry, dead = pipe.execute()
+    return {"outbox": outbox, "processing": processing, "retry": retry, "dead": dead}
+
+  # Hold (or renew) the sender lock. Returns True if this process is the sender
+  def _hold_lock(self):
+    if self.cache.set(SENDER_KEY, self._token, nx=True, ex=self.lock_seconds):
+      # Newly acquired: requeue anything a crashed sender left in processing
+      while self.cache.lmove(PROCESSING_KEY, OUTBOX_KEY, "LEFT", "RIGHT"):
+        pass
+      return True
+    return self._renew_lock()
+
+  # Extend the sender lock if this process still holds it
+  def _renew_lock(self):
+    with self.cache.pipeline() as pipe:
+      try:
+        pipe.watch(SENDER_KEY)
+        if pipe.get(SENDER_KEY) != self._token:
+          return False
+        pipe.multi()
+        pipe.expire(SENDER_KEY, self.lock_seconds)
+        pipe.execute()
+        return True
+      except redis.WatchError:
+        return False
+
+  # Move retries that are due back to the outbox
+  def _promote_retries(self):
+    due = self.cache.zrangebyscore(RETRY_KEY, 0, time.time())
+    for entry in due:
+      if self.cache.zrem(RETRY_KEY, entry):
+        self.cache.rpush(OUTBOX_KEY, entry)
+
+  # Take up to batch_size messages, waiting up to `timeout` for the first
+  def _take_batch(self, timeout=1):
+    first = self.cache.blmove(OUTBOX_KEY, PROCESSING_KEY, timeout, "RIGHT", "LEFT")
+    if first is None:
+      return []
+    batch = [first]
+    while len(batch) < self.batch_size:
+      entry = self.cache.lmove(OUTBOX_KEY, PROCESSING_KEY, "RIGHT", "LEFT")
+      if entry is None:
+        break
+      batch.append(entry)
+    return batch
+
+  def _connect(self):
+    if self._connection is None:
+      mail = self.app.extensions["mail"]
+      self._connection = mail.connect().__enter__()
+      self.stats["connections"] += 1
+    return self._connection
+
+  def _disconnect(self):
+    if self._connection is not None:
+      try:
+        self._connection.__exit__(None, None, None)
+      except (smtplib.SMTPException, OSError):
+        pass
+      self._connection = None
+
+  def _fail(self, raw, entry, error):
+    entry["attempts"] += 1
+    entry["last_error"] = str(error)
+    self.stats["failed"] += 1
+    pipe = self.cache.pipeline()
+    pipe.lrem(PROCESSING_KEY, 1, raw)
+    if entry["attempts"] >= self.max_attempts:
+      pipe.lpush(DEAD_KEY, json.dumps(entry))
+      self.stats["dead"] += 1
+      logger.error("Email outbox: giving up on %s to %s: %s", entry["id"], entry["to"], error)
+    else:
+      delay = self.retry_seconds * 2 ** (entry["attempts"] - 1)
+      pipe.zadd(RETRY_KEY, {json.dumps(entry): time.time() + delay})
+      logger.warning("Email outbox: %s to %s failed, retrying in %ss: %s",
+                     entry["id"], entry["to"], delay, error)
+    pipe.execute()
+
+  # Deliver one batch over the shared connection. Must run in an app context.
+  # Stops early if the sender lock was lost; the new sender requeues the rest
+  def send_batch(self, batch):
+    sender = self.app.config["MAIL_DEFAULT_SENDER"]
+    for raw in batch:
+      entry = json.loads(raw)
+      message = Message(entry["subject"], recipients=[entry["to"]], html=entry["html"], sender=sender)
+      try:
+        connection = self._connect()
+        # Connecting may have taken a while: check the lock right before sending
+        if not self._renew_lock():
+          self.stats["lock_lost"] += 1
+          logger.warning("Email outbox: sender lock lost, leaving the rest of the batch")
+          break
+        if connection.host is not None and connection.host.sock is not None:
+          connection.host.sock.settimeout(self.send_timeout)
+        connection.send(message)
+      except (smtplib.SMTPException, OSError) as e:
+        # A rejected message leaves the session usable; anything else
+        # (disconnects, socket errors) means reconnecting for the next one
+        if not isinstance(e, (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused)):
+          self._disconnect()
+        self._fail(raw, entry, e)
+        continue
+      self.cache.lrem(PROCESSING_KEY, 1, raw)
+      self.stats["sent"] += 1
+    self._last_used = time.monotonic()
+    self.stats["batches"] += 1
+
+  def run(self):
+    with self.app.app_context():
+      while not self._stop.is_set():
+        try:
+          if not self._hold_lock():
+            self._disconnect()
+            self._stop.wait(5)
+            continue
+          self._promote_retries()
+          batch = self._take_batch()
+          if batch:
+            self.send_batch(batch)
+          elif self._connection and time.monotonic() - self._last_used > self.idle_timeout:
+            self._disconnect()
+        except Exception as e:
+          logger.warning("Email outbox: sender error: %s", e)
+          self._disconnect()
+          self._stop.wait(1)
+      self._disconnect()
+      if self.cache.get(SENDER_KEY) == self._token:
+        self.cache.delete(SENDER_KEY)
+
+  def start(self):
+    if self._thread is None or not self._thread.is_alive():
+      self._stop.clear()
+      self._thread = threading.Thread(target=self.run, name="email-outbox", daemon=True)
+      self._thread.start()
+
+  def stop(self):
+    self._stop.set()
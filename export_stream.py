@@ -0,0 +1,193 @@
+# export_stream.py
+# Streaming export of a user's projects with their tasks, for GET /user/export.
+# Everything comes from one query: the user's projects joined to their tasks,
+# ordered by project then task, read from an unbuffered (server-side) cursor
+# EXPORT_FETCH_ROWS at a time. Each project is written as soon as its last
+# task has been read, so memory use does not grow with the account's size.
+#
+# Formats:
+#   ndjson  one project per line, with a "tasks" list
+#   json    {"username": ..., "projects": [...]}, same project objects
+#   csv     one row per task, project columns repeated; a project without
+#           tasks gets one row with empty task columns
+#
+# Output is buffered into chunks of about EXPORT_CHUNK_BYTES and, when gzip is
+# requested, compressed chunk by chunk.
+
+import csv
+import io
+import json
+import logging
+import zlib
+import mysql.connector
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+  "ndjson": "application/x-ndjson",
+  "json": "application/json",
+  "csv": "text/csv",
+}
+
+EXPORT_QUERY = (
+  "SELECT p.id, p.owner, p.collaborator1, p.collaborator2, p.title, p.summary, "
+  "p.steps, p.languages, p.status, p.date_created, t.id, t.description, t.priority, t.status "
+  "FROM (SELECT id FROM projects WHERE owner = %s "
+  "UNION SELECT id FROM projects WHERE collaborator1 = %s "
+  "UNION SELECT id FROM projects WHERE collaborator2 = %s) AS mine "
+  "JOIN projects p ON p.id = mine.id "
+  "LEFT JOIN tasks t ON t.pid = p.id "
+  "ORDER BY p.id, t.id"
+)
+
+CSV_COLUMNS = [
+  "project_id", "owner", "collaborator1", "collaborator2", "title", "summary", "steps",
+  "languages", "project_status", "date_created", "task_id", "description", "priority", "task_status"
+]
+
+def project_from_row(row):
+  return {
+    "id": row[0],
+    "owner": row[1],
+    "collaborator1": row[2],
+    "collaborator2": row[3],
+    "title": row[4],
+    "summary": row[5],
+    # Convert JSON strings to list format
+    "steps": json.loads(row[6]),
+    "languages": json.loads(row[7]),
+    "status": row[8],
+    "date_created": row[9],
+    "tasks": []
+  }
+
+def task_from_row(row):
+  if row[10] is None:
+    return None
+  return {"id": row[10], "pid": row[0], "description": row[11], "priority": row[12], "status": row[13]}
+
+# Projects, each with all of its tasks, from the ordered rows of `cursor`.
+# `merge`, if given, is called with each fetched batch of task dicts (used to
+# overlay queued task writes)
+def iter_projects(cursor, fetch_rows=1000, merge=None):
+  project = None
+  while True:
+    rows = cursor.fetchmany(fetch_rows)
+    if not rows:
+      break
+    tasks = [task_from_row(row) for row in rows]
+    if merge:
+      merge([task for task in tasks if task])
+    for row, task in zip(rows, tasks):
+      if project is None or project["id"] != row[0]:
+        if project is not None:
+          yield project
+        project = project_from_row(row)
+      if task:
+        del task["pid"]
+        project["tasks"].append(task)
+  if project is not None:
+    yield project
+
+# Encoded text pieces for `projects` in `format`. `dumps` encodes one object
+# (the app's JSON provider, so dates match the other endpoints)
+def encode(projects, format, dumps, username=None):
+  if format == "ndjson":
+    for project in projects:
+      yield dumps(project) + "\n"
+  elif format == "json":
+    yield '{"username": ' + dumps(username) + ', "projects": ['
+    separator = ""
+    for project in projects:
+      yield separator + dumps(project)
+      separator = ", "
+    yield "]}\n"
+  else:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    for project in projects:
+      columns = [
+        project["id"], project["owner"], project["collaborator1"], project["collaborator2"],
+        project["title"], project["summary"], json.dumps(project["steps"]),
+        json.dumps(project["languages"]), project["status"], project["date_created"]
+      ]
+      for task in project["tasks"] or [None]:
+        if task:
+          writer.writerow(columns + [task["id"], task["description"], task["priority"], task["status"]])
+        else:
+          writer.writerow(columns + ["", "", "", ""])
+      yield buffer.getvalue()
+      buffer.seek(0)
+      buffer.truncate()
+
+# Join text pieces into byte chunks of about `chunk_bytes`, gzipped if asked
+def chunked(pieces, chunk_bytes=65536, gzip_level=None):
+  compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 31) if gzip_level is not None else None
+  buffer, size = [], 0
+  for piece in pieces:
+    data = piece.encode("utf-8")
+    buffer.append(data)
+    size += len(data)
+    if size >= chunk_bytes:
+      data = b"".join(buffer)
+      buffer, size = [], 0
+      if compressor:
+        data = compressor.compress(data)
+      if data:
+        yield data
+  data = b"".join(buffer)
+  if compressor:
+    data = compressor.compress(data) + compressor.flush()
+  if data:
+    yield data
+
+# Response body for `username`'s export. Owns `connection` and a slot taken
+# from `slots`; both are released by close(), which the server calls when the
+# response is finished or the client goes away, even before the first chunk
+class ExportStream:
+  def __init__(self, connection, slots, username, format, dumps, fetch_rows=1000, chunk_bytes=65536,
+               gzip_level=None, merge=None):
+    self.connection = connection
+    self.slots = slots
+    self.username = username
+    self.format = format
+    self.dumps = dumps
+    self.fetch_rows = fetch_rows
+    self.chunk_bytes = chunk_bytes
+    self.gzip_level = gzip_level
+    self.merge = merge
+    self.finished = False
+    self.closed = False
+
+  def __iter__(self):
+    cursor = self.connection.cursor(buffered=False)
+    try:
+      cursor.execute(EXPORT_QUERY, (self.username, self.username, self.username))
+      projects = iter_projects(cursor, fetch_rows=self.fetch_rows, merge=self.merge)
+      pieces = encode(projects, self.format, self.dumps, self.username)
+      yield from chunked(pieces, self.chunk_bytes, self.gzip_level)
+      self.finished = True
+      cursor.close()
+    except mysql.connector.Error as e:
+      # Headers are already sent; the client sees a truncated file
+      logger.error("Export for %s failed: %s", self.username, e)
+
+  def close(self):
+    if self.closed:
+      return
+    self.closed = True
+    try:
+      if not self.finished:
+        # Rows may be left unread on the server: drop the session rather
+        # than read them all. A pool reconnects it on next use
+        try:
+          self.connection.disconnect()
+        except mysql.connector.Error:
+          pass
+      try:
+        self.connection.close()
+      except mysql.connector.Error:
+        pass
+    finally:
+      self.slots.release()
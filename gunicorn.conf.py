@@ -0,0 +1,103 @@
+# gunicorn.conf.py
+# Production server settings:
+#   gunicorn -c gunicorn.conf.py main:app
+#
+# Every setting can be overridden from the environment (GUNICORN_*). Most of
+# the time in a request is spent waiting on Groq, MySQL or Redis, so the
+# default worker model is threaded (gthread): a few processes, each with
+# several threads. Set GUNICORN_WORKER_CLASS=gevent (pip install gevent) to
+# serve many more concurrent AI requests per process with greenlets, or sync
+# for one request per process.
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+# Background threads are started per worker in post_fork, not at import
+os.environ.setdefault("DEFER_BACKGROUND_WORKERS", "true")
+
+# Workers write their metrics here so /metrics can aggregate all of them
+# (see metrics.py). Must be set before the app is imported
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "devstorm-metrics"))
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+cpu_count = multiprocessing.cpu_count()
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+
+if worker_class == "sync":
+  default_workers = cpu_count * 2 + 1
+else:
+  default_workers = cpu_count + 1
+workers = int(os.getenv("GUNICORN_WORKERS", default_workers))
+# Threads per worker (gthread only)
+threads = int(os.getenv("GUNICORN_THREADS", 8 if worker_class == "gthread" else 1))
+# Concurrent greenlets per worker (gevent only)
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", 1000))
+
+# Keep the AI cap below the threads per gthread worker, so it bounds something
+# and one thread is never held by an upstream call. Lower caps cost /api/prompt
+# throughput without helping other routes, since requests waiting for a slot
+# still hold their thread (see "Worker model comparison" in the README).
+# Must be set before the app is imported
+if worker_class == "gthread":
+  os.environ.setdefault("AI_MAX_CONCURRENCY", str(max(1, threads - 1)))
+
+if worker_class == "gevent":
+  # The C MySQL driver blocks the whole event loop; use the pure-Python one
+  os.environ.setdefault("MYSQL_USE_PURE", "true")
+
+# Import the app once in the master and fork workers from it: faster starts
+# and shared memory pages. gevent must patch the standard library before the
+# app is imported, so it loads the app in each worker instead
+preload_app = os.getenv("GUNICORN_PRELOAD", "false" if worker_class == "gevent" else "true").lower() == "true"
+
+# Longer than the AI client's overall deadline (AI_DEADLINE_SECONDS), so a slow
+# but healthy AI call is not killed mid-request
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 90))
+# Seconds workers get to finish in-flight requests on reload/shutdown
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 60))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+# Recycle workers periodically to bound memory growth; jitter avoids
+# restarting them all at once
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 5000))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 500))
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-")
+errorlog = os.getenv("GUNICORN_ERROR_LOG", "-")
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+
+# Clients and pools created in the master while preloading must not be shared
+# with the workers: drop them so each worker opens its own, then start the
+# background threads, which did not survive the fork. Runs once the worker
+# has loaded the app (after gevent has patched the standard library)
+def post_worker_init(worker):
+  import ai_client
+  from db import reset_db_pool
+  from main import app, start_background_workers
+  ai_client.reset_client()
+  reset_db_pool()
+  app.password_hasher.reset()
+  app.blocklist.connection_pool.reset()
+  app.cache.connection_pool.reset()
+  start_background_workers()
+  worker.log.info("Worker %s initialized (%s)", worker.pid, worker_class)
+
+# Release the master's database pool before the first workers are forked
+def when_ready(server):
+  from db import reset_db_pool
+  reset_db_pool()
+
+# Start from an empty metrics directory: samples from a previous run would
+# otherwise be added to this one's. Runs once, before any worker is forked
+def on_starting(server):
+  metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+  shutil.rmtree(metrics_dir, ignore_errors=True)
+  os.makedirs(metrics_dir)
+
+# Drop a dead worker's live gauges (in-flight requests, pool connections)
+def child_exit(server, worker):
+  from prometheus_client import multiprocess
+  multiprocess.mark_process_dead(worker.pid)
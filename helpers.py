@@ -1,10 +1,33 @@
 # helpers.py
 
-from flask import current_app
-from pydantic import BaseModel
+import logging
+from functools import wraps
+from flask import current_app, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from pydantic import BaseModel, field_validator
 from typing import List
-from itsdangerous import URLSafeTimedSerializer
 from flask_mail import Message
+from redis import RedisError
+
+logger = logging.getLogger(__name__)
+
+# Coerce a model-provided value into a list of strings. Models sometimes
+# return a single newline/comma separated string, or objects instead of strings
+def coerce_str_list(value):
+  if value is None:
+    return []
+  if isinstance(value, str):
+    separator = "\n" if "\n" in value else ","
+    return [item.strip(" -*\t") for item in value.split(separator) if item.strip(" -*\t")]
+  if isinstance(value, dict):
+    value = list(value.values())
+  items = []
+  for item in value:
+    if isinstance(item, dict):
+      item = next((item[key] for key in ("task", "description", "name", "title", "step") if key in item),
+                  " ".join(str(v) for v in item.values()))
+    items.append(str(item).strip())
+  return [item for item in items if item]
 
 # PROMPT_AI helper: data model for project idea generation
 class ProjectIdea(BaseModel):
@@ -14,6 +37,11 @@ class ProjectIdea(BaseModel):
     steps: List[str]
     scale_up_ideas: List[str]
 
+    @field_validator('languages', 'steps', 'scale_up_ideas', mode='before')
+    @classmethod
+    def coerce_lists(cls, value):
+        return coerce_str_list(value)
+
 # PROMPT_AI helper: parse inputs lists to engineer prompt
 # Prompt example:
 #   I am a role[0] and role[1] using technology[0] and technology[1] 
@@ -40,8 +68,17 @@ def conjunct_me(list):
     return list[0]
   
 # PROMPT_AI_TO_GENERATE_TASKS helper: data model for task generation
-# class Tasks(BaseModel):
-  # tasks: List[List[str]]
+class TaskList(BaseModel):
+  title: str = ""
+  tasks: List[str]
+
+  @field_validator('tasks', mode='before')
+  @classmethod
+  def coerce_tasks(cls, value):
+    return coerce_str_list(value)
+
+class TasksLists(BaseModel):
+  tasks_lists: List[TaskList]
   
 # Task generation helper
 def engineer_taskgen_prompt(title, summary, languages, steps):
@@ -56,32 +93,50 @@ def engineer_taskgen_prompt(title, summary, languages, steps):
     prompt += f"\n\t{step}"
   return prompt + "\n"
 
-# LOGIN and REGISTER helpers: hash and verify passwords using bcrypt
-def hash_password(password: str, bcrypt):
+# LOGIN and REGISTER helpers: hash and verify passwords using bcrypt. The work
+# runs in the app's password hasher process pool (see password_hasher.py)
+def hash_password(password: str):
     # Utilize bcrypt with an automatically generated salt
-    return bcrypt.generate_password_hash(password)
+    return current_app.password_hasher.hash(password)
   
-def verify_password(plain_password, hashed_password, bcrypt) -> bool:
+def verify_password(plain_password, hashed_password) -> bool:
     # Verify the hashed password
-    return bcrypt.check_password_hash(hashed_password, plain_password)
+    return current_app.password_hasher.verify(plain_password, hashed_password)
+
+# Whether a stored hash uses an outdated bcrypt work factor
+def password_needs_rehash(hashed_password) -> bool:
+    return current_app.password_hasher.needs_rehash(hashed_password)
   
+# ADMIN helper: restrict a route to usernames listed in ADMIN_USERS
+def admin_required(fn):
+  @wraps(fn)
+  @jwt_required()
+  def wrapper(*args, **kwargs):
+    if get_jwt_identity() not in current_app.config['ADMIN_USERS']:
+      # 403 Forbidden: Authenticated, but not an administrator
+      return jsonify({"error": "Administrator access required"}), 403
+    return fn(*args, **kwargs)
+  return wrapper
+
+# Confirmation tokens use the app's shared serializer (see mail_renderer)
 def generate_confirmation_token(email):
-  serializer = URLSafeTimedSerializer(current_app.config['ITSDANGEROUS_SECRET_KEY'])
-  return serializer.dumps(email, salt=current_app.config['ITSDANGEROUS_PASSWORD_SALT'])
+  return current_app.mail_renderer.generate_token(email)
 
 def confirm_token(token, expiration=3600):
-  serializer = URLSafeTimedSerializer(current_app.config['ITSDANGEROUS_SECRET_KEY'])
-  try:
-    email = serializer.loads(
-      token,
-      salt=current_app.config['ITSDANGEROUS_PASSWORD_SALT'],
-      max_age=expiration
-    )
-  except:
-    return False
-  return email
+  return current_app.mail_renderer.confirm_token(token, expiration)
 
+# Queue the email for the background sender. Sends synchronously if the
+# outbox is disabled or Redis cannot take the message
 def send_email(to, subject, template):
+  if current_app.outbox:
+    try:
+      current_app.outbox.enqueue(to, subject, template)
+      return
+    except RedisError as e:
+      logger.warning("Could not queue email, sending directly: %s", e)
+  deliver_email(to, subject, template)
+
+def deliver_email(to, subject, template):
   mail = current_app.extensions['mail']
   message = Message(
     subject,
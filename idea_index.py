@@ -0,0 +1,238 @@
+# idea_index.py
+# Local similarity index over previously generated project ideas. Each
+# project is embedded as an L2-normalized hashed n-gram vector (unigrams and
+# bigrams of its title, summary, languages and steps) and stored in a
+# memory-mapped file, so lookups are a single cosine top-k scan with NumPy and
+# no external service.
+#
+# Files in the index directory:
+#   header.i64  [count, capacity, dim] shared by every process through mmap
+#   vectors.f32 capacity x dim float32 rows
+#   ids.i32     project id per row (-1 for removed projects)
+#   .lock       flock() target serializing writers across processes
+
+import fcntl
+import json
+import os
+import re
+import threading
+import zlib
+import click
+import numpy as np
+from db import get_db_connection
+
+DEFAULT_DIM = 256
+INITIAL_CAPACITY = 1024
+TOKEN_PATTERN = re.compile(r"[a-z0-9+#.]+")
+
+def tokenize(text):
+  return [token.strip(".") for token in TOKEN_PATTERN.findall(text.lower()) if token.strip(".")]
+
+# Hashed feature vector of unigrams and bigrams. Uses crc32 (not hash()) so
+# vectors are stable across processes and restarts
+def vectorize(text, dim=DEFAULT_DIM, weight=1.0, vector=None):
+  if vector is None:
+    vector = np.zeros(dim, dtype=np.float32)
+  tokens = tokenize(text)
+  features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+  for feature in features:
+    digest = zlib.crc32(feature.encode())
+    # Top bit picks the sign so collisions tend to cancel out
+    vector[digest % dim] += weight if digest & 0x80000000 else -weight
+  return vector
+
+def normalize(vector):
+  norm = np.linalg.norm(vector)
+  return vector / norm if norm else vector
+
+# Embed a project idea. Languages are weighted up since they are the
+# strongest signal of what a project is about
+def embed_idea(title, summary, languages, steps, dim=DEFAULT_DIM):
+  vector = vectorize(f"{title} {summary}", dim)
+  vectorize(" ".join(languages), dim, weight=2.0, vector=vector)
+  vectorize(" ".join(steps), dim, weight=0.5, vector=vector)
+  return normalize(vector)
+
+# Embed brainstorm inputs, to look for existing ideas before generating one
+def embed_inputs(roles, technologies, industries, dim=DEFAULT_DIM):
+  vector = vectorize(" ".join(roles + industries), dim)
+  vectorize(" ".join(technologies), dim, weight=2.0, vector=vector)
+  return normalize(vector)
+
+class IdeaIndex:
+  def __init__(self, directory, dim=DEFAULT_DIM):
+    self.directory = directory
+    self.dim = dim
+    self._lock = threading.Lock()
+    os.makedirs(directory, exist_ok=True)
+    self._header_path = os.path.join(directory, "header.i64")
+    self._vectors_path = os.path.join(directory, "vectors.f32")
+    self._ids_path = os.path.join(directory, "ids.i32")
+    self._lock_path = os.path.join(directory, ".lock")
+    with self._file_lock():
+      if not os.path.exists(self._header_path):
+        header = np.memmap(self._header_path, dtype=np.int64, mode="w+", shape=(3,))
+        header[:] = (0, 0, dim)
+        header.flush()
+        del header
+      self._header = np.memmap(self._header_path, dtype=np.int64, mode="r+", shape=(3,))
+      if int(self._header[2]) != dim:
+        raise ValueError(f"Index at {directory} has dimension {int(self._header[2])}, expected {dim}")
+      if int(self._header[1]) == 0:
+        self._resize(INITIAL_CAPACITY)
+    self._capacity = 0
+    self._remap()
+
+  # Serialize writers across processes
+  def _file_lock(self):
+    index = self
+
+    class FileLock:
+      def __enter__(self):
+        self.handle = open(index._lock_path, "a")
+        fcntl.flock(self.handle, fcntl.LOCK_EX)
+
+      def __exit__(self, *exc):
+        fcntl.flock(self.handle, fcntl.LOCK_UN)
+        self.handle.close()
+
+    return FileLock()
+
+  # Grow the data files to the given capacity. Caller holds the file lock
+  def _resize(self, capacity):
+    with open(self._vectors_path, "ab") as f:
+      f.truncate(capacity * self.dim * 4)
+    with open(self._ids_path, "ab") as f:
+      f.truncate(capacity * 4)
+    self._header[1] = capacity
+    self._header.flush()
+
+  # (Re)open the data files if another process grew them
+  def _remap(self):
+    capacity = int(self._header[1])
+    if capacity != self._capacity:
+      self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+      self._ids = np.memmap(self._ids_path, dtype=np.int32, mode="r+", shape=(capacity,))
+      self._capacity = capacity
+
+  def __len__(self):
+    return int(self._header[0])
+
+  def add(self, pid, title, summary, languages, steps):
+    vector = embed_idea(title, summary, languages, steps, self.dim)
+    with self._lock, self._file_lock():
+      self._remap()
+      count = int(self._header[0])
+      if count >= self._capacity:
+        self._resize(self._capacity * 2)
+        self._remap()
+      self._vectors[count] = vector
+      self._ids[count] = pid
+      self._vectors.flush()
+      self._ids.flush()
+      # Publish the row only after it is written
+      self._header[0] = count + 1
+      self._header.flush()
+
+  def remove(self, pid):
+    with self._lock, self._file_lock():
+      self._remap()
+      count = int(self._header[0])
+      rows = np.flatnonzero(self._ids[:count] == pid)
+      self._ids[rows] = -1
+      self._vectors[rows] = 0
+      self._ids.flush()
+      self._vectors.flush()
+
+  # Top-k (project id, cosine similarity) pairs for a query vector. The lock
+  # only covers taking the row count and the current maps: _remap rebinds
+  # rather than closes them, so the scan runs unlocked and lookups proceed
+  # in parallel
+  def query(self, vector, k=5, exclude=None):
+    with self._lock:
+      self._remap()
+      count = int(self._header[0])
+      vectors, ids = self._vectors, self._ids
+    if count == 0:
+      return []
+    scores = np.asarray(vectors[:count] @ vector)
+    ids = np.array(ids[:count])
+    scores[ids < 0] = -np.inf
+    if exclude is not None:
+      scores[ids == exclude] = -np.inf
+    k = min(k, count)
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+    return [(int(ids[i]), float(scores[i])) for i in top if scores[i] > -np.inf]
+
+  # Ideas most similar to an indexed project
+  def similar_to(self, pid, k=5):
+    with self._lock:
+      self._remap()
+      count = int(self._header[0])
+      rows = np.flatnonzero(self._ids[:count] == pid)
+      if not len(rows):
+        return None
+      vector = np.array(self._vectors[rows[-1]])
+    return self.query(vector, k, exclude=pid)
+
+  def similar_to_inputs(self, roles, technologies, industries, k=1):
+    return self.query(embed_inputs(roles, technologies, industries, self.dim), k)
+
+  # Empty the index (used before a rebuild)
+  def clear(self):
+    with self._lock, self._file_lock():
+      self._header[0] = 0
+      self._header.flush()
+
+# Look up the ideas for similarity index matches, keeping the match order
+def fetch_ideas(cursor, matches):
+  if not matches:
+    return []
+  cursor.execute(*ideas_query(matches))
+  return ideas_from_rows(cursor.fetchall(), matches)
+
+# (query, params) selecting the projects for a list of matches
+def ideas_query(matches):
+  placeholders = ", ".join(["%s"] * len(matches))
+  query = f"SELECT id, title, summary, languages FROM projects WHERE id IN ({placeholders})"
+  return query, tuple(pid for pid, _ in matches)
+
+def ideas_from_rows(rows, matches):
+  scores = dict(matches)
+  ideas = {
+    row[0]: {
+      "id": row[0],
+      "title": row[1],
+      "summary": row[2],
+      "languages": json.loads(row[3]),
+      "score": round(scores[row[0]], 4)
+    }
+    for row in rows
+  }
+  return [ideas[pid] for pid, _ in matches if pid in ideas]
+
+# Flask CLI: rebuild the index from the projects table
+#   flask rebuild-idea-index
+def register_cli(app):
+  @app.cli.command("rebuild-idea-index")
+  def rebuild_idea_index():
+    connection = get_db_connection()
+    if not connection:
+      raise click.ClickException("Failed to connect to database")
+    try:
+      cursor = connection.cursor()
+      cursor.execute("SELECT id, title, summary, languages, steps FROM projects ORDER BY id")
+      app.idea_index.clear()
+      total = 0
+      while True:
+        rows = cursor.fetchmany(1000)
+        if not rows:
+          break
+        for pid, title, summary, languages, steps in rows:
+          app.idea_index.add(pid, title or "", summary or "", json.loads(languages), json.loads(steps))
+        total += len(rows)
+        click.echo(f"Indexed {total} projects")
+    finally:
+      cursor.close()
+      connection.close()
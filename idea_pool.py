@@ -0,0 +1,147 @@
+# idea_pool.py
+# Warm pool of pre-generated brainstorm ideas. /api/prompt records how often
+# each (roles, technologies, industries) combination is requested; a
+# background worker keeps a few fresh ideas in Redis for the most popular
+# combinations so those requests are answered without waiting on the LLM.
+#
+# Redis keys (in the cache database):
+#   ideapool:freq            sorted set, combination key -> request count
+#   ideapool:combo:<key>     JSON inputs for a combination, for regeneration
+#   ideapool:ideas:<key>     list of {"generated_at": ts, "idea": text}
+#   ideapool:budget:<minute> upstream calls spent in the current minute
+#   ideapool:lock            held by the process currently refilling
+
+import json
+import logging
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+FREQ_KEY = "ideapool:freq"
+LOCK_KEY = "ideapool:lock"
+
+# Canonical key for a combination: order and case of the choices do not matter
+def combo_key(roles, technologies, industries):
+  return "|".join(
+    ",".join(sorted(choice.strip().lower() for choice in choices))
+    for choices in (roles, technologies, industries)
+  )
+
+class IdeaPool:
+  # generate(roles, technologies, industries) returns the idea text for a
+  # combination and may raise on failure
+  def __init__(self, cache, generate, depth=3, top_n=20, ttl=86400,
+               rate_per_minute=10, interval=30):
+    self.cache = cache
+    self.generate = generate
+    # Ideas kept ready per combination
+    self.depth = depth
+    # Number of most requested combinations kept warm
+    self.top_n = top_n
+    # Seconds a pre-generated idea stays eligible to be served
+    self.ttl = ttl
+    # Upstream calls the refill worker may make per minute, across processes
+    self.rate_per_minute = rate_per_minute
+    # Seconds between refill passes when not woken early
+    self.interval = interval
+    self.stats = {"hits": 0, "misses": 0, "stale_discarded": 0, "generated": 0, "generate_failures": 0}
+    self._wake = threading.Event()
+    self._stop = threading.Event()
+    self._thread = None
+
+  def record_request(self, roles, technologies, industries):
+    key = combo_key(roles, technologies, industries)
+    try:
+      pipe = self.cache.pipeline(transaction=False)
+      pipe.zincrby(FREQ_KEY, 1, key)
+      pipe.set(f"ideapool:combo:{key}", json.dumps([roles, technologies, industries]), ex=self.ttl * 7)
+      pipe.execute()
+    except Exception as e:
+      logger.warning("Idea pool: could not record request: %s", e)
+
+  # Pop a fresh pre-generated idea for the combination, or None. Always wakes
+  # the refill worker so the pool is topped up asynchronously
+  def take(self, roles, technologies, industries):
+    key = combo_key(roles, technologies, industries)
+    idea = None
+    try:
+      while True:
+        entry = self.cache.lpop(f"ideapool:ideas:{key}")
+        if entry is None:
+          break
+        entry = json.loads(entry)
+        if time.time() - entry["generated_at"] <= self.ttl:
+          idea = entry["idea"]
+          break
+        self.stats["stale_discarded"] += 1
+    except Exception as e:
+      logger.warning("Idea pool: could not read pool: %s", e)
+    self.stats["hits" if idea else "misses"] += 1
+    self._wake.set()
+    return idea
+
+  # Reserve one upstream call from the shared per-minute budget
+  def take_budget(self):
+    budget_key = f"ideapool:budget:{int(time.time() // 60)}"
+    pipe = self.cache.pipeline()
+    pipe.incr(budget_key)
+    pipe.expire(budget_key, 120)
+    spent, _ = pipe.execute()
+    return spent <= self.rate_per_minute
+
+  # One refill pass over the most popular combinations. Only one process
+  # refills at a time
+  def refill(self):
+    token = uuid.uuid4().hex
+    if not self.cache.set(LOCK_KEY, token, nx=True, ex=max(60, self.interval * 2)):
+      return
+    try:
+      for key in self.cache.zrevrange(FREQ_KEY, 0, self.top_n - 1):
+        combo = self.cache.get(f"ideapool:combo:{key}")
+        if combo is None:
+          continue
+        roles, technologies, industries = json.loads(combo)
+        ideas_key = f"ideapool:ideas:{key}"
+        missing = self.depth - self.cache.llen(ideas_key)
+        for _ in range(missing):
+          if self._stop.is_set() or not self.take_budget():
+            return
+          try:
+            idea = self.generate(roles, technologies, industries)
+          except Exception as e:
+            self.stats["generate_failures"] += 1
+            logger.warning("Idea pool: generation failed for %s: %s", key, e)
+            break
+          pipe = self.cache.pipeline()
+          pipe.rpush(ideas_key, json.dumps({"generated_at": time.time(), "idea": idea}))
+          pipe.expire(ideas_key, self.ttl)
+          pipe.execute()
+          self.stats["generated"] += 1
+      # Keep the frequency table from growing without bound
+      self.cache.zremrangebyrank(FREQ_KEY, 0, -(self.top_n * 10) - 1)
+    finally:
+      if self.cache.get(LOCK_KEY) == token:
+        self.cache.delete(LOCK_KEY)
+
+  def run(self):
+    while not self._stop.is_set():
+      self._wake.wait(self.interval)
+      self._wake.clear()
+      if self._stop.is_set():
+        break
+      try:
+        self.refill()
+      except Exception as e:
+        logger.warning("Idea pool: refill failed: %s", e)
+
+  def start(self):
+    if self._thread is None or not self._thread.is_alive():
+      self._stop.clear()
+      self._thread = threading.Thread(target=self.run, name="idea-pool", daemon=True)
+      self._thread.start()
+
+  def stop(self):
+    self._stop.set()
+    self._wake.set()
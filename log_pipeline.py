@@ -0,0 +1,252 @@
+# log_pipeline.py
+# Structured, non-blocking logging. Request threads only put records on an
+# in-memory queue; a listener thread formats them and writes them to stdout.
+# Each record is one JSON object:
+#   {"ts": ..., "level": "WARNING", "logger": "db", "message": "...",
+#    "request_id": "...", "method": "GET", "route": "/task/<int:project_id>",
+#    "user": "alice", "elapsed_ms": 12.3, ...fields passed with extra=}
+#
+#   LOG_LEVEL=INFO                         level for all loggers
+#   LOG_LEVELS="query_stats=WARNING,ai_client=DEBUG"
+#                                          per-module overrides
+#   LOG_FORMAT=json|text                   text for local development
+#   LOG_QUEUE_SIZE=10000                   records waiting to be written; when
+#                                          full, new records are dropped
+#                                          (counted) rather than blocking
+#   LOG_RATE_LIMIT=10 per LOG_RATE_LIMIT_SECONDS=60
+#                                          warnings/errors logged per call site;
+#                                          the rest are counted and reported as
+#                                          "suppressed" on the next one logged
+#   LOG_REQUESTS=false                     one "request" record per request
+#                                          with its status and duration
+#
+# Requests get an id from an incoming X-Request-ID header (or a new one); it
+# is sent back in the response's X-Request-ID header.
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from flask import g, request, has_request_context
+from flask.logging import default_handler
+
+logger = logging.getLogger(__name__)
+
+_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+# Attributes every LogRecord has; anything else came from extra=
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+# Request fields for the current thread's request, if any
+def request_fields():
+  if not has_request_context():
+    return None
+  fields = {
+    "request_id": g.get("request_id"),
+    "method": request.method,
+    "route": request.url_rule.rule if request.url_rule else request.path,
+  }
+  jwt_data = g.get("_jwt_extended_jwt")
+  if jwt_data:
+    fields["user"] = jwt_data.get("sub")
+  start = g.get("log_start")
+  if start is not None:
+    fields["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+  return fields
+
+# Lets through `burst` warnings/errors per call site (logger, message
+# template) every `window` seconds. Lower levels always pass
+class RateLimitFilter(logging.Filter):
+  def __init__(self, burst=10, window=60, max_keys=1000):
+    super().__init__()
+    self.burst = burst
+    self.window = window
+    self.max_keys = max_keys
+    # key -> [window start, logged, suppressed]
+    self._counts = {}
+    self._lock = threading.Lock()
+
+  def filter(self, record):
+    if self.burst <= 0 or record.levelno < logging.WARNING:
+      return True
+    key = (record.name, record.levelno, str(record.msg))
+    now = time.monotonic()
+    with self._lock:
+      entry = self._counts.get(key)
+      if entry is None or now - entry[0] >= self.window:
+        suppressed = entry[2] if entry else 0
+        if entry is None and len(self._counts) >= self.max_keys:
+          self._counts.clear()
+        self._counts[key] = [now, 1, 0]
+      elif entry[1] < self.burst:
+        entry[1] += 1
+        suppressed = entry[2]
+        entry[2] = 0
+      else:
+        entry[2] += 1
+        return False
+    if suppressed:
+      record.suppressed = suppressed
+    return True
+
+class JsonFormatter(logging.Formatter):
+  def format(self, record):
+    entry = {
+      "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+      "level": record.levelname,
+      "logger": record.name,
+      "message": record.getMessage(),
+    }
+    for key, value in vars(record).items():
+      if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+        entry[key] = value
+    if record.exc_text:
+      entry["exc"] = record.exc_text
+    return json.dumps(entry, default=str)
+
+class TextFormatter(logging.Formatter):
+  def __init__(self):
+    super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+  def format(self, record):
+    line = super().format(record)
+    request_id = getattr(record, "request_id", None)
+    return f"{line} [{request_id}]" if request_id else line
+
+# Runs in the thread that logs: attaches the request fields, renders the
+# message and traceback (the listener has no request context and the
+# arguments may change later), then enqueues without ever blocking
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+  def __init__(self, pipeline):
+    super().__init__(pipeline.queue)
+    self.pipeline = pipeline
+
+  def prepare(self, record):
+    fields = request_fields()
+    if fields:
+      for key, value in fields.items():
+        if value is not None and not hasattr(record, key):
+          setattr(record, key, value)
+    record.message = record.getMessage()
+    record.msg = record.message
+    record.args = None
+    if record.exc_info:
+      record.exc_text = logging.Formatter().formatException(record.exc_info)
+      record.exc_info = None
+    return record
+
+  def enqueue(self, record):
+    self.pipeline.ensure_started()
+    try:
+      self.pipeline.queue.put_nowait(record)
+    except queue.Full:
+      self.pipeline.dropped += 1
+
+# The queue and the listener thread that drains it into `handler`
+class LogPipeline:
+  def __init__(self, handler, queue_size=10000):
+    self.handler = handler
+    self.queue_size = queue_size
+    self.queue = queue.Queue(queue_size)
+    self.listener = None
+    self.dropped = 0
+    self._pid = None
+    self._lock = threading.Lock()
+
+  # The listener thread does not survive fork(), and the queue's locks may
+  # have been held when it happened: a forked worker starts over with its own
+  def ensure_started(self):
+    if self._pid == os.getpid():
+      return
+    with self._lock:
+      if self._pid == os.getpid():
+        return
+      if self._pid is not None:
+        self.queue = queue.Queue(self.queue_size)
+      self._pid = os.getpid()
+      self.listener = logging.handlers.QueueListener(self.queue, self.handler, respect_handler_level=True)
+      self.listener.start()
+
+  # Write out whatever is queued, e.g. at exit
+  def stop(self):
+    if self.listener is not None and self._pid == os.getpid():
+      self.listener.stop()
+      self._pid = None
+      self.listener = None
+
+_pipeline = None
+
+# "module=LEVEL,module=LEVEL" -> {module: LEVEL}
+def parse_levels(value):
+  levels = {}
+  for item in value.split(","):
+    if "=" in item:
+      name, level = item.split("=", 1)
+      levels[name.strip()] = level.strip().upper()
+  return levels
+
+# Route the root logger through the queue. Safe to call again: the previous
+# pipeline is flushed and replaced
+def configure(level="INFO", levels=None, log_format="json", queue_size=10000, rate_limit=10, rate_limit_seconds=60):
+  global _pipeline
+  root = logging.getLogger()
+  if _pipeline is not None:
+    for handler in list(root.handlers):
+      if isinstance(handler, NonBlockingQueueHandler):
+        root.removeHandler(handler)
+    _pipeline.stop()
+  else:
+    atexit.register(lambda: _pipeline and _pipeline.stop())
+
+  output = logging.StreamHandler(sys.stdout)
+  output.setFormatter(JsonFormatter() if log_format == "json" else TextFormatter())
+  _pipeline = LogPipeline(output, queue_size=queue_size)
+  handler = NonBlockingQueueHandler(_pipeline)
+  handler.addFilter(RateLimitFilter(rate_limit, rate_limit_seconds))
+  root.addHandler(handler)
+  root.setLevel(level)
+  for name, module_level in (levels or {}).items():
+    logging.getLogger(name).setLevel(module_level)
+  return _pipeline
+
+def get_stats():
+  if _pipeline is None:
+    return None
+  return {"queued": _pipeline.queue.qsize(), "dropped": _pipeline.dropped}
+
+def init_app(app):
+  configure(
+    level=app.config['LOG_LEVEL'],
+    levels=parse_levels(app.config['LOG_LEVELS']),
+    log_format=app.config['LOG_FORMAT'],
+    queue_size=app.config['LOG_QUEUE_SIZE'],
+    rate_limit=app.config['LOG_RATE_LIMIT'],
+    rate_limit_seconds=app.config['LOG_RATE_LIMIT_SECONDS']
+  )
+  # Flask's own handler would write errors synchronously (and twice)
+  app.logger.removeHandler(default_handler)
+  log_requests = app.config['LOG_REQUESTS']
+
+  @app.before_request
+  def start_request_log():
+    g.log_start = time.perf_counter()
+    header = request.headers.get('X-Request-ID', '')
+    g.request_id = header if _REQUEST_ID.match(header) else uuid.uuid4().hex
+
+  @app.after_request
+  def finish_request_log(response):
+    request_id = g.get("request_id")
+    if request_id:
+      response.headers['X-Request-ID'] = request_id
+    if log_requests:
+      logger.info("%s %s %s", request.method, request.path, response.status_code,
+                  extra={"status": response.status_code})
+    return response
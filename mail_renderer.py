@@ -0,0 +1,132 @@
+# mail_renderer.py
+# Builds account emails. The confirmation token serializer is created once per
+# app and the activation template is compiled once, so rendering a message is
+# a single template call. render_activations() renders many messages as a
+# stream, for reminder campaigns run from the CLI:
+#   flask send-confirmation-reminders --older-than-hours 24
+# Each user is reminded at most once every --every-days, and only within
+# --max-age-days of joining; users.reminded_at records the last reminder.
+
+import click
+from datetime import datetime, timedelta
+from itsdangerous import URLSafeTimedSerializer
+from db import get_db_connection
+
+ACTIVATION_SUBJECT = "Please verify your DevStorm account"
+REMINDER_SUBJECT = "Reminder: please verify your DevStorm account"
+
+class MailRenderer:
+  def __init__(self, app):
+    self.app = app
+    self._serializer = None
+    self.activation_template = app.jinja_env.get_template('user/activate.html')
+
+  # Built on first use, so the app can start without the itsdangerous keys
+  # (e.g. for CLI commands that send no email)
+  @property
+  def serializer(self):
+    if self._serializer is None:
+      self._serializer = URLSafeTimedSerializer(self.app.config['ITSDANGEROUS_SECRET_KEY'])
+    return self._serializer
+
+  @property
+  def salt(self):
+    return self.app.config['ITSDANGEROUS_PASSWORD_SALT']
+
+  def generate_token(self, email):
+    return self.serializer.dumps(email, salt=self.salt)
+
+  # Email address for a confirmation token, or False if invalid or expired
+  def confirm_token(self, token, expiration=3600):
+    try:
+      return self.serializer.loads(token, salt=self.salt, max_age=expiration)
+    except Exception:
+      return False
+
+  # (confirm_url, html) for a user's activation email
+  def render_activation(self, username, email):
+    confirm_url = f"{self.app.config['FRONTEND_URL']}/confirm/{self.generate_token(email)}"
+    html = self.activation_template.render(username=username, confirm_url=confirm_url)
+    return confirm_url, html
+
+  # Yield (email, subject, html) for each (username, email) pair
+  def render_activations(self, users, subject=ACTIVATION_SUBJECT):
+    for username, email in users:
+      yield email, subject, self.render_activation(username, email)[1]
+
+# Stream unconfirmed users who joined in [joined_after, joined_before) and
+# were not reminded since reminded_before, in batches of `batch_size`
+def iter_unconfirmed_users(cursor, joined_before, joined_after, reminded_before, batch_size=1000):
+  query = (
+    "SELECT username, email FROM users WHERE confirmed = 0 AND date_joined < %s AND date_joined >= %s "
+    "AND (reminded_at IS NULL OR reminded_at < %s) ORDER BY id"
+  )
+  cursor.execute(query, (joined_before, joined_after, reminded_before))
+  while True:
+    rows = cursor.fetchmany(batch_size)
+    if not rows:
+      break
+    yield from rows
+
+# Flask CLI: queue confirmation reminders for unconfirmed users
+#   flask send-confirmation-reminders [--older-than-hours 24] [--max-age-days 30]
+#                                     [--every-days 7] [--batch-size 1000] [--dry-run]
+def register_cli(app):
+  @app.cli.command("send-confirmation-reminders")
+  @click.option("--older-than-hours", default=24, help="Only users who joined at least this long ago")
+  @click.option("--max-age-days", default=30, help="Skip users who joined longer ago than this")
+  @click.option("--every-days", default=7, help="Skip users reminded within this many days")
+  @click.option("--batch-size", default=1000, help="Rows fetched and messages queued per batch")
+  @click.option("--dry-run", is_flag=True, help="Render the messages without queueing them")
+  def send_confirmation_reminders(older_than_hours, max_age_days, every_days, batch_size, dry_run):
+    if not app.outbox and not dry_run:
+      raise click.ClickException("The email outbox is disabled (MAIL_OUTBOX_ENABLED)")
+    connection = get_db_connection()
+    if not connection:
+      raise click.ClickException("Failed to connect to database")
+    # Unbuffered cursor: rows are streamed rather than loaded all at once
+    cursor = connection.cursor(buffered=False)
+    # reminded_at is written on a second connection while the first streams
+    marker = None if dry_run else get_db_connection()
+    if not dry_run and not marker:
+      cursor.close()
+      connection.close()
+      raise click.ClickException("Failed to connect to database")
+    try:
+      now = datetime.now()
+      users = iter_unconfirmed_users(
+        cursor, now - timedelta(hours=older_than_hours), now - timedelta(days=max_age_days),
+        now - timedelta(days=every_days), batch_size
+      )
+      batch = []
+      total = 0
+      for message in app.mail_renderer.render_activations(users, subject=REMINDER_SUBJECT):
+        batch.append(message)
+        if len(batch) >= batch_size:
+          total += queue_batch(app, marker, batch, now)
+          batch = []
+      total += queue_batch(app, marker, batch, now)
+      click.echo(f"{'Rendered' if dry_run else 'Queued'} {total} reminders")
+    finally:
+      cursor.close()
+      connection.close()
+      if marker:
+        marker.close()
+
+# Queue a batch of reminders and record when their recipients were reminded.
+# A dry run (no marker connection) only counts them
+def queue_batch(app, marker, batch, reminded_at):
+  if batch and marker:
+    app.outbox.enqueue_many(batch)
+    marker_cursor = marker.cursor()
+    try:
+      emails = [email for email, _, _ in batch]
+      marker_cursor.execute(
+        f"UPDATE users SET reminded_at = %s WHERE email IN ({', '.join(['%s'] * len(emails))})",
+        (reminded_at, *emails)
+      )
+      marker.commit()
+    finally:
+      marker_cursor.close()
+    click.echo(f"Queued {len(batch)} reminders")
+  return len(batch)
@@ -1,7 +1,11 @@
 # main.py
 
 from app import create_app
-from db import create_users_table, create_projects_table, create_tasks_table, drop_tables
+from idea_index import register_cli as register_idea_index_cli
+from mail_renderer import register_cli as register_mail_cli
+from db import create_users_table, create_projects_table, create_tasks_table, create_changes_table, drop_tables
+from change_log import register_cli as register_change_log_cli
+from bulk_import import register_cli as register_import_cli
 
 app, jwt, bcrypt = create_app()
 
@@ -11,6 +15,9 @@ from routes.user_routes import user_bp
 from routes.ai_routes import ai_bp
 from routes.project_routes import project_bp
 from routes.task_routes import task_bp
+from routes.admin_routes import admin_bp
+from routes.sync_routes import sync_bp
+from metrics import metrics_bp
 
 # Register the blueprints
 app.register_blueprint(auth_bp)
@@ -18,11 +25,54 @@ app.register_blueprint(user_bp)
 app.register_blueprint(ai_bp)
 app.register_blueprint(project_bp)
 app.register_blueprint(task_bp)
+app.register_blueprint(admin_bp)
+app.register_blueprint(sync_bp)
+if app.config['METRICS_ENABLED']:
+  app.register_blueprint(metrics_bp)
+
+# Flask CLI commands
+register_idea_index_cli(app)
+register_mail_cli(app)
+register_change_log_cli(app)
+register_import_cli(app)
+
+# Warm pool of brainstorm ideas
+if app.config['IDEA_POOL_ENABLED']:
+  from idea_pool import IdeaPool
+  from routes.ai_routes import generate_project_idea
+  app.idea_pool = IdeaPool(
+    app.cache,
+    lambda roles, technologies, industries: generate_project_idea(
+      roles, technologies, industries, endpoint="brainstorm_pool",
+      temperature=app.config['IDEA_POOL_TEMPERATURE']
+    ),
+    depth=app.config['IDEA_POOL_DEPTH'],
+    top_n=app.config['IDEA_POOL_TOP_N'],
+    ttl=app.config['IDEA_POOL_TTL_SECONDS'],
+    rate_per_minute=app.config['IDEA_POOL_RATE_PER_MINUTE'],
+    interval=app.config['IDEA_POOL_INTERVAL_SECONDS']
+  )
+
+# Start background threads (idea pool refill, email sender, task write
+# flusher). Each uses a Redis lock, so running them in every worker process is safe
+def start_background_workers():
+  if app.idea_pool:
+    app.idea_pool.start()
+  if app.outbox:
+    app.outbox.start()
+  if app.task_writes:
+    app.task_writes.start()
+
+# Threads do not survive fork(); under gunicorn they are started in each
+# worker by the post_fork hook instead (see gunicorn.conf.py)
+if not app.config['DEFER_BACKGROUND_WORKERS']:
+  start_background_workers()
 
 # drop_tables()
 create_users_table()
 create_projects_table()
 create_tasks_table()
+create_changes_table()
   
 if __name__ == "__main__":
   app.run(debug=True)
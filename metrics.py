@@ -0,0 +1,236 @@
+# metrics.py
+# Prometheus metrics, served at GET /metrics:
+#   devstorm_http_*      request latency histograms and status counters per
+#                        blueprint/endpoint, requests in flight
+#   devstorm_db_*        SQL time and statements per request (query_stats.py),
+#                        connection pool usage
+#   devstorm_redis_*     connection pool usage per Redis database
+#   devstorm_ai_*        AI call latency, tokens and cost (ai_telemetry.py)
+#   devstorm_cache_*     hits and misses of the revocation cache and idea pool
+#   devstorm_revocation_mode
+#                        live/redis/degraded: how blocklist checks are answered
+#   devstorm_task_writes_*
+#                        coalesced task updates waiting in Redis, flush lag
+#
+# Under gunicorn every worker writes its samples to PROMETHEUS_MULTIPROC_DIR
+# (set up in gunicorn.conf.py) and /metrics aggregates all workers. Per
+# request, the cost is a few in-memory counter updates; pool and cache
+# figures are copied from the components' own stats at most every
+# METRICS_SYNC_SECONDS.
+
+import hmac
+import logging
+import os
+import threading
+import time
+from flask import Blueprint, Response, current_app, g, request
+from prometheus_client import (
+  CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, CONTENT_TYPE_LATEST, generate_latest
+)
+from prometheus_client import multiprocess
+import ai_client
+import ai_telemetry
+from db import get_pool_stats
+
+logger = logging.getLogger(__name__)
+
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+DB_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+http_request_seconds = Histogram(
+  "devstorm_http_request_duration_seconds", "Request latency",
+  ["blueprint", "endpoint", "method"], buckets=REQUEST_BUCKETS
+)
+http_requests = Counter(
+  "devstorm_http_requests_total", "Requests by status code",
+  ["blueprint", "endpoint", "method", "status"]
+)
+http_in_flight = Gauge(
+  "devstorm_http_requests_in_flight", "Requests being handled", multiprocess_mode="livesum"
+)
+db_request_seconds = Histogram(
+  "devstorm_db_request_seconds", "SQL time per request", ["endpoint"], buckets=DB_BUCKETS
+)
+db_statements = Counter("devstorm_db_statements_total", "SQL statements executed", ["endpoint"])
+db_pool_connections = Gauge(
+  "devstorm_db_pool_connections", "MySQL pool connections", ["state"], multiprocess_mode="livesum"
+)
+redis_pool_connections = Gauge(
+  "devstorm_redis_pool_connections", "Redis pool connections", ["db", "state"], multiprocess_mode="livesum"
+)
+ai_call_seconds = Histogram(
+  "devstorm_ai_call_duration_seconds", "AI call latency, retries included",
+  ["endpoint", "model", "outcome"], buckets=ai_telemetry.LATENCY_BUCKETS
+)
+ai_queue_seconds = Histogram(
+  "devstorm_ai_queue_seconds", "Time AI calls waited for a slot and in Groq's queue",
+  ["endpoint"], buckets=ai_telemetry.LATENCY_BUCKETS
+)
+ai_tokens = Counter("devstorm_ai_tokens_total", "AI tokens used", ["endpoint", "kind"])
+ai_cost = Counter("devstorm_ai_cost_usd_total", "Estimated AI cost", ["endpoint"])
+ai_in_flight = Gauge("devstorm_ai_calls_in_flight", "AI calls in progress", multiprocess_mode="livesum")
+ai_breaker_open = Gauge(
+  "devstorm_ai_breaker_open", "1 while the AI circuit breaker is open", multiprocess_mode="max"
+)
+cache_requests = Counter("devstorm_cache_requests_total", "Cache lookups", ["cache", "result"])
+revocation_mode = Gauge(
+  "devstorm_revocation_mode", "1 for the mode blocklist checks are answered in (live, redis, degraded)",
+  ["mode"], multiprocess_mode="livemax"
+)
+task_writes_pending = Gauge(
+  "devstorm_task_writes_pending", "Task updates queued in Redis, not yet in MySQL", multiprocess_mode="max"
+)
+task_writes_lag = Gauge(
+  "devstorm_task_writes_flush_lag_seconds", "Oldest update in the last flush: seconds from acknowledgement to commit",
+  multiprocess_mode="max"
+)
+
+# Per (blueprint, endpoint, method) label children, so the request path skips
+# label resolution
+_children = {}
+
+def request_series(blueprint, endpoint, method):
+  key = (blueprint, endpoint, method)
+  series = _children.get(key)
+  if series is None:
+    series = _children[key] = http_request_seconds.labels(blueprint, endpoint, method)
+  return series
+
+def observe_ai_call(endpoint, user, model, outcome, queue_s, ttft_s, total_s, prompt_tokens, completion_tokens):
+  ai_call_seconds.labels(endpoint, model, outcome).observe(total_s)
+  ai_queue_seconds.labels(endpoint).observe(queue_s)
+  if prompt_tokens or completion_tokens:
+    ai_tokens.labels(endpoint, "prompt").inc(prompt_tokens)
+    ai_tokens.labels(endpoint, "completion").inc(completion_tokens)
+    ai_cost.labels(endpoint).inc(ai_telemetry.estimate_cost(prompt_tokens, completion_tokens))
+
+ai_telemetry.add_listener(observe_ai_call)
+
+REVOCATION_MODES = ("live", "redis", "degraded")
+
+# (idle, in use) connections of a redis-py pool
+def redis_pool_usage(pool):
+  if hasattr(pool, "pool"):
+    # BlockingConnectionPool: a queue of connections, None for unopened slots
+    idle = sum(1 for connection in list(pool.pool.queue) if connection is not None)
+    return idle, len(pool._connections) - idle
+  return len(pool._available_connections), len(pool._in_use_connections)
+
+# Copies pool gauges and cache counters from the components' own stats
+class StatsSync:
+  # (cache label, app attribute, hit stat, miss stat)
+  CACHES = (
+    ("revocations", "revocations", "local_hits", "remote_lookups"),
+    ("idea_pool", "idea_pool", "hits", "misses"),
+  )
+
+  def __init__(self, interval):
+    self.interval = interval
+    self._next = 0.0
+    self._lock = threading.Lock()
+    self._seen = {}
+
+  def maybe_sync(self, app):
+    now = time.monotonic()
+    if now < self._next or not self._lock.acquire(blocking=False):
+      return
+    try:
+      self._next = now + self.interval
+      self.sync(app)
+    except Exception as e:
+      # Metrics must never fail the request
+      logger.warning("Metrics: could not sync stats: %s", e)
+    finally:
+      self._lock.release()
+
+  def sync(self, app):
+    pool = get_pool_stats()
+    if pool:
+      db_pool_connections.labels("idle").set(pool["idle"])
+      db_pool_connections.labels("in_use").set(pool["size"] - pool["idle"])
+    for db, client in (("blocklist", app.blocklist), ("cache", app.cache)):
+      idle, in_use = redis_pool_usage(client.connection_pool)
+      redis_pool_connections.labels(db, "idle").set(idle)
+      redis_pool_connections.labels(db, "in_use").set(in_use)
+    mode = app.revocations.mode()
+    for name in REVOCATION_MODES:
+      revocation_mode.labels(name).set(1 if name == mode else 0)
+    if app.task_writes:
+      writes = app.task_writes.get_stats()
+      if writes["pending"] is not None:
+        task_writes_pending.set(writes["pending"] + writes["flushing"])
+      task_writes_lag.set(writes["last_flush_lag_seconds"])
+    ai_stats = ai_client.get_stats()
+    ai_in_flight.set(ai_stats["in_flight"])
+    ai_breaker_open.set(1 if ai_stats["breaker"]["state"] == "open" else 0)
+    for cache, attribute, hit_key, miss_key in self.CACHES:
+      component = getattr(app, attribute, None)
+      if component is None:
+        continue
+      stats = dict(component.stats)
+      for result, key in (("hit", hit_key), ("miss", miss_key)):
+        previous = self._seen.get((cache, result), 0)
+        if stats[key] > previous:
+          cache_requests.labels(cache, result).inc(stats[key] - previous)
+        self._seen[(cache, result)] = stats[key]
+
+def init_app(app):
+  sync = StatsSync(app.config['METRICS_SYNC_SECONDS'])
+
+  @app.before_request
+  def start_request_metrics():
+    g.metrics_start = time.perf_counter()
+    http_in_flight.inc()
+
+  @app.after_request
+  def record_request_metrics(response):
+    start = g.get("metrics_start")
+    if start is None:
+      return response
+    endpoint = request.endpoint or "unmatched"
+    blueprint = request.blueprint or ""
+    request_series(blueprint, endpoint, request.method).observe(time.perf_counter() - start)
+    http_requests.labels(blueprint, endpoint, request.method, response.status_code).inc()
+    stats = g.get("query_stats")
+    if stats is not None and stats.statements:
+      db_request_seconds.labels(endpoint).observe(stats.total)
+      db_statements.labels(endpoint).inc(stats.statements)
+    sync.maybe_sync(current_app)
+    return response
+
+  @app.teardown_request
+  def end_request_metrics(exc):
+    if g.pop("metrics_start", None) is not None:
+      http_in_flight.dec()
+
+metrics_bp = Blueprint('metrics_bp', __name__)
+
+LOOPBACK = ("127.0.0.1", "::1")
+
+# Whether the request comes straight from this host, not through a proxy on it
+def is_local_request():
+  return (request.remote_addr in LOOPBACK and 'X-Forwarded-For' not in request.headers
+          and 'Forwarded' not in request.headers)
+
+# Prometheus scrape endpoint. With METRICS_TOKEN set, scrapers must send
+# "Authorization: Bearer <token>". Without one it is served only to this host,
+# unless METRICS_PUBLIC opens it up
+@metrics_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+  token = current_app.config['METRICS_TOKEN']
+  if token:
+    if not hmac.compare_digest(request.headers.get('Authorization', ""), f"Bearer {token}"):
+      # 401 Unauthorized: Missing or wrong scrape token
+      return Response("Unauthorized\n", status=401, mimetype="text/plain")
+  elif not current_app.config['METRICS_PUBLIC'] and not is_local_request():
+    # 403 Forbidden: No scrape token configured, and not a local scrape
+    return Response("Forbidden: set METRICS_TOKEN to scrape from other hosts\n", status=403, mimetype="text/plain")
+  if MULTIPROCESS:
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+  else:
+    registry = REGISTRY
+  # 200 OK: Metrics in the Prometheus text format
+  return Response(generate_latest(registry), status=200, mimetype=CONTENT_TYPE_LATEST)
@@ -0,0 +1,128 @@
+# password_hasher.py
+# Runs bcrypt hashing and verification in a small, bounded process pool so
+# that deliberately expensive password work never blocks request threads (or
+# holds the GIL) in the web workers. A login storm queues here, up to a limit,
+# instead of starving the CRUD endpoints.
+#
+# This module is imported by the pool's child processes, so it must stay
+# free of Flask/app imports.
+
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+import bcrypt
+
+# Raised when too much password work is already queued
+class PasswordHasherBusyError(Exception):
+  pass
+
+# Executed in the pool's child processes
+def _hash_password(password, rounds):
+  return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds)).decode("utf-8")
+
+def _check_password(password, hashed):
+  return bcrypt.checkpw(password.encode("utf-8"), hashed.encode("utf-8"))
+
+# Cost factor encoded in a bcrypt hash ($2b$<cost>$...), or None
+def hash_cost(hashed):
+  try:
+    return int(hashed.split("$")[2])
+  except (AttributeError, IndexError, ValueError):
+    return None
+
+class PasswordHasher:
+  def __init__(self, rounds=12, max_workers=2, max_queue=64, timeout=10):
+    # bcrypt work factor (log2 rounds) for new hashes
+    self.rounds = rounds
+    self.max_workers = max_workers
+    # Maximum submitted-but-unfinished operations before failing fast
+    self.max_queue = max_queue
+    # Seconds a request waits for its result
+    self.timeout = timeout
+    self._executor = None
+    self._lock = threading.Lock()
+    self._pending = 0
+    self.stats = {
+      "submitted": 0,
+      "completed": 0,
+      "rejected": 0,
+      "timed_out": 0,
+      "max_queue_depth": 0,
+      "total_seconds": 0.0,
+    }
+
+  # Lazily start the pool, so it is created in the process that uses it
+  # (after a pre-fork server forks). Spawned children avoid inheriting the
+  # parent's threads and sockets
+  def _get_executor(self):
+    if self._executor is None:
+      self._executor = ProcessPoolExecutor(
+        max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+      )
+    return self._executor
+
+  def _done(self, future):
+    with self._lock:
+      self._pending -= 1
+      self.stats["completed"] += 1
+
+  def _run(self, fn, *args):
+    with self._lock:
+      if self._pending >= self.max_queue:
+        self.stats["rejected"] += 1
+        raise PasswordHasherBusyError("Too many password operations in progress")
+      self._pending += 1
+      self.stats["submitted"] += 1
+      self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], self._pending)
+      try:
+        future = self._get_executor().submit(fn, *args)
+      except Exception:
+        self._pending -= 1
+        raise
+    future.add_done_callback(self._done)
+    start = time.perf_counter()
+    try:
+      return future.result(timeout=self.timeout)
+    except TimeoutError:
+      with self._lock:
+        self.stats["timed_out"] += 1
+      raise PasswordHasherBusyError("Password operation timed out")
+    finally:
+      with self._lock:
+        self.stats["total_seconds"] += time.perf_counter() - start
+
+  def hash(self, password):
+    return self._run(_hash_password, password, self.rounds)
+
+  def verify(self, password, hashed):
+    if isinstance(hashed, bytes):
+      hashed = hashed.decode("utf-8")
+    return self._run(_check_password, password, hashed)
+
+  # Whether a stored hash was made with a different work factor than the
+  # configured one, and should be replaced on the next successful login
+  def needs_rehash(self, hashed):
+    if isinstance(hashed, bytes):
+      hashed = hashed.decode("utf-8")
+    return hash_cost(hashed) != self.rounds
+
+  @property
+  def queue_depth(self):
+    return self._pending
+
+  def get_stats(self):
+    with self._lock:
+      stats = dict(self.stats)
+      stats["queue_depth"] = self._pending
+    stats["rounds"] = self.rounds
+    stats["max_workers"] = self.max_workers
+    stats["max_queue"] = self.max_queue
+    return stats
+
+  # Forget the pool in a freshly forked worker. The inherited executor belongs
+  # to the parent process, so it is dropped rather than shut down
+  def reset(self):
+    with self._lock:
+      self._executor = None
+      self._pending = 0
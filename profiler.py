@@ -0,0 +1,291 @@
+# profiler.py
+# Opt-in statistical profiler. A fraction of requests (PROFILER_SAMPLE_RATE),
+# plus any request carrying "X-Profile: <PROFILER_TOKEN>", is profiled: while
+# it runs, a sampler thread records the handling thread's call stack every
+# PROFILER_INTERVAL_MS. Stacks are aggregated per endpoint in the process and
+# merged into Redis (the cache database) every PROFILER_FLUSH_SECONDS, so the
+# admin endpoints see every worker's samples:
+#   GET /admin/profile                          endpoints and sample counts
+#   GET /admin/profile/<endpoint>?format=svg    flamegraph
+#   GET /admin/profile/<endpoint>               collapsed stacks, one
+#                                               "frame;frame;frame count" line
+#                                               each (flamegraph.pl, speedscope)
+#   DELETE /admin/profile                       discard all samples
+#
+# With PROFILER_ENABLED=false (the default) no hooks are installed at all.
+# Memory is bounded: at most PROFILER_MAX_STACKS distinct stacks per endpoint
+# are kept, both in each process between flushes and in Redis (the rest are
+# counted as "[truncated]"), stacks are cut to their innermost
+# PROFILER_MAX_DEPTH frames, and Redis keys expire after PROFILER_TTL_SECONDS.
+#
+# Samples are taken per OS thread (sys._current_frames). Under gevent every
+# greenlet of a worker shares one thread, so the hooks are not installed
+# there.
+
+import hmac
+import html
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import zlib
+import redis
+from flask import g, request
+
+logger = logging.getLogger(__name__)
+
+ENDPOINTS_KEY = "profile:endpoints"
+STACKS_KEY = "profile:stacks:{}"
+TRUNCATED = "[truncated]"
+
+# "file.py:function" frames from the outermost call to `frame`, keeping the
+# innermost max_depth
+def collapse(frame, max_depth):
+  frames = []
+  while frame is not None and len(frames) < max_depth:
+    code = frame.f_code
+    frames.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+    frame = frame.f_back
+  return ";".join(reversed(frames))
+
+class Profiler:
+  def __init__(self, client, sample_rate=0.0, token=None, interval=0.005, flush_seconds=10,
+               max_stacks=2000, max_depth=64, ttl=86400):
+    # Redis client for the cache database
+    self.client = client
+    self.sample_rate = sample_rate
+    self.token = token
+    self.interval = interval
+    self.flush_seconds = flush_seconds
+    self.max_stacks = max_stacks
+    self.max_depth = max_depth
+    self.ttl = ttl
+    # thread id -> endpoint, for requests being profiled
+    self._active = {}
+    # endpoint -> {stack: samples} not yet flushed to Redis
+    self._pending = {}
+    self._lock = threading.Lock()
+    self._wake = threading.Event()
+    self._pid = None
+    self.stats = {"profiled_requests": 0, "samples": 0, "truncated": 0, "flushes": 0, "flush_errors": 0}
+
+  # Whether to profile the current request
+  def wants(self, headers):
+    if self.token:
+      header = headers.get('X-Profile')
+      if header and hmac.compare_digest(header, self.token):
+        return True
+    return self.sample_rate > 0 and random.random() < self.sample_rate
+
+  def begin(self, endpoint):
+    self._ensure_started()
+    with self._lock:
+      self._active[threading.get_ident()] = endpoint
+      self.stats["profiled_requests"] += 1
+    self._wake.set()
+
+  def end(self):
+    with self._lock:
+      self._active.pop(threading.get_ident(), None)
+
+  # Start the sampler in the process that serves requests. A forked worker
+  # starts its own, since threads do not survive fork()
+  def _ensure_started(self):
+    if self._pid == os.getpid():
+      return
+    with self._lock:
+      if self._pid == os.getpid():
+        return
+      self._pid = os.getpid()
+      self._active = {}
+      self._pending = {}
+      threading.Thread(target=self._run, name="profiler", daemon=True).start()
+
+  def _run(self):
+    next_flush = time.monotonic() + self.flush_seconds
+    while True:
+      if self._active:
+        time.sleep(self.interval)
+        self._sample()
+      else:
+        # Idle until a request is being profiled, or it is time to flush
+        self._wake.clear()
+        if not self._active:
+          self._wake.wait(max(0, next_flush - time.monotonic()))
+      if time.monotonic() >= next_flush:
+        self._flush()
+        next_flush = time.monotonic() + self.flush_seconds
+
+  def _sample(self):
+    with self._lock:
+      active = dict(self._active)
+    if not active:
+      return
+    frames = sys._current_frames()
+    samples = [
+      (endpoint, collapse(frames[thread_id], self.max_depth))
+      for thread_id, endpoint in active.items() if thread_id in frames
+    ]
+    with self._lock:
+      for endpoint, stack in samples:
+        stacks = self._pending.setdefault(endpoint, {})
+        if stack not in stacks and len(stacks) >= self.max_stacks:
+          stack = TRUNCATED
+          self.stats["truncated"] += 1
+        stacks[stack] = stacks.get(stack, 0) + 1
+        self.stats["samples"] += 1
+
+  # Merge pending samples into Redis. Stacks an endpoint's hash does not hold
+  # yet are folded into "[truncated]" once it has max_stacks fields; workers
+  # flushing at once may overshoot that by one flush each. On failure samples
+  # are dropped rather than kept, so memory stays bounded
+  def _flush(self):
+    with self._lock:
+      pending, self._pending = self._pending, {}
+    if not pending:
+      return
+    try:
+      pipe = self.client.pipeline(transaction=False)
+      for endpoint, stacks in pending.items():
+        key = STACKS_KEY.format(endpoint)
+        pipe.hlen(key)
+        pipe.hmget(key, list(stacks))
+      stored = pipe.execute()
+    except redis.RedisError as e:
+      self.stats["flush_errors"] += 1
+      logger.warning("Profiler: could not flush samples: %s", e)
+      return
+    pipe = self.client.pipeline(transaction=False)
+    for i, (endpoint, stacks) in enumerate(pending.items()):
+      key = STACKS_KEY.format(endpoint)
+      room = self.max_stacks - stored[2 * i]
+      merged = {}
+      for (stack, count), existing in zip(stacks.items(), stored[2 * i + 1]):
+        if existing is None and stack != TRUNCATED:
+          if room <= 0:
+            stack = TRUNCATED
+            self.stats["truncated"] += count
+          else:
+            room -= 1
+        merged[stack] = merged.get(stack, 0) + count
+      for stack, count in merged.items():
+        pipe.hincrby(key, stack, count)
+      pipe.expire(key, self.ttl)
+      pipe.zincrby(ENDPOINTS_KEY, sum(stacks.values()), endpoint)
+    pipe.expire(ENDPOINTS_KEY, self.ttl)
+    try:
+      pipe.execute()
+      self.stats["flushes"] += 1
+    except redis.RedisError as e:
+      self.stats["flush_errors"] += 1
+      logger.warning("Profiler: could not flush samples: %s", e)
+
+  # {endpoint: samples}, most sampled first
+  def endpoints(self):
+    return {endpoint: int(samples) for endpoint, samples in self.client.zrevrange(ENDPOINTS_KEY, 0, -1, withscores=True)}
+
+  # {stack: samples} for one endpoint
+  def stacks(self, endpoint):
+    return {stack: int(count) for stack, count in self.client.hgetall(STACKS_KEY.format(endpoint)).items()}
+
+  def reset(self):
+    endpoints = self.client.zrange(ENDPOINTS_KEY, 0, -1)
+    self.client.delete(ENDPOINTS_KEY, *[STACKS_KEY.format(endpoint) for endpoint in endpoints])
+
+  def get_stats(self):
+    with self._lock:
+      stats = dict(self.stats)
+      stats["active"] = len(self._active)
+    stats["sample_rate"] = self.sample_rate
+    stats["interval_ms"] = self.interval * 1000
+    return stats
+
+def to_collapsed(stacks):
+  return "".join(f"{stack} {count}\n" for stack, count in sorted(stacks.items()))
+
+# Minimal flamegraph: one row per stack depth, each frame as wide as its
+# share of the samples
+def to_svg(stacks, title="", width=1200, row_height=16):
+  root = {"count": 0, "children": {}}
+  for stack, count in stacks.items():
+    root["count"] += count
+    node = root
+    for frame in stack.split(";"):
+      node = node["children"].setdefault(frame, {"count": 0, "children": {}})
+      node["count"] += count
+
+  rects = []
+  max_depth = 0
+
+  def layout(node, x, depth):
+    nonlocal max_depth
+    max_depth = max(max_depth, depth)
+    for frame, child in sorted(node["children"].items()):
+      child_width = width * child["count"] / root["count"]
+      if child_width >= 0.5:
+        rects.append((x, depth, child_width, frame, child["count"]))
+        layout(child, x, depth + 1)
+      x += child_width
+
+  if root["count"]:
+    layout(root, 0.0, 0)
+  height = (max_depth + 2) * row_height
+  parts = [
+    f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+    f'font-family="monospace" font-size="11">',
+    f'<text x="4" y="12">{html.escape(title)} ({root["count"]} samples)</text>',
+  ]
+  for x, depth, rect_width, frame, count in rects:
+    # Root at the bottom, callees stacked above
+    y = height - (depth + 1) * row_height
+    hue = 20 + zlib.crc32(frame.encode()) % 40
+    label = html.escape(frame)
+    share = 100 * count / root["count"]
+    parts.append(
+      f'<g><title>{label} ({count} samples, {share:.1f}%)</title>'
+      f'<rect x="{x:.1f}" y="{y}" width="{rect_width:.1f}" height="{row_height - 1}" '
+      f'fill="hsl({hue},90%,60%)"/>'
+    )
+    if rect_width > 40:
+      parts.append(f'<text x="{x + 3:.1f}" y="{y + row_height - 4}">{label[:int(rect_width / 7)]}</text>')
+    parts.append("</g>")
+  parts.append("</svg>")
+  return "\n".join(parts)
+
+# Whether gevent has patched threads into greenlets (gunicorn's gevent worker)
+def under_gevent():
+  monkey = sys.modules.get("gevent.monkey")
+  return monkey is not None and monkey.is_module_patched("threading")
+
+def init_app(app):
+  if not app.config['PROFILER_ENABLED']:
+    app.profiler = None
+    return
+  if under_gevent():
+    # The sampler would only ever see the hub's stack
+    logger.warning("Profiler: not available under gevent, use the gthread or sync worker class")
+    app.profiler = None
+    return
+  app.profiler = Profiler(
+    app.cache,
+    sample_rate=app.config['PROFILER_SAMPLE_RATE'],
+    token=app.config['PROFILER_TOKEN'],
+    interval=app.config['PROFILER_INTERVAL_MS'] / 1000,
+    flush_seconds=app.config['PROFILER_FLUSH_SECONDS'],
+    max_stacks=app.config['PROFILER_MAX_STACKS'],
+    max_depth=app.config['PROFILER_MAX_DEPTH'],
+    ttl=app.config['PROFILER_TTL_SECONDS']
+  )
+
+  @app.before_request
+  def start_profiling():
+    if app.profiler.wants(request.headers):
+      app.profiler.begin(request.endpoint or "unmatched")
+      g.profiling = True
+
+  @app.teardown_request
+  def stop_profiling(exc):
+    if g.pop("profiling", False):
+      app.profiler.end()
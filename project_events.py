@@ -0,0 +1,347 @@
+# project_events.py
+# Live project and task changes for GET /project/<id>/events (Server-Sent
+# Events). Write routes publish a compact change event on Redis pub/sub once
+# their transaction has committed:
+#   {"type": "task.updated", "pid": 7, "id": 42, "status": 2}
+# Each process holds one pattern subscription to every project's channel and
+# fans the events out to its open streams, so streams cost no Redis or MySQL
+# connection of their own.
+#
+# Every stream has a bounded queue (EVENTS_QUEUE_SIZE). A client that falls
+# that far behind gets one "resync" event instead of the backlog and should
+# refetch the project; the same happens to every stream when the
+# subscription drops, since events may have been missed. Idle streams get a
+# heartbeat comment every EVENTS_HEARTBEAT_SECONDS, which also detects closed
+# connections. A stream ends after EVENTS_MAX_SECONDS and the browser's
+# EventSource reconnects on its own, which authorizes it again.
+#
+# Streams are authorized when they open. A stream also ends right after
+# delivering a "project.deleted" event, or a "project.updated" event that
+# removes its user as a collaborator, so nobody keeps receiving a project they
+# have left. Streams also end when the subscription drops, after their
+# "resync": a removal published in the meantime would have been missed.
+#
+# ProjectEventHub serves the Flask route. Each open stream occupies a server
+# thread (or greenlet), so each process serves at most EVENTS_MAX_STREAMS of
+# them. AsyncProjectEventHub serves the async route under asgi.py, where an
+# idle stream holds no thread, up to EVENTS_ASYNC_MAX_STREAMS per process.
+
+import asyncio
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import redis
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "project:{}:events"
+CHANNEL_PATTERN = "project:*:events"
+RESYNC = {"type": "resync"}
+# Wakes a waiting stream that has just ended
+END = {"type": "end"}
+
+# Publish a change to project `pid`. Never fails the request that made the
+# change: an event lost to a Redis error only delays what clients see until
+# their next refetch
+def publish_event(client, pid, type, **fields):
+  try:
+    client.publish(CHANNEL.format(pid), json.dumps({"type": type, "pid": pid, **fields}, default=str))
+  except redis.RedisError as e:
+    logger.warning("Project events: could not publish %s: %s", type, e)
+
+# Whether `event` takes `username` off the project, ending their stream
+def removes(event, username):
+  return event["type"] == "project.deleted" or event.get("collaborator_removed") == username
+
+def format_event(event):
+  return f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+class EventStream:
+  def __init__(self, pid, username, queue_size):
+    self.pid = pid
+    self.username = username
+    self.queue = queue.Queue(queue_size)
+    self.overflowed = False
+    self.ended = False
+
+  def put(self, event):
+    if self.overflowed or self.ended:
+      return False
+    try:
+      self.queue.put_nowait(event)
+      return True
+    except queue.Full:
+      # Drop the backlog; the client gets a single resync instead
+      self.overflowed = True
+      return False
+
+  # Deliver what is queued, then stop
+  def end(self):
+    self.ended = True
+    try:
+      self.queue.put_nowait(END)
+    except queue.Full:
+      # The waiting reader wakes up for the queued events anyway
+      pass
+
+  # Next event, or None after `timeout` seconds without one
+  def get(self, timeout):
+    if self.overflowed:
+      self.overflowed = False
+      with self.queue.mutex:
+        self.queue.queue.clear()
+      if self.ended:
+        self.queue.put_nowait(END)
+      return RESYNC
+    try:
+      return self.queue.get(timeout=timeout)
+    except queue.Empty:
+      return None
+
+class AsyncEventStream(EventStream):
+  def __init__(self, pid, username, queue_size):
+    self.pid = pid
+    self.username = username
+    self.queue = asyncio.Queue(queue_size)
+    self.overflowed = False
+    self.ended = False
+
+  def put(self, event):
+    if self.overflowed or self.ended:
+      return False
+    try:
+      self.queue.put_nowait(event)
+      return True
+    except asyncio.QueueFull:
+      self.overflowed = True
+      return False
+
+  def end(self):
+    self.ended = True
+    try:
+      self.queue.put_nowait(END)
+    except asyncio.QueueFull:
+      pass
+
+  async def get(self, timeout):
+    if self.overflowed:
+      self.overflowed = False
+      while not self.queue.empty():
+        self.queue.get_nowait()
+      if self.ended:
+        self.queue.put_nowait(END)
+      return RESYNC
+    try:
+      return await asyncio.wait_for(self.queue.get(), timeout)
+    except asyncio.TimeoutError:
+      return None
+
+# Open streams by project, and the fan-out shared by both hubs
+class EventHubBase:
+  stream_class = EventStream
+
+  def __init__(self, client, queue_size=100, heartbeat_seconds=15, max_streams=4, max_seconds=300):
+    # Redis client used for the subscription
+    self.client = client
+    self.queue_size = queue_size
+    self.heartbeat_seconds = heartbeat_seconds
+    self.max_streams = max_streams
+    self.max_seconds = max_seconds
+    # pid -> set of open EventStreams
+    self._streams = {}
+    self._count = 0
+    self._lock = threading.Lock()
+    self.stats = {"streams_opened": 0, "streams_rejected": 0, "streams_ended": 0, "events": 0,
+                  "delivered": 0, "overflows": 0, "reconnects": 0}
+
+  # A new stream of project `pid` for `username`, or None if this process is
+  # at max_streams
+  def open(self, pid, username):
+    self._ensure_started()
+    with self._lock:
+      if self._count >= self.max_streams:
+        self.stats["streams_rejected"] += 1
+        return None
+      stream = self.stream_class(pid, username, self.queue_size)
+      self._streams.setdefault(pid, set()).add(stream)
+      self._count += 1
+      self.stats["streams_opened"] += 1
+    return stream
+
+  def close(self, stream):
+    with self._lock:
+      streams = self._streams.get(stream.pid)
+      if streams and stream in streams:
+        streams.discard(stream)
+        self._count -= 1
+        if not streams:
+          del self._streams[stream.pid]
+
+  def _dispatch(self, pid, event):
+    with self._lock:
+      streams = list(self._streams.get(pid, ()))
+      self.stats["events"] += 1
+    for stream in streams:
+      if stream.put(event):
+        self.stats["delivered"] += 1
+      elif not stream.ended:
+        self.stats["overflows"] += 1
+      if removes(event, stream.username):
+        stream.end()
+        self.stats["streams_ended"] += 1
+
+  # The subscription dropped: events (removals among them) may have been
+  # missed, so every stream gets a resync and ends; clients reconnect and are
+  # authorized again
+  def _resync_all(self):
+    with self._lock:
+      streams = [stream for streams in self._streams.values() for stream in streams]
+    for stream in streams:
+      stream.put(RESYNC)
+      stream.end()
+
+  def _message_event(self, message):
+    if message and message["type"] == "pmessage":
+      try:
+        return json.loads(message["data"])
+      except ValueError:
+        pass
+    return None
+
+  def get_stats(self):
+    with self._lock:
+      stats = dict(self.stats)
+      stats["open_streams"] = self._count
+      stats["projects"] = len(self._streams)
+    return stats
+
+class ProjectEventHub(EventHubBase):
+  def __init__(self, client, **kwargs):
+    super().__init__(client, **kwargs)
+    self._pid = None
+    self._stop = threading.Event()
+
+  # SSE body for `stream`: events as they arrive, heartbeats while idle
+  def serve(self, stream):
+    deadline = time.monotonic() + self.max_seconds
+    try:
+      # Reconnect after 3s if the connection drops
+      yield "retry: 3000\n\n"
+      while time.monotonic() < deadline:
+        event = stream.get(self.heartbeat_seconds)
+        if event is END:
+          break
+        if event is None:
+          if stream.ended:
+            break
+          yield ": ping\n\n"
+        else:
+          yield format_event(event)
+    finally:
+      self.close(stream)
+
+  # Start the subscriber in the process that serves requests. A forked
+  # worker starts its own, since threads do not survive fork()
+  def _ensure_started(self):
+    if self._pid == os.getpid():
+      return
+    with self._lock:
+      if self._pid == os.getpid():
+        return
+      self._pid = os.getpid()
+      self._streams = {}
+      self._count = 0
+      threading.Thread(target=self._run, name="project-events", daemon=True).start()
+
+  def _run(self):
+    first = True
+    while not self._stop.is_set():
+      pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+      try:
+        pubsub.psubscribe(CHANNEL_PATTERN)
+        if not first:
+          # Events published while we were away are lost
+          self.stats["reconnects"] += 1
+          self._resync_all()
+        first = False
+        while not self._stop.is_set():
+          event = self._message_event(pubsub.get_message(timeout=1.0))
+          if event:
+            self._dispatch(event.get("pid"), event)
+      except redis.RedisError as e:
+        logger.warning("Project events: subscription lost: %s", e)
+        self._stop.wait(1)
+      finally:
+        try:
+          pubsub.close()
+        except redis.RedisError:
+          pass
+
+  def stop(self):
+    self._stop.set()
+
+# The same streams for async handlers (asgi.py). `client` is a redis.asyncio
+# client; the subscriber runs as a task on the serving event loop
+class AsyncProjectEventHub(EventHubBase):
+  stream_class = AsyncEventStream
+
+  def __init__(self, client, **kwargs):
+    super().__init__(client, **kwargs)
+    self._task = None
+
+  # SSE body for `stream`. Cancelled when the client disconnects
+  async def serve(self, stream):
+    deadline = time.monotonic() + self.max_seconds
+    try:
+      yield b"retry: 3000\n\n"
+      while time.monotonic() < deadline:
+        event = await stream.get(self.heartbeat_seconds)
+        if event is END:
+          break
+        if event is None:
+          if stream.ended:
+            break
+          yield b": ping\n\n"
+        else:
+          yield format_event(event).encode("utf-8")
+    finally:
+      self.close(stream)
+
+  def _ensure_started(self):
+    if self._task is None or self._task.done():
+      self._task = asyncio.get_running_loop().create_task(self._run())
+
+  async def _run(self):
+    first = True
+    while True:
+      pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+      try:
+        await pubsub.psubscribe(CHANNEL_PATTERN)
+        if not first:
+          self.stats["reconnects"] += 1
+          self._resync_all()
+        first = False
+        while True:
+          event = self._message_event(await pubsub.get_message(timeout=1.0))
+          if event:
+            self._dispatch(event.get("pid"), event)
+      except redis.RedisError as e:
+        logger.warning("Project events: subscription lost: %s", e)
+        await asyncio.sleep(1)
+      finally:
+        try:
+          await pubsub.aclose()
+        except redis.RedisError:
+          pass
+
+  async def stop(self):
+    if self._task is not None:
+      self._task.cancel()
+      try:
+        await self._task
+      except asyncio.CancelledError:
+        pass
+      self._task = None
@@ -0,0 +1,159 @@
+# query_stats.py
+# Per-request SQL instrumentation. While a request is being handled,
+# connections from db.get_db_connection hand out cursors that time every
+# statement. At the end of the request the totals are:
+#   - sent to the client as a Server-Timing header (visible in browser
+#     devtools), e.g.  db;dur=12.4;desc="7 statements", db-slowest;dur=5.1
+#   - logged with structured fields (db_statements, db_ms, db_slowest_ms, ...)
+#   - checked for N+1 patterns: a warning is logged when one statement shape
+#     runs more than QUERY_REPEAT_WARN_THRESHOLD times in a request
+#
+#   QUERY_STATS_ENABLED=false  turns all of this off
+
+import logging
+import re
+import time
+from flask import g, request, has_request_context
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+# Collapse lists of placeholders, e.g. IN (%s, %s, %s), so they share a shape
+_PLACEHOLDER_LIST = re.compile(r"%s(?:\s*,\s*%s)+")
+
+# Statement with whitespace and placeholder lists normalized. Statements are
+# parameterized, so this identifies the query regardless of its arguments
+def statement_shape(statement):
+  if isinstance(statement, (bytes, bytearray)):
+    statement = statement.decode("utf-8", "replace")
+  shape = _WHITESPACE.sub(" ", statement).strip()
+  return _PLACEHOLDER_LIST.sub("%s, ...", shape)
+
+class QueryStats:
+  def __init__(self):
+    self.statements = 0
+    self.total = 0.0
+    self.slowest = 0.0
+    self.slowest_shape = None
+    self.shapes = {}
+
+  def record(self, statement, duration):
+    shape = statement_shape(statement)
+    self.statements += 1
+    self.total += duration
+    self.shapes[shape] = self.shapes.get(shape, 0) + 1
+    if duration > self.slowest:
+      self.slowest = duration
+      self.slowest_shape = shape
+
+  # Time spent fetching rows counts as database time
+  def add_fetch_time(self, duration):
+    self.total += duration
+
+  # (shape, count) of statement shapes that ran more than `threshold` times
+  def repeated(self, threshold):
+    return [(shape, count) for shape, count in self.shapes.items() if count > threshold]
+
+  def server_timing(self):
+    return (
+      f'db;dur={self.total * 1000:.1f};desc="{self.statements} statements", '
+      f'db-slowest;dur={self.slowest * 1000:.1f}'
+    )
+
+# Cursor proxy that records every statement in `stats`
+class InstrumentedCursor:
+  def __init__(self, cursor, stats):
+    self._cursor = cursor
+    self._stats = stats
+
+  def execute(self, statement, *args, **kwargs):
+    start = time.perf_counter()
+    try:
+      return self._cursor.execute(statement, *args, **kwargs)
+    finally:
+      self._stats.record(statement, time.perf_counter() - start)
+
+  # One batched statement, however many rows it writes
+  def executemany(self, statement, *args, **kwargs):
+    start = time.perf_counter()
+    try:
+      return self._cursor.executemany(statement, *args, **kwargs)
+    finally:
+      self._stats.record(statement, time.perf_counter() - start)
+
+  def _timed_fetch(self, fetch, *args):
+    start = time.perf_counter()
+    try:
+      return fetch(*args)
+    finally:
+      self._stats.add_fetch_time(time.perf_counter() - start)
+
+  def fetchone(self):
+    return self._timed_fetch(self._cursor.fetchone)
+
+  def fetchmany(self, *args):
+    return self._timed_fetch(self._cursor.fetchmany, *args)
+
+  def fetchall(self):
+    return self._timed_fetch(self._cursor.fetchall)
+
+  def __iter__(self):
+    return iter(self.fetchone, None)
+
+  def __getattr__(self, name):
+    return getattr(self._cursor, name)
+
+# Connection proxy whose cursors are instrumented
+class InstrumentedConnection:
+  def __init__(self, connection, stats):
+    self._connection = connection
+    self._stats = stats
+
+  def cursor(self, *args, **kwargs):
+    return InstrumentedCursor(self._connection.cursor(*args, **kwargs), self._stats)
+
+  def __getattr__(self, name):
+    return getattr(self._connection, name)
+
+# Wrap a new connection if it is opened while handling a request
+def instrument(connection):
+  stats = g.get("query_stats") if has_request_context() else None
+  if stats is None:
+    return connection
+  return InstrumentedConnection(connection, stats)
+
+def init_app(app):
+  if not app.config['QUERY_STATS_ENABLED']:
+    return
+
+  @app.before_request
+  def start_query_stats():
+    g.query_stats = QueryStats()
+
+  @app.after_request
+  def report_query_stats(response):
+    stats = g.get("query_stats")
+    if stats is None or not stats.statements:
+      return response
+    response.headers.add('Server-Timing', stats.server_timing())
+    route = request.url_rule.rule if request.url_rule else request.path
+    logger.info(
+      "db %s %s: %d statements, %.1fms (slowest %.1fms)",
+      request.method, route, stats.statements, stats.total * 1000, stats.slowest * 1000,
+      extra={
+        "route": route,
+        "method": request.method,
+        "status": response.status_code,
+        "db_statements": stats.statements,
+        "db_ms": round(stats.total * 1000, 1),
+        "db_slowest_ms": round(stats.slowest * 1000, 1),
+        "db_slowest_statement": stats.slowest_shape,
+      }
+    )
+    for shape, count in stats.repeated(app.config['QUERY_REPEAT_WARN_THRESHOLD']):
+      logger.warning(
+        "Possible N+1 query in %s %s: %d x %s", request.method, route, count, shape,
+        extra={"route": route, "method": request.method, "db_repeated_statement": shape,
+               "db_repeat_count": count}
+      )
+    return response
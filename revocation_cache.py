@@ -0,0 +1,268 @@
+# revocation_cache.py
+# In-process copy of the token blocklist, so the token_in_blocklist check on
+# every @jwt_required request is a dict lookup instead of a Redis GET.
+#
+# Revocations are written to Redis as before (one key per JTI with a TTL) and
+# also published on a pub/sub channel. Each process keeps a background
+# subscriber that applies published revocations to its local set. On
+# (re)connect the subscriber subscribes first and then loads the existing
+# blocklist with SCAN, so no revocation falls between the two.
+#
+# The local set is only trusted while the subscription is live and the last
+# full sync is recent. Otherwise lookups go to Redis as before, so a dropped
+# subscription can delay nothing beyond one reconnect.
+#
+# If Redis itself fails (a lookup or revocation errors or times out, or the
+# subscription drops), the cache goes into degraded mode for retry_seconds:
+# checks are answered from the last known local set without touching Redis,
+# and revocations are kept locally and written to Redis (and published) once
+# it is reachable again. Lookups use their own client with a short timeout, so
+# detecting an outage costs one slow request, not one per request. While
+# degraded, a token revoked by another process since the outage began is
+# still accepted by this one.
+
+import logging
+import os
+import threading
+import time
+import redis
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "blocklist:revoked"
+
+class RevocationCache:
+  def __init__(self, client, resync_seconds=300, enabled=True, lookup_client=None, retry_seconds=5):
+    # Redis client for the blocklist database, and one with a strict timeout
+    # for the lookups made while handling requests
+    self.client = client
+    self.lookup_client = lookup_client or client
+    # Seconds to stay in degraded mode after a Redis failure before trying again
+    self.retry_seconds = retry_seconds
+    # Seconds between full reloads of the blocklist, bounding how long a
+    # missed message could go unnoticed
+    self.resync_seconds = resync_seconds
+    self.enabled = enabled
+    # jti -> unix time at which its blocklist entry expires
+    self._revoked = {}
+    # jti -> expiry of revocations not yet written to Redis
+    self._pending = {}
+    self._down_until = 0.0
+    self._lock = threading.Lock()
+    self._synced_at = None
+    self._pid = None
+    self._thread = None
+    self._stop = threading.Event()
+    self.stats = {"local_hits": 0, "remote_lookups": 0, "messages": 0, "resyncs": 0,
+                  "degraded_hits": 0, "redis_errors": 0, "pending_written": 0}
+
+  # Add JTIs to the blocklist, each for its own TTL in seconds ({jti: ttl}),
+  # and tell the other processes. All writes go out in one pipelined
+  # round-trip. If Redis is unavailable they are kept locally and written once
+  # it is back
+  def revoke(self, ttls):
+    if not ttls:
+      return
+    now = time.time()
+    with self._lock:
+      for jti, ttl in ttls.items():
+        ttl = ttl.total_seconds() if hasattr(ttl, "total_seconds") else ttl
+        self._revoked[jti] = now + ttl
+        self._pending[jti] = now + ttl
+    if not self.is_degraded():
+      try:
+        self._write_pending()
+      except redis.RedisError as e:
+        self._redis_failed(e)
+
+  # Write revocations kept locally to Redis with their remaining TTLs
+  def _write_pending(self):
+    with self._lock:
+      pending = dict(self._pending)
+    now = time.time()
+    pending = {jti: expires for jti, expires in pending.items() if expires > now}
+    if pending:
+      pipe = self.client.pipeline(transaction=False)
+      for jti, expires in pending.items():
+        pipe.set(jti, "", ex=max(1, int(expires - now)))
+        pipe.publish(CHANNEL, f"{jti} {expires}")
+      pipe.execute()
+    with self._lock:
+      for jti in list(self._pending):
+        if jti in pending or self._pending[jti] <= now:
+          del self._pending[jti]
+      self.stats["pending_written"] += len(pending)
+
+  # One page of the blocklist: (next cursor, [(jti, ttl)]). TTLs are fetched
+  # in a single pipeline. A next cursor of 0 means the scan is complete
+  def scan(self, cursor=0, count=100):
+    cursor, keys = self.client.scan(cursor, count=count)
+    if not keys:
+      return cursor, []
+    pipe = self.client.pipeline(transaction=False)
+    for key in keys:
+      pipe.ttl(key)
+    return cursor, list(zip(keys, pipe.execute()))
+
+  def is_revoked(self, jti):
+    revoked = self.lookup_local(jti)
+    if revoked is not None:
+      return revoked
+    try:
+      revoked = self.lookup_client.get(jti) is not None
+    except redis.RedisError as e:
+      return self.lookup_failed(jti, e)
+    if self._pending and not self.enabled:
+      # No subscriber to write them on reconnect
+      try:
+        self._write_pending()
+      except redis.RedisError as e:
+        self._redis_failed(e)
+    return revoked
+
+  # Answer from the local copy: True/False, or None if it is not in sync and
+  # the caller must ask Redis (async handlers do so with their own client)
+  def lookup_local(self, jti):
+    self._ensure_started()
+    if self._is_live():
+      with self._lock:
+        self.stats["local_hits"] += 1
+      return self._is_revoked_locally(jti)
+    if self.is_degraded():
+      with self._lock:
+        self.stats["degraded_hits"] += 1
+      return self._is_revoked_locally(jti)
+    with self._lock:
+      self.stats["remote_lookups"] += 1
+    return None
+
+  # The Redis lookup for `jti` failed: answer from the local copy and stay
+  # off Redis for retry_seconds
+  def lookup_failed(self, jti, error):
+    self._redis_failed(error)
+    with self._lock:
+      self.stats["degraded_hits"] += 1
+    return self._is_revoked_locally(jti)
+
+  def _is_revoked_locally(self, jti):
+    with self._lock:
+      expires = self._revoked.get(jti)
+    return expires is not None and expires > time.time()
+
+  def _redis_failed(self, error):
+    with self._lock:
+      self._down_until = time.monotonic() + self.retry_seconds
+      self.stats["redis_errors"] += 1
+    logger.warning("Revocation cache: Redis unavailable, answering locally: %s", error)
+
+  def is_degraded(self):
+    return time.monotonic() < self._down_until
+
+  # "live": local copy in sync; "redis": asking Redis; "degraded": Redis
+  # unavailable, answering from the last known local copy
+  def mode(self):
+    if self._is_live():
+      return "live"
+    return "degraded" if self.is_degraded() else "redis"
+
+  def _is_live(self):
+    synced_at = self._synced_at
+    return synced_at is not None and time.monotonic() - synced_at < self.resync_seconds * 2
+
+  # Start the subscriber in the process that serves requests. A forked
+  # worker starts its own, since threads do not survive fork()
+  def _ensure_started(self):
+    if not self.enabled or self._pid == os.getpid():
+      return
+    with self._lock:
+      if self._pid == os.getpid():
+        return
+      self._pid = os.getpid()
+      self._revoked = {}
+      self._synced_at = None
+      self._stop.clear()
+      self._thread = threading.Thread(target=self._run, name="revocation-cache", daemon=True)
+      self._thread.start()
+
+  # Load every blocklisted JTI with its remaining TTL
+  def _load(self):
+    revoked = {}
+    now = time.time()
+    cursor = 0
+    while True:
+      cursor, entries = self.scan(cursor, count=1000)
+      for key, ttl in entries:
+        # -1: no expiry, -2: already gone
+        if ttl == -1:
+          revoked[key] = float("inf")
+        elif ttl >= 0:
+          revoked[key] = now + ttl
+      if cursor == 0:
+        break
+    with self._lock:
+      # Keep revocations applied locally while the load was running
+      for jti, expires in self._revoked.items():
+        if expires > now:
+          revoked.setdefault(jti, expires)
+      self._revoked = revoked
+      self._synced_at = time.monotonic()
+      self.stats["resyncs"] += 1
+
+  def _apply(self, data):
+    jti, _, expires = data.rpartition(" ")
+    try:
+      expires = float(expires)
+    except ValueError:
+      return
+    with self._lock:
+      self._revoked[jti] = expires
+      self.stats["messages"] += 1
+
+  def _run(self):
+    while not self._stop.is_set():
+      pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+      try:
+        pubsub.subscribe(CHANNEL)
+        # Reconcile: revocations made while Redis was down go out first, so
+        # the load below includes them
+        self._write_pending()
+        self._load()
+        self._down_until = 0.0
+        next_sync = time.monotonic() + self.resync_seconds
+        while not self._stop.is_set():
+          message = pubsub.get_message(timeout=1.0)
+          if message and message["type"] == "message":
+            self._apply(message["data"])
+          # A revocation whose write failed while the subscription stayed up
+          # (a command or pool timeout) is retried here, not only on reconnect
+          if self._pending and not self.is_degraded():
+            try:
+              self._write_pending()
+            except redis.RedisError as e:
+              self._redis_failed(e)
+          if time.monotonic() >= next_sync:
+            self._load()
+            next_sync = time.monotonic() + self.resync_seconds
+      except redis.RedisError as e:
+        # Fall back to Redis lookups, or to the local copy while Redis is
+        # unreachable, until the subscription is back
+        self._synced_at = None
+        self._redis_failed(e)
+        self._stop.wait(1)
+      finally:
+        try:
+          pubsub.close()
+        except redis.RedisError:
+          pass
+
+  def stop(self):
+    self._stop.set()
+
+  def get_stats(self):
+    with self._lock:
+      stats = dict(self.stats)
+      stats["size"] = len(self._revoked)
+      stats["pending"] = len(self._pending)
+    stats["live"] = self._is_live()
+    stats["mode"] = self.mode()
+    return stats
@@ -0,0 +1,110 @@
+# admin_routes.py
+
+from flask import Blueprint, Response, jsonify, request, current_app
+from helpers import admin_required
+from profiler import to_collapsed, to_svg
+
+admin_bp = Blueprint('admin_bp', __name__)
+
+# Password hashing pool: queue depth, rejections and time spent
+@admin_bp.route('/admin/password-hasher', methods=['GET'])
+@admin_required
+def get_password_hasher_stats():
+  # 200 OK: For a successful request that returns data
+  return jsonify(current_app.password_hasher.get_stats()), 200
+
+# Local blocklist copy: size, sync state and how lookups were answered
+@admin_bp.route('/admin/revocations', methods=['GET'])
+@admin_required
+def get_revocation_cache_stats():
+  # 200 OK: For a successful request that returns data
+  return jsonify(current_app.revocations.get_stats()), 200
+
+# Outgoing email queue: pending, retrying and undeliverable messages
+@admin_bp.route('/admin/outbox', methods=['GET'])
+@admin_required
+def get_outbox_stats():
+  outbox = current_app.outbox
+  if not outbox:
+    # 404 Not Found: Outbox disabled
+    return jsonify({"error": "Email outbox is disabled"}), 404
+  # 200 OK: For a successful request that returns data
+  return jsonify({**outbox.pending(), "stats": outbox.stats}), 200
+
+# Live project event streams: open streams, events fanned out, overflows
+@admin_bp.route('/admin/events', methods=['GET'])
+@admin_required
+def get_event_stats():
+  hub = current_app.project_events
+  if not hub:
+    # 404 Not Found: Live events disabled
+    return jsonify({"error": "Live project events are disabled"}), 404
+  # 200 OK: For a successful request that returns data
+  return jsonify(hub.get_stats()), 200
+
+# Coalesced task writes: updates queued and being flushed, flush lag
+@admin_bp.route('/admin/task-writes', methods=['GET'])
+@admin_required
+def get_task_write_stats():
+  writes = current_app.task_writes
+  if not writes:
+    # 404 Not Found: Write coalescing disabled
+    return jsonify({"error": "Task write coalescing is disabled"}), 404
+  # 200 OK: For a successful request that returns data
+  return jsonify(writes.get_stats()), 200
+
+# Blocklisted jtis with their remaining TTLs, one SCAN page at a time. Pass
+# the returned cursor back to get the next page; a cursor of 0 means done
+@admin_bp.route('/admin/blocklist', methods=['GET'])
+@admin_required
+def get_blocklist():
+  cursor = request.args.get('cursor', default=0, type=int)
+  count = min(request.args.get('count', default=100, type=int), 1000)
+  cursor, entries = current_app.revocations.scan(cursor, count)
+  # 200 OK: For a successful request that returns data
+  return jsonify({
+    "cursor": cursor,
+    "entries": [{"jti": jti, "ttl": ttl} for jti, ttl in entries]
+  }), 200
+
+# Sampling profiler: endpoints with samples, and the profiler's own counters
+@admin_bp.route('/admin/profile', methods=['GET'])
+@admin_required
+def get_profiles():
+  if not current_app.profiler:
+    # 404 Not Found: Profiler disabled
+    return jsonify({"error": "Profiler is disabled"}), 404
+  # 200 OK: For a successful request that returns data
+  return jsonify({
+    "endpoints": current_app.profiler.endpoints(),
+    "stats": current_app.profiler.get_stats()
+  }), 200
+
+# Aggregated stacks for one endpoint (e.g. ai_bp.prompt_ai_to_brainstorm_project_idea)
+#   format=collapsed (default): "frame;frame;frame count" lines
+#   format=svg:                 flamegraph
+@admin_bp.route('/admin/profile/<endpoint>', methods=['GET'])
+@admin_required
+def get_profile(endpoint):
+  if not current_app.profiler:
+    # 404 Not Found: Profiler disabled
+    return jsonify({"error": "Profiler is disabled"}), 404
+  stacks = current_app.profiler.stacks(endpoint)
+  if not stacks:
+    # 404 Not Found: No samples for this endpoint
+    return jsonify({"error": f"No samples for {endpoint}"}), 404
+  if request.args.get('format') == 'svg':
+    # 200 OK: For a successful request that returns data
+    return Response(to_svg(stacks, title=endpoint), status=200, mimetype="image/svg+xml")
+  # 200 OK: For a successful request that returns data
+  return Response(to_collapsed(stacks), status=200, mimetype="text/plain")
+
+@admin_bp.route('/admin/profile', methods=['DELETE'])
+@admin_required
+def delete_profiles():
+  if not current_app.profiler:
+    # 404 Not Found: Profiler disabled
+    return jsonify({"error": "Profiler is disabled"}), 404
+  current_app.profiler.reset()
+  # 200 OK: For a successful request
+  return jsonify({"message": "Profiles deleted"}), 200
@@ -1,14 +1,134 @@
 # ai_routes.py
 
-import os
+import logging
 import json
-from flask import Blueprint, jsonify, request
+import threading
+import groq
+import mysql.connector
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from flask import Blueprint, jsonify, request, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from groq import Groq
-from helpers import engineer_brainstorm_prompt, ProjectIdea
+import ai_telemetry
+from ai_client import create_chat_completion, get_stats, AIUnavailableError
+from ai_output import parse_project_idea, parse_tasks_lists, failed_generation, AIOutputError
+from ai_output import count as count_output, get_stats as get_output_stats
+from db import get_db_connection
+from idea_index import fetch_ideas
+from helpers import engineer_brainstorm_prompt, engineer_taskgen_prompt, admin_required, ProjectIdea
+
+logger = logging.getLogger(__name__)
 
 ai_bp = Blueprint('ai_bp', __name__)
 
+# Shared pool for per-step task generation. Bounded so that concurrent project
+# creations cannot open an unbounded number of upstream requests
+_taskgen_executor = None
+_taskgen_executor_lock = threading.Lock()
+
+# Conversation asking the model to correct its unusable output
+def repair_messages(messages, generated_text):
+  return messages + [
+    {"role": "assistant", "content": generated_text},
+    {
+      "role": "user",
+      "content": "That response was not valid JSON for the required schema. "
+                 "Reply with only the corrected JSON object.",
+    },
+  ]
+
+# Text generated by the model in JSON mode. Output Groq rejects as invalid
+# JSON is taken from the error, so it can be repaired like any other
+def create_json_completion(messages, endpoint, user=None, temperature=0):
+  try:
+    response = create_chat_completion(
+      endpoint=endpoint,
+      user=user,
+      messages=messages,
+      # Temperature 0 encourages more deterministic output and reduced randomness
+      temperature=temperature,
+      # Streaming is not supported in JSON mode
+      stream=False,
+      # Enable JSON mode by setting the response format
+      response_format={"type": "json_object"},
+    )
+  except groq.BadRequestError as e:
+    generated_text = failed_generation(e)
+    if generated_text is None:
+      raise
+    count_output("rejected_upstream")
+    return generated_text
+  return response.choices[0].message.content
+
+# Call the model in JSON mode and parse its output with `parse`. Malformed
+# output is repaired locally by the parser; only if that fails is the model
+# re-prompted, once, to correct its own output. Raises AIOutputError if the
+# corrected output is still unusable
+def complete_and_parse(messages, parse, endpoint, user=None, temperature=0):
+  generated_text = create_json_completion(messages, endpoint, user, temperature)
+  # print(f"Generated text: {generated_text}")
+  try:
+    return parse(generated_text)
+  except AIOutputError as e:
+    logger.warning("Unusable AI output, re-prompting: %s", e)
+  count_output("reprompted")
+  return parse(create_json_completion(repair_messages(messages, generated_text), f"{endpoint}_repair", user))
+
+# Generate one project idea for the given inputs. Returns the idea as
+# validated JSON text; raises AIUnavailableError/AIOutputError on failure
+#   endpoint:    telemetry label
+#   temperature: 0 for the deterministic request path; the idea pool uses a
+#                higher value so pooled ideas for one combination differ
+def generate_project_idea(roles, technologies, industries, user=None,
+                          endpoint="brainstorm", temperature=0):
+  messages = brainstorm_messages(roles, technologies, industries)
+  idea = complete_and_parse(messages, parse_project_idea, endpoint, user, temperature)
+  # Return normalized JSON text so clients always receive the schema's keys
+  return idea.model_dump_json()
+
+# Chat messages for a brainstorm request
+def brainstorm_messages(roles, technologies, industries):
+  prompt = engineer_brainstorm_prompt(roles, technologies, industries)
+  # print(f"Prompt: {prompt}")
+  return [
+    # Set the behavior of the assistant and provide instructions
+    # for how it should behave while handling the prompt
+    {
+      "role": "system",
+      # Pass the JSON schema to the model
+      "content": (
+        "You are a project assistant that outputs project ideas in JSON.\n"
+        "The JSON object must use the schema: "
+        f"{json.dumps(ProjectIdea.model_json_schema(), indent=2)}"
+      ),
+    },
+    # Set user message
+    {
+      "role": "user",
+      "content": prompt,
+    },
+  ]
+
+# Closest existing idea for the brainstorm inputs from the local similarity
+# index, or None if nothing is similar enough
+def find_similar_idea(roles, technologies, industries):
+  matches = current_app.idea_index.similar_to_inputs(roles, technologies, industries, k=1)
+  matches = [m for m in matches if m[1] >= current_app.config['IDEA_SIMILARITY_THRESHOLD']]
+  if not matches:
+    return None
+  connection = get_db_connection()
+  if not connection:
+    return None
+  cursor = connection.cursor()
+  try:
+    ideas = fetch_ideas(cursor, matches)
+    return ideas[0] if ideas else None
+  except mysql.connector.Error as e:
+    logger.error("Error fetching similar idea: %s", e)
+    return None
+  finally:
+    cursor.close()
+    connection.close()
+
 # PROMPT
 @ai_bp.route('/api/prompt', methods=['POST'])
 # Ensure route /prompt can only be accessed by users with valid JWT
@@ -18,99 +138,157 @@ def prompt_ai_to_brainstorm_project_idea():
   current_user = get_jwt_identity()
   # print(f"User '{current_user}' is authenticated.")
   data = request.get_json()
-  roles = data['role']
-  technologies = data['technology']
-  industries = data['industries']
-  prompt = engineer_brainstorm_prompt(roles, technologies, industries)
-  # print(f"Prompt: {prompt}")
   if not data:
     # 400 Bad Request: No inputs provided
     return jsonify({"error": "No inputs provided"}), 400
+  roles = data['role']
+  technologies = data['technology']
+  industries = data['industries']
+
+  # Offer the closest previously generated idea, if it is similar enough.
+  # Clients can ask for only this instant result with "similar_only"
+  similar = find_similar_idea(roles, technologies, industries)
+  if data.get('similar_only'):
+    # 200 OK: For a successful request that returns data
+    return jsonify({"similar": similar}), 200
+
+  # Serve from the warm pool of pre-generated ideas when one is available
+  idea_pool = current_app.idea_pool
+  if idea_pool:
+    idea_pool.record_request(roles, technologies, industries)
+    pooled_idea = idea_pool.take(roles, technologies, industries)
+    if pooled_idea:
+      # 200 OK: For a successful request that returns data
+      return jsonify({"response": pooled_idea, "pooled": True, "similar": similar}), 200
+
   try:
-    # Initialize Groq instance
-    client = Groq(api_key=os.getenv("GROQ_KEY"),)
-    response = client.chat.completions.create(
-      messages=[
-        # Set the behavior of the assistant and provide instructions
-        # for how it should behave while handling the prompt
-        {
-          "role": "system",
-          # Pass the JSON schema to the model
-          "content": (
-            "You are a project assistant that outputs project ideas in JSON.\n"
-            "The JSON object must use the schema: "
-            f"{json.dumps(ProjectIdea.model_json_schema(), indent=2)}"
-          ),
-        },
-        # Set user message
-        {
-          "role": "user",
-          "content": prompt,
-        },
-      ],
-      # Specify language model
-      model="llama3-8b-8192",
-      # Set temperature to 0 to encourage more deterministic output and reduced
-      # randomness.
-      temperature=0,
-      # Streaming is not supported in JSON mode
-      stream=False,
-      # Enable JSON mode by setting the response format
-      response_format={"type": "json_object"},
-    )
-    generated_text = response.choices[0].message.content
+    generated_text = generate_project_idea(roles, technologies, industries, user=current_user)
     # print(f"Generated text: {generated_text}")
     # 200 OK: For a successful request that returns data
-    return jsonify({"response": generated_text}), 200
+    return jsonify({"response": generated_text, "similar": similar}), 200
+  except AIOutputError as e:
+    # 502 Bad Gateway: Upstream responded, but its output was unusable
+    return jsonify({"error": "AI returned an invalid project idea", "similar": similar}), 502
+  except AIUnavailableError as e:
+    # 503 Service Unavailable: Upstream degraded or at capacity; fail fast
+    response = jsonify({"error": str(e), "similar": similar})
+    if e.retry_after:
+      response.headers['Retry-After'] = str(int(e.retry_after) + 1)
+    return response, 503
   except Exception as e:
     # 500 Internal Server Error: Generic server-side failures
     return jsonify({"error": "Failed to call AI"}), 500
 
+# AI client health: circuit breaker state and call counters
+@ai_bp.route('/api/ai/health', methods=['GET'])
+def ai_health():
+  stats = get_stats()
+  # Share of generations that were valid as-is, repaired locally, re-prompted
+  stats["output"] = get_output_stats()
+  status = 503 if stats["breaker"]["state"] == "open" else 200
+  return jsonify(stats), status
+
+# AI call telemetry: latency histograms, token usage and cost by endpoint
+# and by user. Admins only
+@ai_bp.route('/api/ai/telemetry', methods=['GET'])
+@admin_required
+def ai_telemetry_report():
+  top_users = request.args.get('top_users', default=50, type=int)
+  return jsonify(ai_telemetry.snapshot(top_users=top_users)), 200
+
 # Helper function to generate tasks
-def prompt_ai_to_generate_tasks(prompt):
-  # print(f"Prompt: {prompt}")
+#   endpoint: telemetry label ('taskgen' for whole projects, 'taskgen_step'
+#             for per-step requests)
+def prompt_ai_to_generate_tasks(prompt, user=None, endpoint="taskgen"):
   try:
-    # Initialize Groq instance
-    client = Groq(api_key=os.getenv("GROQ_KEY"),)
-    response = client.chat.completions.create(
-      messages=[
-        # Set the behavior of the assistant and provide instructions
-        # for how it should behave while handling the prompt
-        {
-          "role": "system",
-          # Pass the JSON schema to the model
-          "content": (
-            "You are project assistant that provides task lists for each project step in JSON.\n"
-            "The JSON object must use the schema: "
-            "{'tasks_lists': [{'title': 'Step 1 title', 'tasks': ['task 1', 'task 2', 'task 3']}, ...]}"
-          ),
-        },
-        # Set user message
-        {
-          "role": "user",
-          "content": prompt,
-        },
-      ],
-      # Specify language model
-      model="llama3-8b-8192",
-      # Set temperature to 0 to encourage more deterministic output and reduced
-      # randomness.
-      temperature=0,
-      # Streaming is not supported in JSON mode
-      stream=False,
-      # Enable JSON mode by setting the response format
-      response_format={"type": "json_object"},
-    )
-    # print(f"Response: {response}")
-    generated_text = response.choices[0].message.content
-    # print(f"Generated text: {generated_text}")
-    parsed_response = json.loads(generated_text)
-    # Extract 'tasks_lists' from parsed_response, defaulting to empty list if
-    # not found
-    tasks_lists = parsed_response.get('tasks_lists', [])
-    # Return tasks_list
-    return tasks_lists
+    # Validated list of {'title': ..., 'tasks': [...]} dicts
+    return complete_and_parse(taskgen_messages(prompt), parse_tasks_lists, endpoint, user)
   except Exception as e:
     # Log the error and return None
-    print(f"Error in AI generation: {e}")
-    return None
\ No newline at end of file
+    logger.error("Error in AI generation: %s", e)
+    return None
+
+# Chat messages for a task generation request
+def taskgen_messages(prompt):
+  # print(f"Prompt: {prompt}")
+  return [
+    # Set the behavior of the assistant and provide instructions
+    # for how it should behave while handling the prompt
+    {
+      "role": "system",
+      # Pass the JSON schema to the model
+      "content": (
+        "You are project assistant that provides task lists for each project step in JSON.\n"
+        "The JSON object must use the schema: "
+        "{'tasks_lists': [{'title': 'Step 1 title', 'tasks': ['task 1', 'task 2', 'task 3']}, ...]}"
+      ),
+    },
+    # Set user message
+    {
+      "role": "user",
+      "content": prompt,
+    },
+  ]
+
+# Lazily create the shared task generation pool
+def get_taskgen_executor(max_workers):
+  global _taskgen_executor
+  with _taskgen_executor_lock:
+    if _taskgen_executor is None:
+      _taskgen_executor = ThreadPoolExecutor(
+        max_workers=max_workers, thread_name_prefix="taskgen"
+      )
+    return _taskgen_executor
+
+# Fit one group's generated tasks lists to the steps it was asked about.
+# Returns None if the group should be considered failed
+def fit_tasks_lists_to_group(tasks_lists, group):
+  if not tasks_lists:
+    return None
+  if len(tasks_lists) == len(group):
+    return tasks_lists
+  if len(group) == 1:
+    # Model split a single step into several lists; merge them back together
+    tasks = []
+    for tasks_list in tasks_lists:
+      tasks += tasks_list.get('tasks', [])
+    return [{'title': group[0], 'tasks': tasks}]
+  return None
+
+# Helper function to generate tasks one group of steps at a time. Each group is
+# sent as its own, smaller prompt over the shared bounded pool, so wall-clock
+# time is bounded by the slowest group rather than the sum of all steps.
+# Only failed groups are retried; if any group still fails, fall back to the
+# single-prompt path
+def prompt_ai_to_generate_tasks_by_step(title, summary, languages, steps,
+                                        max_workers=4, group_size=1, retries=1, user=None):
+  if not steps:
+    return []
+  group_size = max(1, group_size)
+  groups = [steps[i:i + group_size] for i in range(0, len(steps), group_size)]
+  results = [None] * len(groups)
+  pending = list(range(len(groups)))
+  executor = get_taskgen_executor(max_workers)
+  for attempt in range(retries + 1):
+    futures = {
+      executor.submit(
+        prompt_ai_to_generate_tasks,
+        engineer_taskgen_prompt(title, summary, languages, groups[i]),
+        user, "taskgen_step"
+      ): i
+      for i in pending
+    }
+    for future in as_completed(futures):
+      i = futures[future]
+      results[i] = fit_tasks_lists_to_group(future.result(), groups[i])
+    pending = [i for i, result in enumerate(results) if result is None]
+    if not pending:
+      break
+
+  if pending:
+    logger.warning("Per-step task generation failed for %d of %d groups; falling back to single prompt",
+                   len(pending), len(groups))
+    return prompt_ai_to_generate_tasks(engineer_taskgen_prompt(title, summary, languages, steps), user)
+
+  # Merge in step order so enumerate() in the caller still yields priorities
+  return [tasks_list for group in results for tasks_list in group]
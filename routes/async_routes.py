@@ -0,0 +1,637 @@
+# async_routes.py
+# Async (Quart) versions of the I/O-bound routes, served by asgi.py. Behaviour
+# and responses match the sync handlers in ai_routes, project_routes and
+# task_routes; the difference is that waiting on Groq, MySQL or Redis holds
+# no thread, so one process can keep thousands of requests in flight.
+
+import asyncio
+import logging
+import json
+from datetime import datetime
+from functools import wraps
+import groq
+from flask_jwt_extended import decode_token
+from flask_jwt_extended.config import config as jwt_config
+from flask_jwt_extended.exceptions import (
+  CSRFError, JWTExtendedException, NoAuthorizationError, WrongTokenError
+)
+from jwt.exceptions import ExpiredSignatureError, InvalidTokenError
+from pymysql.err import MySQLError, IntegrityError
+from redis import RedisError
+from quart import Blueprint, Response, jsonify, request, current_app, g
+from ai_client import acreate_chat_completion, AIUnavailableError
+from ai_output import parse_project_idea, parse_tasks_lists, failed_generation, AIOutputError
+from ai_output import count as count_output
+from async_db import get_async_connection, release_async_connection
+from helpers import engineer_taskgen_prompt
+from idea_index import ideas_query, ideas_from_rows
+from project_events import publish_event
+from change_log import change, record_changes_async
+from task_writes import COLUMNS as TASK_WRITE_COLUMNS, update_statement
+from routes.project_routes import PROJECT_LIMIT
+from routes.ai_routes import (
+  brainstorm_messages, taskgen_messages, repair_messages, fit_tasks_lists_to_group
+)
+
+logger = logging.getLogger(__name__)
+
+async_bp = Blueprint('async_bp', __name__)
+
+# Decode the request's access token cookie and check its CSRF header with
+# flask_jwt_extended itself, in the Flask app's context, so every JWT_*
+# setting applies (algorithms, cookie and header names, leeway, audience).
+# Returns the claims and identity; raises what @jwt_required() would
+def decode_access_cookie(cookies, headers, method, form=None):
+  with current_app.flask_app.app_context():
+    token = cookies.get(jwt_config.access_cookie_name)
+    if not token:
+      raise NoAuthorizationError(f'Missing cookie "{jwt_config.access_cookie_name}"')
+    csrf = None
+    if jwt_config.cookie_csrf_protect and method in jwt_config.csrf_request_methods:
+      csrf = headers.get(jwt_config.access_csrf_header_name)
+      if not csrf and form is not None:
+        csrf = form.get(jwt_config.access_csrf_field_name)
+      if not csrf:
+        raise CSRFError("Missing CSRF token")
+    claims = decode_token(token, csrf_value=csrf)
+    if claims["type"] == "refresh":
+      raise WrongTokenError("Only non-refresh tokens are allowed")
+    return claims, claims[jwt_config.identity_claim_key]
+
+# Equivalent of flask_jwt_extended's @jwt_required() for cookie tokens. Only
+# the blocklist lookup is async. Error responses match flask_jwt_extended's
+# defaults
+def jwt_required_async(fn):
+  @wraps(fn)
+  async def wrapper(*args, **kwargs):
+    form = None
+    if current_app.config.get('JWT_CSRF_CHECK_FORM'):
+      form = await request.form
+    try:
+      claims, identity = decode_access_cookie(request.cookies, request.headers, request.method, form)
+    except ExpiredSignatureError:
+      # 401 Unauthorized: Access token expired
+      return jsonify({"msg": "Token has expired"}), 401
+    except (NoAuthorizationError, CSRFError) as e:
+      # 401 Unauthorized: No access token, or a missing or mismatched CSRF header
+      return jsonify({"msg": str(e)}), 401
+    except (JWTExtendedException, InvalidTokenError) as e:
+      # 422 Unprocessable Entity: Malformed token, or a refresh token
+      return jsonify({"msg": str(e)}), 422
+    if await is_token_revoked(claims['jti']):
+      # 401 Unauthorized: Token revoked by logout
+      return jsonify({"msg": "Token has been revoked"}), 401
+    g.jwt_identity = identity
+    return await fn(*args, **kwargs)
+  return wrapper
+
+# Blocklist check: the local revocation cache when it is in sync (or Redis is
+# down), otherwise the async Redis client
+async def is_token_revoked(jti):
+  revoked = current_app.revocations.lookup_local(jti)
+  if revoked is None:
+    try:
+      revoked = await current_app.async_blocklist.get(jti) is not None
+    except RedisError as e:
+      revoked = current_app.revocations.lookup_failed(jti, e)
+  return revoked
+
+def get_identity():
+  return g.jwt_identity
+
+# Async version of ai_routes.create_json_completion
+async def create_json_completion_async(messages, endpoint, user=None, temperature=0):
+  try:
+    response = await acreate_chat_completion(
+      messages, endpoint=endpoint, user=user, temperature=temperature,
+      stream=False, response_format={"type": "json_object"},
+    )
+  except groq.BadRequestError as e:
+    generated_text = failed_generation(e)
+    if generated_text is None:
+      raise
+    count_output("rejected_upstream")
+    return generated_text
+  return response.choices[0].message.content
+
+# Async version of ai_routes.complete_and_parse
+async def complete_and_parse_async(messages, parse, endpoint, user=None, temperature=0):
+  generated_text = await create_json_completion_async(messages, endpoint, user, temperature)
+  try:
+    return parse(generated_text)
+  except AIOutputError as e:
+    logger.warning("Unusable AI output, re-prompting: %s", e)
+  count_output("reprompted")
+  return parse(await create_json_completion_async(repair_messages(messages, generated_text), f"{endpoint}_repair", user))
+
+async def generate_tasks_async(prompt, user=None, endpoint="taskgen"):
+  try:
+    return await complete_and_parse_async(taskgen_messages(prompt), parse_tasks_lists, endpoint, user)
+  except Exception as e:
+    logger.error("Error in AI generation: %s", e)
+    return None
+
+# Async version of project_routes.generate_tasks_lists. Per-step groups run
+# concurrently on the event loop, at most TASKGEN_MAX_WORKERS at a time per
+# request
+async def generate_tasks_lists_async(title, summary, languages, steps, username=None):
+  if not steps:
+    return []
+  if current_app.config['TASKGEN_MODE'] != 'per-step':
+    return await generate_tasks_async(engineer_taskgen_prompt(title, summary, languages, steps), username)
+  group_size = max(1, current_app.config['TASKGEN_GROUP_SIZE'])
+  groups = [steps[i:i + group_size] for i in range(0, len(steps), group_size)]
+  limit = asyncio.Semaphore(current_app.config['TASKGEN_MAX_WORKERS'])
+
+  async def generate_group(group):
+    async with limit:
+      tasks_lists = await generate_tasks_async(
+        engineer_taskgen_prompt(title, summary, languages, group), username, "taskgen_step"
+      )
+    return fit_tasks_lists_to_group(tasks_lists, group)
+
+  results = await asyncio.gather(*(generate_group(group) for group in groups))
+  # Retry failed groups once, then fall back to a single prompt
+  pending = [i for i, result in enumerate(results) if result is None]
+  retried = await asyncio.gather(*(generate_group(groups[i]) for i in pending))
+  for i, result in zip(pending, retried):
+    results[i] = result
+  if any(result is None for result in results):
+    logger.warning("Per-step task generation failed; falling back to single prompt")
+    return await generate_tasks_async(engineer_taskgen_prompt(title, summary, languages, steps), username)
+  return [tasks_list for group in results for tasks_list in group]
+
+async def find_similar_idea_async(roles, technologies, industries):
+  # A NumPy scan over the whole index: keep it off the event loop
+  matches = await asyncio.to_thread(current_app.idea_index.similar_to_inputs, roles, technologies, industries, k=1)
+  matches = [m for m in matches if m[1] >= current_app.config['IDEA_SIMILARITY_THRESHOLD']]
+  if not matches:
+    return None
+  connection = await get_async_connection()
+  if not connection:
+    return None
+  try:
+    async with connection.cursor() as cursor:
+      await cursor.execute(*ideas_query(matches))
+      ideas = ideas_from_rows(await cursor.fetchall(), matches)
+    return ideas[0] if ideas else None
+  except MySQLError as e:
+    logger.error("Error fetching similar idea: %s", e)
+    return None
+  finally:
+    release_async_connection(connection)
+
+def project_to_dict(project):
+  return {
+    "id": project[0],
+    "owner": project[1],
+    "collaborator1": project[2],
+    "collaborator2": project[3],
+    "title": project[4],
+    "summary": project[5],
+    # Convert JSON strings to list format
+    "steps": json.loads(project[6]),
+    "languages": json.loads(project[7]),
+    "status": project[8],
+    "date_created": project[9]
+  }
+
+def task_to_dict(task):
+  return {
+    "id": task[0],
+    "pid": task[1],
+    "description": task[2],
+    "priority": task[3],
+    "status": task[4]
+  }
+
+# PROMPT
+@async_bp.route('/api/prompt', methods=['POST'])
+@jwt_required_async
+async def prompt_ai_to_brainstorm_project_idea():
+  current_user = get_identity()
+  data = await request.get_json()
+  if not data:
+    # 400 Bad Request: No inputs provided
+    return jsonify({"error": "No inputs provided"}), 400
+  roles = data['role']
+  technologies = data['technology']
+  industries = data['industries']
+
+  similar = await find_similar_idea_async(roles, technologies, industries)
+  if data.get('similar_only'):
+    # 200 OK: For a successful request that returns data
+    return jsonify({"similar": similar}), 200
+
+  # The idea pool uses the sync Redis client; its calls are short, so they
+  # run on the default executor rather than blocking the loop
+  idea_pool = current_app.idea_pool
+  if idea_pool:
+    await asyncio.to_thread(idea_pool.record_request, roles, technologies, industries)
+    pooled_idea = await asyncio.to_thread(idea_pool.take, roles, technologies, industries)
+    if pooled_idea:
+      # 200 OK: For a successful request that returns data
+      return jsonify({"response": pooled_idea, "pooled": True, "similar": similar}), 200
+
+  try:
+    idea = await complete_and_parse_async(
+      brainstorm_messages(roles, technologies, industries), parse_project_idea, "brainstorm", current_user
+    )
+    # 200 OK: For a successful request that returns data
+    return jsonify({"response": idea.model_dump_json(), "similar": similar}), 200
+  except AIOutputError:
+    # 502 Bad Gateway: Upstream responded, but its output was unusable
+    return jsonify({"error": "AI returned an invalid project idea", "similar": similar}), 502
+  except AIUnavailableError as e:
+    # 503 Service Unavailable: Upstream degraded or at capacity; fail fast
+    response = jsonify({"error": str(e), "similar": similar})
+    if e.retry_after:
+      response.headers['Retry-After'] = str(int(e.retry_after) + 1)
+    return response, 503
+  except Exception:
+    # 500 Internal Server Error: Generic server-side failures
+    return jsonify({"error": "Failed to call AI"}), 500
+
+# GET ALL PROJECTS for a given user
+@async_bp.route('/project/by-user', methods=['GET'])
+@jwt_required_async
+async def get_user_projects():
+  username = get_identity()
+  connection = await get_async_connection()
+  if connection:
+    try:
+      async with connection.cursor() as cursor:
+        projects = []
+        # Owned projects, then projects where user is a collaborator
+        for column in ("owner", "collaborator1", "collaborator2"):
+          await cursor.execute(f"SELECT * FROM projects WHERE {column} = %s", (username,))
+          projects += await cursor.fetchall()
+      # 200 OK: For a successful request that returns data (possibly empty)
+      return jsonify([project_to_dict(project) for project in projects]), 200
+    except MySQLError as e:
+      # 500 Internal Server Error: Generic server-side failures
+      return jsonify({"error": str(e)}), 500
+    finally:
+      release_async_connection(connection)
+  # 500 Internal Server Error: Generic server-side failures
+  return jsonify({"error": "Failed to connect to database"}), 500
+
+# Server-Sent Events stream of changes to the project (see project_events.py).
+# Same responses as project_routes.get_project_events, but a waiting stream
+# holds no thread, so EVENTS_ASYNC_MAX_STREAMS can be far higher
+@async_bp.route('/project/<int:id>/events', methods=['GET'])
+@jwt_required_async
+async def get_project_events(id):
+  hub = current_app.async_project_events
+  if not hub:
+    # 404 Not Found: Live events disabled
+    return jsonify({"error": "Live project events are disabled"}), 404
+  username = get_identity()
+  connection = await get_async_connection()
+  if not connection:
+    # 500 Internal Server Error: Generic server-side failures
+    return jsonify({"error": "Failed to connect to database"}), 500
+  try:
+    async with connection.cursor() as cursor:
+      await cursor.execute("SELECT owner, collaborator1, collaborator2 FROM projects WHERE id = %s", (id,))
+      project = await cursor.fetchone()
+  except MySQLError as e:
+    # 500 Internal Server Error: Generic server-side failures
+    return jsonify({"error": str(e)}), 500
+  finally:
+    release_async_connection(connection)
+  if not project:
+    # 404 Not Found: Project not found
+    return jsonify({"error": f"No project found with ID {id}"}), 404
+  if username not in project:
+    # 403 Forbidden: Project exists, but user is not its owner or either of its collaborators
+    return jsonify({"error": f"Project ID {id} is not associated with user {username}"}), 403
+
+  stream = hub.open(id, username)
+  if stream is None:
+    # 503 Service Unavailable: This process is serving as many streams as it may
+    response = jsonify({"error": "Too many open event streams, please try again"})
+    response.headers['Retry-After'] = "5"
+    return response, 503
+  response = Response(hub.serve(stream), status=200, mimetype="text/event-stream", headers={
+    "Cache-Control": "no-cache",
+    # Stop nginx from buffering the stream
+    "X-Accel-Buffering": "no",
+  })
+  # The stream ends itself after EVENTS_MAX_SECONDS
+  response.timeout = None
+  # 200 OK: Event stream
+  return response
+
+# CREATE PROJECT
+# No database connection is held while tasks are generated. The project, its
+# tasks and the owner's project count are then written in one transaction
+@async_bp.route('/project/create', methods=['POST'])
+@jwt_required_async
+async def create_project():
+  data = await request.get_json()
+  username = get_identity()
+  title = data['title']
+  summary = data['summary']
+  steps = data['steps']
+  languages = data['languages']
+  date_created = datetime.now()
+  connection = await get_async_connection()
+  if not connection:
+    # 500 Internal Server Error: Generic server-side failures
+    return jsonify({"error": "Failed to connect to database"}), 500
+  try:
+    async with connection.cursor() as cursor:
+      await cursor.execute("SELECT * FROM users WHERE username = %s", (username,))
+      user = await cursor.fetchone()
+  finally:
+    release_async_connection(connection)
+  if user[7] > PROJECT_LIMIT:
+    # 409 Conflict: User-side error in request
+    return jsonify({"error": f"User {username} already has 5 projects in progress. User must complete an existing project before creating a new one"}), 409
+
+  tasks_lists = await generate_tasks_lists_async(title, summary, languages, steps, username)
+
+  connection = await get_async_connection()
+  if not connection:
+    # 500 Internal Server Error: Generic server-side failures
+    return jsonify({"error": "Failed to connect to database"}), 500
+  try:
+    await connection.begin()
+    async with connection.cursor() as cursor:
+      query_b = "INSERT INTO projects (owner, title, summary, steps, languages, date_created) VALUES (%s, %s, %s, %s, %s, %s)"
+      await cursor.execute(query_b, (username, title, summary, json.dumps(steps), json.dumps(languages), date_created))
+      pid = cursor.lastrowid
+      # Priority is the step number; status 1 is "to-do"
+      rows = [
+        (pid, task, priority, 1)
+        for priority, tasks_list in enumerate(tasks_lists or [], start=1)
+        for task in tasks_list.get('tasks', [])
+      ]
+      if rows:
+        await cursor.executemany("INSERT INTO tasks (pid, description, priority, status) VALUES (%s, %s, %s, %s)", rows)
+      # Sync clients fetch the new project with all its tasks
+      await record_changes_async(cursor, [change(pid, "project", pid, "full")])
+      await cursor.execute("UPDATE users SET projects = projects + 1 WHERE username = %s", (username,))
+    await connection.commit()
+  except MySQLError:
+    await connection.rollback()
+    # 400 Bad Request: Project creation failed
+    return jsonify({"error": "Project creation failed."}), 400
+  finally:
+    release_async_connection(connection)
+
+  try:
+    await asyncio.to_thread(current_app.idea_index.add, pid, title, summary, languages, steps)
+  except Exception as e:
+    logger.error("Error indexing project %s: %s", pid, e)
+  if tasks_lists is None:
+    response = jsonify({"message": "Project created; task generation failed", "id": pid,
+                        "tasks_generated": False})
+  else:
+    response = jsonify({"message": "Project, tasks creation successful", "id": pid,
+                        "tasks_generated": True})
+  # 201 Created: Project added/created successfully
+  return response, 201
+
+# Publish a project change (see project_events.py) without blocking the loop
+async def publish_event_async(pid, type, **fields):
+  await asyncio.to_thread(publish_event, current_app.cache, pid, type, **fields)
+
+# Overlay status/priority updates not yet flushed to MySQL (see task_writes.py)
+async def with_pending_writes_async(tasks):
+  if current_app.task_writes:
+    await asyncio.to_thread(current_app.task_writes.merge, tasks)
+  return tasks
+
+# Fetch a task and check that its project is owned by username. Returns
+# (task, None), or (None, error response)
+async def get_owned_task(cursor, id, username):
+  await cursor.execute("SELECT * FROM tasks WHERE id = %s", (id,))
+  task = await cursor.fetchone()
+  if not task:
+    # 404 Not Found: Task not found
+    return None, (jsonify({"error": f"No task found with ID {id}"}), 404)
+  await cursor.execute("SELECT * FROM projects WHERE id = %s AND owner = %s", (task[1], username))
+  if not await cursor.fetchone():
+    # 403 Forbidden: Project exists (else the task would not exist), but
+    # does not belong to the current user
+    return None, (jsonify({"error": "You do not have permission to access this project."}), 403)
+  return task, None
+
+# GET ALL TASKS
+@async_bp.route('/task', methods=['GET'])
+async def get_all_tasks():
+  connection = await get_async_connection()
+  if connection:
+    try:
+      async with connection.cursor() as cursor:
+        await cursor.execute("SELECT * FROM tasks")
+        tasks = await cursor.fetchall()
+      if tasks:
+        # 200 OK: For a successful request that returns data
+        return jsonify(await with_pending_writes_async([task_to_dict(task) for task in tasks])), 200
+      # 404 Not Found: Tasks not found
+      return jsonify({"error": "No tasks found"}), 404
+    except MySQLError as e:
+      # 500 Internal Server Error: Generic server-side failures
+      return jsonify({"error": str(e)}), 500
+    finally:
+      release_async_connection(connection)
+  # 500 Internal Server Error: Generic server-side failures
+  return jsonify({"error": "Failed to connect to database"}), 500
+
+@async_bp.route('/task/<int:id>/get', methods=['GET'])
+@jwt_required_async
+async def get_task(id):
+  connection = await get_async_connection()
+  if connection:
+    try:
+      async with connection.cursor() as cursor:
+        task, error = await get_owned_task(cursor, id, get_identity())
+      if error:
+        return error
+      task_data = task_to_dict(task)
+      await with_pending_writes_async([task_data])
+      # 200 OK: For a successful request that returns data
+      return jsonify(task_data), 200
+    except MySQLError as e:
+      # 500 Internal Server Error: Generic server-side failures
+      return jsonify({"error": str(e)}), 500
+    finally:
+      release_async_connection(connection)
+  # 500 Internal Server Error: Generic server-side failures
+  return jsonify({"error": "Failed to connect to database"}), 500
+
+# GET ALL TASKS for a given project
+@async_bp.route('/task/<int:pid>', methods=['GET'])
+@jwt_required_async
+async def get_project_tasks(pid):
+  username = get_identity()
+  connection = await get_async_connection()
+  if connection:
+    try:
+      async with connection.cursor() as cursor:
+        await cursor.execute("SELECT * FROM tasks WHERE pid = %s", (pid,))
+        tasks = await cursor.fetchall()
+        if not tasks:
+          # 404 Not Found: Tasks not found
+          return jsonify({"error": f"No tasks found for project with ID {pid}"}), 404
+        await cursor.execute("SELECT * FROM projects WHERE id = %s AND owner = %s", (pid, username))
+        project = await cursor.fetchone()
+      if not project:
+        # 403 Forbidden: Project exists, but does not belong to the current user
+        return jsonify({"error": "You do not have permission to access this project."}), 403
+      # 200 OK: For a successful request that returns data
+      return jsonify(await with_pending_writes_async([task_to_dict(task) for task in tasks])), 200
+    except MySQLError as e:
+      # 500 Internal Server Error: Generic server-side failures
+      return jsonify({"error": str(e)}), 500
+    finally:
+      release_async_connection(connection)
+  # 500 Internal Server Error: Generic server-side failures
+  return jsonify({"error": "Failed to connect to database"}), 500
+
+# CREATE TASK
+@async_bp.route('/task/<int:pid>/create', methods=['POST'])
+@jwt_required_async
+async def create_task(pid):
+  username = get_identity()
+  data = await request.get_json()
+  description = data['description']
+  priority = data['priority']
+  status = data['status']
+  connection = await get_async_connection()
+  if connection:
+    try:
+      async with connection.cursor() as cursor:
+        await cursor.execute("SELECT owner FROM projects WHERE id = %s", (pid,))
+        project = await cursor.fetchone()
+        if not project:
+          # 404 Not Found: Project not found
+          return jsonify({"error": f"No project found with ID {pid}"}), 404
+        if project[0] != username:
+          # 403 Forbidden: Project exists, but does not belong to the user
+          return jsonify({"error": f"Project ID {pid} does not belong to user {username}"}), 403
+        await connection.begin()
+        query = "INSERT INTO tasks (pid, description, priority, status) VALUES (%s, %s, %s, %s)"
+        await cursor.execute(query, (pid, description, priority, status))
+        task_id = cursor.lastrowid
+        await record_changes_async(cursor, [change(pid, "task", task_id, "upsert")])
+      await connection.commit()
+      task = {
+        "id": task_id,
+        "pid": pid,
+        "description": description,
+        "priority": priority,
+        "status": status
+      }
+      await publish_event_async(pid, "task.created", task=task)
+      # 201 Created: Task added/created successfully
+      return jsonify({"message": "Task creation successful", "task": task}), 201
+    except IntegrityError:
+      await connection.rollback()
+      # 400 Bad Request: Task already exists
+      return jsonify({"error": "Task already exists."}), 400
+    finally:
+      release_async_connection(connection)
+  # 500 Internal Server Error: Generic server-side failures
+  return jsonify({"error": "Failed to connect to database"}), 500
+
+# Status/priority update through the write coalescer, when it is on. Returns
+# a response, or None if the caller must check ownership and write to MySQL.
+# `owner` is the task's (pid, owner) when the caller already knows it
+async def queue_task_write(id, column, value, owner=None):
+  writes = current_app.task_writes
+  if not writes or column not in TASK_WRITE_COLUMNS:
+    return None
+  if owner:
+    await asyncio.to_thread(writes.remember_owner, id, *owner)
+  else:
+    owner = await asyncio.to_thread(writes.owner, id)
+    if not owner:
+      return None
+    if owner[1] != get_identity():
+      # 403 Forbidden: Task belongs to another user's project
+      return jsonify({"error": "You do not have permission to access this project."}), 403
+  if not await asyncio.to_thread(writes.queue, owner[0], id, column, value):
+    return None
+  await publish_event_async(owner[0], "task.updated", id=id, **{column: value})
+  # 200 OK: For a successful request
+  return jsonify({"message": "Task updated successfully."}), 200
+
+# Update one column of a task owned by the current user
+async def update_task_column(id, column, value):
+  response = await queue_task_write(id, column, value)
+  if response:
+    return response
+  connection = await get_async_connection()
+  if connection:
+    try:
+      async with connection.cursor() as cursor:
+        task, error = await get_owned_task(cursor, id, get_identity())
+        if error:
+          return error
+        response = await queue_task_write(id, column, value, owner=(task[1], get_identity()))
+        if response:
+          return response
+        await connection.begin()
+        await cursor.execute(*update_statement(id, column, value))
+        await record_changes_async(cursor, [change(task[1], "task", id, "upsert")])
+      await connection.commit()
+      await publish_event_async(task[1], "task.updated", id=id, **{column: value})
+      # 200 OK: For a successful request
+      return jsonify({"message": "Task updated successfully."}), 200
+    except MySQLError as e:
+      # 500 Internal Server Error
+      return jsonify({"error": f"Database error: {e}"}), 500
+    finally:
+      release_async_connection(connection)
+  # 500 Internal Server Error: Generic server-side failures
+  return jsonify({"error": "Failed to connect to database"}), 500
+
+@async_bp.route('/task/<int:id>/update-status', methods=['PUT'])
+@jwt_required_async
+async def update_task_status(id):
+  data = await request.get_json()
+  return await update_task_column(id, "status", data['status'])
+
+@async_bp.route('/task/<int:id>/update-priority', methods=['PUT'])
+@jwt_required_async
+async def update_task_priority(id):
+  data = await request.get_json()
+  return await update_task_column(id, "priority", data['priority'])
+
+@async_bp.route('/task/<int:id>/update-description', methods=['PUT'])
+@jwt_required_async
+async def update_task_description(id):
+  data = await request.get_json()
+  return await update_task_column(id, "description", data['description'])
+
+# DELETE TASK
+@async_bp.route('/task/<int:id>/delete', methods=['DELETE'])
+@jwt_required_async
+async def delete_task(id):
+  connection = await get_async_connection()
+  if connection:
+    try:
+      async with connection.cursor() as cursor:
+        task, error = await get_owned_task(cursor, id, get_identity())
+        if error:
+          return error
+        await connection.begin()
+        await cursor.execute("DELETE FROM tasks WHERE id = %s", (id,))
+        await record_changes_async(cursor, [change(task[1], "task", id, "delete")])
+      await connection.commit()
+      if current_app.task_writes:
+        await asyncio.to_thread(current_app.task_writes.forget, id)
+      await publish_event_async(task[1], "task.deleted", id=id)
+      # 200 OK: For a successful request
+      return jsonify({"message": "Task deleted successfully."}), 200
+    except MySQLError as e:
+      # 500 Internal Server Error
+      return jsonify({"error": f"Database error: {e}"}), 500
+    finally:
+      release_async_connection(connection)
+  # 500 Internal Server Error: Generic server-side failures
+  return jsonify({"error": "Failed to connect to database"}), 500
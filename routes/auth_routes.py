@@ -1,37 +1,86 @@
 # auth_routes.py
 
+import logging
+import time
 import mysql.connector
-from flask import Blueprint, jsonify, request, current_app, render_template
+from flask import Blueprint, jsonify, request, current_app
 from flask_jwt_extended import (
     create_access_token, create_refresh_token,
     jwt_required, get_jwt, get_jwt_identity, set_access_cookies, set_refresh_cookies,
-    unset_jwt_cookies, verify_jwt_in_request
+    unset_jwt_cookies, verify_jwt_in_request, decode_token
 )
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt.exceptions import PyJWTError
 from mysql.connector import IntegrityError
-from datetime import datetime, timedelta
-from app import bcrypt, jwt
+from datetime import datetime
+from app import jwt
 from db import get_db_connection
+from mail_renderer import ACTIVATION_SUBJECT
+from password_hasher import PasswordHasherBusyError
 from helpers import (
-  hash_password, verify_password, generate_confirmation_token, confirm_token, send_email
+  hash_password, verify_password, password_needs_rehash, confirm_token, send_email
 )
 
+logger = logging.getLogger(__name__)
+
 auth_bp = Blueprint('auth_bp', __name__)
 
-# add jti (JWT ID; unique identifier) to blocklist
-def add_to_blocklist(jti):
-  current_app.blocklist.set(jti, "", ex=timedelta(minutes=30))
-  
-def print_blocklist():
-  print("Printing blocklist")
-  keys = current_app.blocklist.keys('*')
-  if not keys:
-    print("Blocklist is empty")
+# add jtis (JWT ID; unique identifier) to blocklist in one round-trip, given
+# {jti: exp}. Each entry lasts as long as its token would have, so a refresh
+# token stays revoked for its full lifetime
+def add_to_blocklist(tokens):
+  now = time.time()
+  current_app.revocations.revoke({jti: exp - now for jti, exp in tokens.items() if exp > now})
+
+# {jti: exp} of the access and refresh tokens sent with the request, where valid
+def get_request_jtis():
+  jtis = {}
+  try:
+    # Try to verify the access token without requiring it
+    verify_jwt_in_request(optional=True)
+    access_token = get_jwt()
+    if access_token:
+      jtis[access_token["jti"]] = access_token["exp"]
+  except (JWTExtendedException, PyJWTError):
+    # Token might be expired, so skip blocklisting access token
+    pass
+
+  # The refresh cookie is decoded directly: verify_jwt_in_request would also
+  # check it against the request's CSRF header, which carries the access
+  # token's value on these routes
+  encoded_refresh = request.cookies.get(current_app.config["JWT_REFRESH_COOKIE_NAME"])
+  if encoded_refresh:
+    try:
+      refresh_token = decode_token(encoded_refresh)
+      if refresh_token.get("type") == "refresh":
+        jtis[refresh_token["jti"]] = refresh_token["exp"]
+    except (JWTExtendedException, PyJWTError):
+      # Token might be expired, so skip blocklisting refresh token
+      pass
+  return jtis
+
+# Re-hash a user's password with the current work factor. Failure is not
+# fatal to the login; the upgrade is simply retried next time
+def rehash_password(username, password):
+  # Hash before taking a connection. If the hasher is saturated the login
+  # still succeeds with the old hash
+  try:
+    hashed_password = hash_password(password)
+  except PasswordHasherBusyError as e:
+    logger.warning("Skipping password re-hash for %s: %s", username, e)
     return
-  
-  for key in keys:
-    # Get TTL (time-to-live) for each key
-    ttl = current_app.blocklist.ttl(key)
-    print(f"Blocked jti: {key}, expires in {ttl} seconds")
+  connection = get_db_connection()
+  if connection:
+    try:
+      cursor = connection.cursor()
+      query = "UPDATE users SET password = %s WHERE username = %s"
+      cursor.execute(query, (hashed_password, username))
+      connection.commit()
+    except mysql.connector.Error as e:
+      logger.error("Error re-hashing password for %s: %s", username, e)
+    finally:
+      cursor.close()
+      connection.close()
 
 # REGISTER
 @auth_bp.route('/register', methods=['POST'])
@@ -40,7 +89,7 @@ def register_user():
   email = data['email']
   username = data['username']
   password = data['password']
-  hashed_password = hash_password(password, bcrypt)
+  hashed_password = hash_password(password)
   connection = get_db_connection()
   if connection:
     try:
@@ -51,12 +100,8 @@ def register_user():
       # Commit changes
       connection.commit()
       
-      confirmation_token = generate_confirmation_token(email)
-      frontend_url = current_app.config['FRONTEND_URL']
-      confirm_url = f"{frontend_url}/confirm/{confirmation_token}"
-      html = render_template('user/activate.html', username=username, confirm_url=confirm_url)
-      subject = "Please verify your DevStorm account"
-      send_email(email, subject, html)
+      confirm_url, html = current_app.mail_renderer.render_activation(username, email)
+      send_email(email, ACTIVATION_SUBJECT, html)
       
       # Simulate login
       # Generate access and refresh tokens for new user, set cookies
@@ -146,7 +191,11 @@ def login():
       # Retrieve stored password hash from user 
       stored_hash = user[3]
       # Check that passwords match
-      if verify_password(password, stored_hash, bcrypt):
+      if verify_password(password, stored_hash):
+        # Upgrade hashes made with an older work factor while the plain
+        # password is at hand
+        if password_needs_rehash(stored_hash):
+          rehash_password(username, password)
         # Create access and refresh tokens
         access_token = create_access_token(identity=username, fresh=True)
         refresh_token = create_refresh_token(identity=username)
@@ -170,8 +219,9 @@ def login():
 def token_in_blocklist(jwt_header, jwt_payload: dict):
   # Get token's unique identifier (jti)
   jti = jwt_payload['jti']
-  token_in_redis = current_app.blocklist.get(jti)
-  return token_in_redis is not None
+  # Answered from the local copy of the blocklist when it is in sync, from
+  # Redis otherwise
+  return current_app.revocations.is_revoked(jti)
 
 @auth_bp.route('/token/refresh', methods=['POST'])
 @jwt_required(refresh=True)
@@ -190,27 +240,7 @@ def refresh():
 @auth_bp.route('/logout', methods=['POST'])
 def logout():
   response = jsonify({"message": "Logout successful"})
-  try:
-    # Try to verify the access token without requiring it
-    verify_jwt_in_request(optional=True)
-    access_token = get_jwt()
-    if access_token:
-      jti_access = access_token["jti"]
-      add_to_blocklist(jti_access)
-  except Exception:
-    # Token might be expired, so skip blocklisting access token
-    pass  
-
-  try:
-    # Try to verify the refresh token manually if present
-    verify_jwt_in_request(optional=True, refresh=True)
-    refresh_token = get_jwt(refresh=True)
-    if refresh_token:
-      jti_refresh = refresh_token["jti"]
-      add_to_blocklist(jti_refresh)
-  except Exception:
-    # Token might be expired, so skip blocklisting refresh token
-    pass  
+  add_to_blocklist(get_request_jtis())
   
   # Unset JWT cookies
   unset_jwt_cookies(response)
@@ -1,17 +1,46 @@
 # project_routes.py
 
+import logging
 import json
 import mysql.connector
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request, current_app, g
+from redis import RedisError
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.wsgi import get_input_stream
 from db import get_db_connection
 from mysql.connector import IntegrityError
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime
 from helpers import engineer_taskgen_prompt
-from routes.ai_routes import prompt_ai_to_generate_tasks
+from idea_index import fetch_ideas
+from project_events import publish_event
+from change_log import change, project_deleted, record_changes
+from bulk_import import BulkImporter, PROGRESS_KEY as IMPORT_PROGRESS_KEY, read_records
+from routes.ai_routes import prompt_ai_to_generate_tasks, prompt_ai_to_generate_tasks_by_step
+
+logger = logging.getLogger(__name__)
 
 project_bp = Blueprint('project_bp', __name__)
 
+# Users with more projects than this cannot start another
+PROJECT_LIMIT = 5
+
+# Generate tasks lists using the configured task generation mode
+#   single:   one prompt covering every step
+#   per-step: one prompt per group of steps, fanned out over a thread pool
+def generate_tasks_lists(title, summary, languages, steps, username=None):
+  # No steps, no tasks: nothing to ask the model for
+  if not steps:
+    return []
+  if current_app.config['TASKGEN_MODE'] == 'per-step':
+    return prompt_ai_to_generate_tasks_by_step(
+      title, summary, languages, steps,
+      max_workers=current_app.config['TASKGEN_MAX_WORKERS'],
+      group_size=current_app.config['TASKGEN_GROUP_SIZE'],
+      user=username
+    )
+  return prompt_ai_to_generate_tasks(engineer_taskgen_prompt(title, summary, languages, steps), username)
+
 # GET ALL PROJECTS
 @project_bp.route('/project', methods=['GET'])
 def get_all_projects():
@@ -102,6 +131,97 @@ def get_project(id):
   # 500 Internal Server Error: Generic server-side failures
   return jsonify({"error": "Failed to connect to database"}), 500 
 
+# GET SIMILAR PROJECTS
+# Previously generated ideas most similar to a given project, from the local
+# similarity index
+@project_bp.route('/project/<int:id>/similar', methods=['GET'])
+@jwt_required()
+def get_similar_projects(id):
+  username = get_jwt_identity()
+  k = min(request.args.get('k', default=5, type=int), 50)
+  connection = get_db_connection()
+  if connection:
+    try:
+      cursor = connection.cursor()
+      query_a = "SELECT owner, collaborator1, collaborator2 FROM projects WHERE id = %s"
+      cursor.execute(query_a, (id,))
+      project = cursor.fetchone()
+      if not project:
+        # 404 Not Found: Project not found
+        return jsonify({"error": f"No project found with ID {id}"}), 404
+      if username not in project:
+        # 403 Forbidden: Project exists, but user is not its owner or either of its collaborators
+        return jsonify({"error": f"Project ID {id} is not associated with user {username}"}), 403
+
+      matches = current_app.idea_index.similar_to(id, k)
+      if matches is None:
+        # 404 Not Found: Project has not been indexed (yet)
+        return jsonify({"error": f"Project ID {id} is not in the similarity index"}), 404
+      # 200 OK: For a successful request that returns data
+      return jsonify(fetch_ideas(cursor, matches)), 200
+    except mysql.connector.Error as e:
+      # 500 Internal Server Error: Generic server-side failures
+      return jsonify({"error": str(e)}), 500
+    finally:
+      # Close resources
+      cursor.close()
+      connection.close()
+  # 500 Internal Server Error: Generic server-side failures
+  return jsonify({"error": "Failed to connect to database"}), 500
+
+# PROJECT EVENTS
+# Server-Sent Events stream of changes to the project's tasks and settings
+# (see project_events.py). The database connection is only used to authorize
+# the stream and is closed before streaming starts. Under asgi.py this route
+# is served by the async handler; this one is the fallback for the WSGI
+# servers, where each stream holds a thread (EVENTS_MAX_STREAMS per process)
+@project_bp.route('/project/<int:id>/events', methods=['GET'])
+@jwt_required()
+def get_project_events(id):
+  hub = current_app.project_events
+  if not hub:
+    # 404 Not Found: Live events disabled
+    return jsonify({"error": "Live project events are disabled"}), 404
+  username = get_jwt_identity()
+  connection = get_db_connection()
+  if not connection:
+    # 500 Internal Server Error: Generic server-side failures
+    return jsonify({"error": "Failed to connect to database"}), 500
+  try:
+    cursor = connection.cursor()
+    query_a = "SELECT owner, collaborator1, collaborator2 FROM projects WHERE id = %s"
+    cursor.execute(query_a, (id,))
+    project = cursor.fetchone()
+  except mysql.connector.Error as e:
+    # 500 Internal Server Error: Generic server-side failures
+    return jsonify({"error": str(e)}), 500
+  finally:
+    # Close resources
+    cursor.close()
+    connection.close()
+  if not project:
+    # 404 Not Found: Project not found
+    return jsonify({"error": f"No project found with ID {id}"}), 404
+  if username not in project:
+    # 403 Forbidden: Project exists, but user is not its owner or either of its collaborators
+    return jsonify({"error": f"Project ID {id} is not associated with user {username}"}), 403
+
+  stream = hub.open(id, username)
+  if stream is None:
+    # 503 Service Unavailable: This process is serving as many streams as it may
+    response = jsonify({"error": "Too many open event streams, please try again"})
+    response.headers['Retry-After'] = "5"
+    return response, 503
+  response = Response(hub.serve(stream), status=200, mimetype="text/event-stream", headers={
+    "Cache-Control": "no-cache",
+    # Stop nginx from buffering the stream
+    "X-Accel-Buffering": "no",
+  })
+  # Free the slot even if the client is gone before the stream starts
+  response.call_on_close(lambda: hub.close(stream))
+  # 200 OK: Event stream
+  return response
+
 # GET ALL PROJECTS for a given user
 @project_bp.route('/project/by-user', methods=['GET'])
 @jwt_required()
@@ -176,7 +296,7 @@ def create_project():
       cursor.execute(query_a, (username,))
       user = cursor.fetchone()
       project_count = user[7]
-      if project_count > 5:
+      if project_count > PROJECT_LIMIT:
         # 409 Conflict: User-side error in request
         return jsonify({"error": f"User {username} already has 5 projects in progress. User must complete an existing project before creating a new one"}), 409
       query_b = "INSERT INTO projects (owner, title, summary, steps, languages, date_created) VALUES (%s, %s, %s, %s, %s, %s)"
@@ -187,22 +307,35 @@ def create_project():
       # Commit changes
       connection.commit()
       # Generate tasks lists for each project step
-      tasks_lists = prompt_ai_to_generate_tasks(engineer_taskgen_prompt(title, summary, languages, steps))
+      tasks_lists = generate_tasks_lists(title, summary, languages, steps, username)
       # Structure task insertion query
       query_c = "INSERT INTO tasks (pid, description, priority, status) VALUES (%s, %s, %s, %s)"
-      # Enumerate starting from 1 to extract priority based on step number
-      for priority, tasks_list in enumerate(tasks_lists, start=1):
+      # Enumerate starting from 1 to extract priority based on step number.
+      # If generation failed (None), the project is still created without tasks
+      for priority, tasks_list in enumerate(tasks_lists or [], start=1):
         # Get tasks_list for each step, defaulting to empty list if not found
         for task in tasks_list.get('tasks', []):
           # Execute query. Status is default 1 to indicate it is "to-do"
           cursor.execute(query_c, (pid, task, priority, 1))
+      # Sync clients fetch the new project with all its tasks
+      record_changes(cursor, [change(pid, "project", pid, "full")])
       # Commit changes
       connection.commit()
       query_d = "UPDATE users SET projects = projects + 1 WHERE username = %s"
       cursor.execute(query_d, (username,))
       # Commit changes
       connection.commit()
-      response = jsonify({"message": "Project, tasks creation successful"})
+      # Make the new idea searchable for similarity lookups
+      try:
+        current_app.idea_index.add(pid, title, summary, languages, steps)
+      except Exception as e:
+        logger.error("Error indexing project %s: %s", pid, e)
+      if tasks_lists is None:
+        response = jsonify({"message": "Project created; task generation failed", "id": pid,
+                            "tasks_generated": False})
+      else:
+        response = jsonify({"message": "Project, tasks creation successful", "id": pid,
+                            "tasks_generated": True})
       # 201 Created: Project added/created successfully
       return response, 201
     except IntegrityError as e:
@@ -217,6 +350,94 @@ def create_project():
   # 500 Internal Server Error: Generic server-side failures
   return jsonify({"error": "Failed to connect to database"}), 500
 
+# BULK IMPORT
+# Projects with their tasks from an NDJSON or JSON file (see bulk_import.py),
+# sent as the request body or as a multipart "file" field:
+#   POST /project/import?format=ndjson|json&generate_tasks=true|false
+# Projects belong to the current user; administrators may name other owners.
+# Projects without tasks get AI-generated ones only with generate_tasks=true:
+# each generation is an AI call made while the request waits.
+# The report is kept after every batch under the request's X-Request-ID, so
+# a client that sets that header can follow along at GET /project/import/<id>
+@project_bp.route('/project/import', methods=['POST'])
+@jwt_required()
+def import_projects():
+  username = get_jwt_identity()
+  is_admin = username in current_app.config['ADMIN_USERS']
+  too_large = f"Uploads are limited to {current_app.config['IMPORT_MAX_BYTES']} bytes"
+  # Read the body, including multipart and chunked uploads, through a stream
+  # that raises RequestEntityTooLarge past IMPORT_MAX_BYTES
+  try:
+    request.stream = get_input_stream(request.environ, max_content_length=current_app.config['IMPORT_MAX_BYTES'])
+    upload = request.files.get('file')
+  except RequestEntityTooLarge:
+    # 413 Payload Too Large: Upload over IMPORT_MAX_BYTES
+    return jsonify({"error": too_large}), 413
+  stream = upload.stream if upload else request.stream
+  filename = (upload.filename or "") if upload else ""
+  format = request.args.get('format')
+  if not format:
+    format = "json" if filename.endswith(".json") or request.mimetype == "application/json" else "ndjson"
+  if format not in ("ndjson", "json"):
+    # 400 Bad Request: Unknown format
+    return jsonify({"error": "format must be ndjson or json"}), 400
+  generate = request.args.get('generate_tasks', 'false').lower() == 'true'
+  import_id = g.get("request_id")
+  cache = current_app.cache
+  ttl = current_app.config['IMPORT_PROGRESS_TTL_SECONDS']
+
+  def save_progress(report):
+    try:
+      cache.set(IMPORT_PROGRESS_KEY.format(username, import_id), json.dumps({"username": username, **report}), ex=ttl)
+    except RedisError as e:
+      logger.warning("Could not save import progress: %s", e)
+
+  connection = get_db_connection()
+  if connection:
+    try:
+      importer = BulkImporter(
+        connection, owner=username, may_set_owner=is_admin,
+        project_limit=None if is_admin else PROJECT_LIMIT,
+        batch_size=current_app.config['IMPORT_BATCH_SIZE'],
+        generate=generate_tasks_lists if generate else None,
+        index=current_app.idea_index, progress=save_progress if import_id else None
+      )
+      report = importer.run(read_records(stream, format))
+    except RequestEntityTooLarge:
+      # 413 Payload Too Large: The upload went past IMPORT_MAX_BYTES; whole
+      # batches before that point were imported
+      return jsonify({"import_id": import_id, "error": too_large, **importer.report}), 413
+    finally:
+      # Close resources
+      connection.close()
+    if report["aborted"]:
+      # 400 Bad Request: The file could not be read to the end; complete
+      # batches before that point were imported
+      return jsonify({"import_id": import_id, "error": report["aborted"], **report}), 400
+    # 200 OK: Import finished; invalid records are listed in "errors"
+    return jsonify({"import_id": import_id, **report}), 200
+  # 500 Internal Server Error: Generic server-side failures
+  return jsonify({"error": "Failed to connect to database"}), 500
+
+# Progress report of an import started with this X-Request-ID. Administrators
+# can follow another user's import with ?username=
+@project_bp.route('/project/import/<import_id>', methods=['GET'])
+@jwt_required()
+def get_import_progress(import_id):
+  username = get_jwt_identity()
+  if username in current_app.config['ADMIN_USERS']:
+    username = request.args.get('username', username)
+  try:
+    progress = current_app.cache.get(IMPORT_PROGRESS_KEY.format(username, import_id))
+  except RedisError as e:
+    # 503 Service Unavailable: Progress store unreachable
+    return jsonify({"error": f"Progress unavailable: {e}"}), 503
+  if progress:
+    # 200 OK: For a successful request that returns data
+    return jsonify(json.loads(progress)), 200
+  # 404 Not Found: No such import (or it belongs to someone else)
+  return jsonify({"error": f"No import found with ID {import_id}"}), 404
+
 # UPDATE
 # Add a collaborator
 @project_bp.route('/project/<int:id>/add-collaborator', methods=['PUT'])
@@ -258,12 +479,18 @@ def add_project_collaborator(id):
         query_c = "UPDATE projects SET collaborator1 = %s WHERE id = %s"
       
       cursor.execute(query_c, (new_collaborator, id))
+      # The team sees the new collaborator; the collaborator gets the whole project
+      record_changes(cursor, [
+        change(id, "project", id, "upsert"),
+        change(id, "project", id, "full", new_collaborator)
+      ])
       
       # Increment new_collaborator's projects count
       query_d = "UPDATE users SET projects = projects + 1 WHERE username = %s"
       cursor.execute(query_d, (new_collaborator,))
       
       connection.commit()
+      publish_event(current_app.cache, id, "project.updated", collaborator_added=new_collaborator)
       # 200 OK: For a successful request
       return jsonify({"message": "Project collaborator updated successfully"}), 200
     except IntegrityError as e:
@@ -358,12 +585,18 @@ def remove_project_collaborator(id):
         return jsonify({"message": f"Collaborator '{collaborator}' was not listed on this project"}), 400
       
       cursor.execute(query_c, (None, id))
+      # The project disappears for the removed collaborator
+      record_changes(cursor, [
+        change(id, "project", id, "upsert"),
+        change(id, "project", id, "delete", collaborator)
+      ])
       
       # Decrement new_collaborator's projects count
       query_d = "UPDATE users SET projects = projects - 1 WHERE username = %s"
       cursor.execute(query_d, (collaborator,))
       
       connection.commit()
+      publish_event(current_app.cache, id, "project.updated", collaborator_removed=collaborator)
       # 200 OK: For a successful request
       return jsonify({"message": "Project collaborator updated successfully"}), 200
     except mysql.connector.Error as e:
@@ -418,6 +651,7 @@ def update_project_status(id):
       # Update project status
       query_c = "UPDATE projects SET status = %s WHERE id = %s"
       cursor.execute(query_c, (new_status, id))
+      record_changes(cursor, [change(id, "project", id, "upsert")])
       
       # Update user's project completion count
       cursor.execute(query_d, (username,))
@@ -428,6 +662,7 @@ def update_project_status(id):
         cursor.execute(query_d, (collaborator2,))
       # Commit all changes together
       connection.commit()
+      publish_event(current_app.cache, id, "project.updated", status=new_status)
       # 200 OK: For a successful request
       return jsonify({"message": "Project status updated successfully"}), 200
     except mysql.connector.Error as e:
@@ -470,12 +705,18 @@ def delete_project(id):
       # Get project status (boolean)
       project_status = project[8]
       
+      writes = current_app.task_writes
+      if writes:
+        # Their queued updates and cached owners go with them
+        cursor.execute("SELECT id FROM tasks WHERE pid = %s", (id,))
+        task_ids = [row[0] for row in cursor.fetchall()]
       # Delete tasks first, as they are linked to project through pid 
       query_c = "DELETE FROM tasks where pid = %s"
       cursor.execute(query_c, (id,))
       # Delete project
       query_d = "DELETE FROM projects WHERE id = %s"
       cursor.execute(query_d, (id,))
+      record_changes(cursor, project_deleted(id, username, collaborator1, collaborator2))
       
       # Update owner's projects count
       query_e = "UPDATE users SET projects = projects - 1 WHERE username = %s"
@@ -497,6 +738,15 @@ def delete_project(id):
           cursor.execute(query_f, (collaborator2,))
       # Commit changes
       connection.commit()
+      if writes:
+        writes.forget(*task_ids)
+      # The project is gone either way; a stale index entry only costs a
+      # similarity match that no longer resolves
+      try:
+        current_app.idea_index.remove(id)
+      except Exception as e:
+        logger.error("Error removing project %s from the idea index: %s", id, e)
+      publish_event(current_app.cache, id, "project.deleted")
       # 200 OK: For a successful request
       return jsonify({"message": "Project deleted successfully."}), 200
     except mysql.connector.Error as e:
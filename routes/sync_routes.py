@@ -0,0 +1,190 @@
+# sync_routes.py
+
+import json
+import mysql.connector
+from flask import Blueprint, jsonify, request, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from db import get_db_connection
+from routes.task_routes import with_pending_writes
+
+sync_bp = Blueprint('sync_bp', __name__)
+
+def project_to_dict(project):
+  return {
+    "id": project[0],
+    "owner": project[1],
+    "collaborator1": project[2],
+    "collaborator2": project[3],
+    "title": project[4],
+    "summary": project[5],
+    # Convert JSON strings to list format
+    "steps": json.loads(project[6]),
+    "languages": json.loads(project[7]),
+    "status": project[8],
+    "date_created": project[9]
+  }
+
+def task_to_dict(task):
+  return {
+    "id": task[0],
+    "pid": task[1],
+    "description": task[2],
+    "priority": task[3],
+    "status": task[4]
+  }
+
+def placeholders(values):
+  return ", ".join(["%s"] * len(values))
+
+# IDs of the projects the user owns or collaborates on
+def member_project_ids(cursor, username):
+  cursor.execute(
+    "SELECT id FROM projects WHERE owner = %s "
+    "UNION SELECT id FROM projects WHERE collaborator1 = %s "
+    "UNION SELECT id FROM projects WHERE collaborator2 = %s",
+    (username, username, username)
+  )
+  return [row[0] for row in cursor.fetchall()]
+
+def fetch_projects(cursor, ids):
+  if not ids:
+    return []
+  cursor.execute(f"SELECT * FROM projects WHERE id IN ({placeholders(ids)})", tuple(ids))
+  return [project_to_dict(project) for project in cursor.fetchall()]
+
+# Tasks by id, plus every task of the projects in `pids`
+def fetch_tasks(cursor, ids=(), pids=()):
+  conditions, args = [], []
+  if ids:
+    conditions.append(f"id IN ({placeholders(ids)})")
+    args += ids
+  if pids:
+    conditions.append(f"pid IN ({placeholders(pids)})")
+    args += pids
+  if not conditions:
+    return []
+  cursor.execute(f"SELECT * FROM tasks WHERE {' OR '.join(conditions)}", tuple(args))
+  return with_pending_writes([task_to_dict(task) for task in cursor.fetchall()])
+
+# Latest change id that every reader can safely move past: ids are assigned
+# when a row is inserted, but transactions may commit out of order, so a
+# cursor only moves past changes older than SYNC_SETTLE_SECONDS. Changes
+# newer than that may be sent again on the next sync
+def settled_cursor(cursor):
+  cursor.execute(
+    "SELECT MAX(id) FROM changes WHERE created_at < NOW(3) - INTERVAL %s SECOND",
+    (current_app.config['SYNC_SETTLE_SECONDS'],)
+  )
+  return cursor.fetchone()[0] or 0
+
+# Net effect of a list of changes, in id order:
+#   ({project ids to send}, {task ids to send}, {projects to send with all
+#    their tasks}, {deleted project ids}, {deleted task ids})
+def fold_changes(changes):
+  projects, tasks, full, deleted_projects, deleted_tasks = set(), set(), set(), set(), set()
+  for pid, entity, entity_id, op in changes:
+    if entity == "project":
+      if op == "delete":
+        projects.discard(pid)
+        full.discard(pid)
+        deleted_projects.add(pid)
+      else:
+        deleted_projects.discard(pid)
+        (full if op == "full" else projects).add(pid)
+    elif op == "delete":
+      tasks.discard(entity_id)
+      deleted_tasks.add(entity_id)
+    else:
+      deleted_tasks.discard(entity_id)
+      tasks.add(entity_id)
+  return projects - full, tasks, full, deleted_projects, deleted_tasks
+
+def full_sync(cursor, username):
+  new_cursor = settled_cursor(cursor)
+  pids = member_project_ids(cursor, username)
+  return {
+    "cursor": new_cursor,
+    "full": True,
+    "more": False,
+    "projects": fetch_projects(cursor, pids),
+    "tasks": fetch_tasks(cursor, pids=pids),
+    "deleted": {"projects": [], "tasks": []}
+  }
+
+# DELTA SYNC
+# Projects and tasks created, updated or deleted since `since`, the cursor
+# returned by the previous call, across every project the user belongs to.
+# Without a cursor (or with one older than the change log keeps), everything
+# is returned with "full": true. With "more": true, call again right away
+# with the new cursor
+@sync_bp.route('/sync', methods=['GET'])
+@jwt_required()
+def sync():
+  username = get_jwt_identity()
+  since = request.args.get('since', default=0, type=int)
+  limit = current_app.config['SYNC_MAX_CHANGES']
+  connection = get_db_connection()
+  if connection:
+    cursor = connection.cursor()
+    try:
+      if since <= 0:
+        # 200 OK: For a successful request that returns data
+        return jsonify(full_sync(cursor, username)), 200
+      cursor.execute("SELECT MIN(id), MAX(id) FROM changes")
+      oldest, newest = cursor.fetchone()
+      if newest is None or since > newest or since + 1 < oldest:
+        # Unknown or pruned cursor
+        # 200 OK: For a successful request that returns data
+        return jsonify(full_sync(cursor, username)), 200
+      settled = settled_cursor(cursor)
+      new_cursor = max(since, settled)
+
+      pids = member_project_ids(cursor, username)
+      # Changes for just this user, plus changes to the projects they are on
+      query = "SELECT id, pid, entity, entity_id, op FROM changes WHERE member = %s AND id > %s ORDER BY id LIMIT %s"
+      args = [username, since, limit + 1]
+      if pids:
+        query = (
+          f"SELECT * FROM (({query}) UNION ALL "
+          f"(SELECT id, pid, entity, entity_id, op FROM changes "
+          f"WHERE pid IN ({placeholders(pids)}) AND member IS NULL AND id > %s ORDER BY id LIMIT %s)"
+          f") AS delta ORDER BY id LIMIT %s"
+        )
+        args += pids + [since, limit + 1, limit + 1]
+      cursor.execute(query, tuple(args))
+      changes = cursor.fetchall()
+      more = len(changes) > limit
+      changes = changes[:limit]
+      if more:
+        if changes[-1][0] <= settled:
+          new_cursor = changes[-1][0]
+        else:
+          # The rest is not settled yet: resume from the settled point on the
+          # next regular sync rather than skip a change still committing
+          more = False
+
+      projects, tasks, full, deleted_projects, deleted_tasks = fold_changes(
+        [change[1:] for change in changes]
+      )
+      tasks_data = [
+        task for task in fetch_tasks(cursor, ids=list(tasks), pids=list(full))
+        if task["pid"] not in deleted_projects
+      ]
+      # 200 OK: For a successful request that returns data
+      return jsonify({
+        "cursor": new_cursor,
+        "full": False,
+        "more": more,
+        "projects": fetch_projects(cursor, list(projects | full)),
+        "tasks": tasks_data,
+        "deleted": {"projects": sorted(deleted_projects), "tasks": sorted(deleted_tasks)}
+      }), 200
+    except mysql.connector.Error as e:
+      # 500 Internal Server Error: Generic server-side failures
+      return jsonify({"error": str(e)}), 500
+    finally:
+      # Close resources
+      cursor.close()
+      connection.close()
+  # 500 Internal Server Error: Generic server-side failures
+  return jsonify({"error": "Failed to connect to database"}), 500
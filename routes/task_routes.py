@@ -2,12 +2,21 @@
 
 import mysql.connector
 from mysql.connector import IntegrityError
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from db import get_db_connection
+from project_events import publish_event
+from change_log import change, record_changes
+from task_writes import update_statement
 
 task_bp = Blueprint('task_bp', __name__)
 
+# Overlay status/priority updates not yet flushed to MySQL (see task_writes.py)
+def with_pending_writes(tasks):
+  if current_app.task_writes:
+    current_app.task_writes.merge(tasks)
+  return tasks
+
 # GET ALL TASKS
 @task_bp.route('/task', methods=['GET'])
 def get_all_tasks():
@@ -30,7 +39,7 @@ def get_all_tasks():
           for task in tasks
         ]
         # 200 OK: For a successful request that returns data
-        return jsonify(tasks_list), 200
+        return jsonify(with_pending_writes(tasks_list)), 200
       else:
         # 404 Not Found: Tasks not found
         return jsonify({"error": "No tasks found"}), 404
@@ -69,6 +78,7 @@ def get_task(id):
             "priority": task[3],
             "status": task[4]
           }
+          with_pending_writes([task_data])
           # 200 OK: For a successful request that returns data
           return jsonify(task_data), 200
         else:
@@ -118,7 +128,7 @@ def get_project_tasks(pid):
             for task in tasks
         ]
         # 200 OK: For a successful request that returns data
-        return jsonify(tasks_list), 200
+        return jsonify(with_pending_writes(tasks_list)), 200
       else:
         # Return 403 Forbidden: Project exists (else the task would not exist), but
         # does not belong to the current user
@@ -160,18 +170,21 @@ def create_task(pid):
       
       query_c = "INSERT INTO tasks (pid, description, priority, status) VALUES (%s, %s, %s, %s)"
       cursor.execute(query_c, (pid, description, priority, status))
+      task_id = cursor.lastrowid
+      record_changes(cursor, [change(pid, "task", task_id, "upsert")])
       # Commit changes
       connection.commit()
-      task_id = cursor.lastrowid
+      task = {
+        "id": task_id,
+        "pid": pid,
+        "description": description,
+        "priority": priority,
+        "status": status
+      }
+      publish_event(current_app.cache, pid, "task.created", task=task)
       response = jsonify({
         "message": "Task creation successful",
-        "task": {
-          "id": task_id,
-          "pid": pid,
-          "description": description,
-          "priority": priority,
-          "status": status
-          }
+        "task": task
         })
       # 201 Created: User added/created successfully
       return response, 201
@@ -185,12 +198,22 @@ def create_task(pid):
   # 500 Internal Server Error: Generic server-side failures
   return jsonify({"error": "Failed to connect to database"}), 500
 
-@task_bp.route('/task/<int:id>/update-status', methods=['PUT'])
-@jwt_required()
-def update_task_status(id):
+# Set the status or priority of a task owned by the current user. With
+# TASK_WRITES_COALESCE on, the update is queued in Redis and written to MySQL
+# by the flusher; the owner check uses the cached task owner when there is one
+def update_task_column(id, column, value):
   username = get_jwt_identity()
-  data = request.get_json()
-  status = data['status']
+  writes = current_app.task_writes
+  owner = writes.owner(id) if writes else None
+  if owner:
+    pid, owner_name = owner
+    if owner_name != username:
+      # Return 403 Forbidden: Task belongs to another user's project
+      return jsonify({"error": "You do not have permission to access this project."}), 403
+    if writes.queue(pid, id, column, value):
+      publish_event(current_app.cache, pid, "task.updated", id=id, **{column: value})
+      # 200 OK: For a successful request
+      return jsonify({"message": "Task updated successfully."}), 200
   connection = get_db_connection()
   if connection:
     try:
@@ -205,10 +228,17 @@ def update_task_status(id):
         cursor.execute(query_b, (task[1], username))
         project = cursor.fetchone()
         if project:
-          query_c = "UPDATE tasks SET status = %s WHERE id = %s"
-          cursor.execute(query_c, (status, id))
+          if writes and not owner:
+            writes.remember_owner(id, task[1], username)
+            if writes.queue(task[1], id, column, value):
+              publish_event(current_app.cache, task[1], "task.updated", id=id, **{column: value})
+              # 200 OK: For a successful request
+              return jsonify({"message": "Task updated successfully."}), 200
+          cursor.execute(*update_statement(id, column, value))
+          record_changes(cursor, [change(task[1], "task", id, "upsert")])
           # Commit changes
           connection.commit()
+          publish_event(current_app.cache, task[1], "task.updated", id=id, **{column: value})
           # 200 OK: For a successful request
           return jsonify({"message": "Task updated successfully."}), 200
         else:
@@ -228,6 +258,18 @@ def update_task_status(id):
   # 500 Internal Server Error: Generic server-side failures
   return jsonify({"error": "Failed to connect to database"}), 500
 
+@task_bp.route('/task/<int:id>/update-status', methods=['PUT'])
+@jwt_required()
+def update_task_status(id):
+  data = request.get_json()
+  return update_task_column(id, "status", data['status'])
+
+@task_bp.route('/task/<int:id>/update-priority', methods=['PUT'])
+@jwt_required()
+def update_task_priority(id):
+  data = request.get_json()
+  return update_task_column(id, "priority", data['priority'])
+
 @task_bp.route('/task/<int:id>/update-description', methods=['PUT'])
 @jwt_required()
 def update_task_description(id):
@@ -250,8 +292,10 @@ def update_task_description(id):
         if project:
           query_c = "UPDATE tasks SET description = %s WHERE id = %s"
           cursor.execute(query_c, (description, id))
+          record_changes(cursor, [change(task[1], "task", id, "upsert")])
           # Commit changes
           connection.commit()
+          publish_event(current_app.cache, task[1], "task.updated", id=id, description=description)
           # 200 OK: For a successful request
           return jsonify({"message": "Task updated successfully."}), 200
         else:
@@ -293,8 +337,12 @@ def delete_task(id):
         if project:
           query_c = "DELETE FROM tasks WHERE id = %s"
           cursor.execute(query_c, (id,))
+          record_changes(cursor, [change(task[1], "task", id, "delete")])
           # Commit changes
           connection.commit()
+          if current_app.task_writes:
+            current_app.task_writes.forget(id)
+          publish_event(current_app.cache, task[1], "task.deleted", id=id)
           # 200 OK: For a successful request
           return jsonify({"message": "Task deleted successfully."}), 200
         else:
@@ -1,17 +1,21 @@
 # user_routes.py
 
+import logging
 import mysql.connector
-from flask import Blueprint, jsonify, request, current_app
-from app import bcrypt
-from datetime import timedelta
+from flask import Blueprint, Response, jsonify, request, current_app
 from db import get_db_connection
 from flask_jwt_extended import (
-    jwt_required, get_jwt_identity, get_jwt, verify_jwt_in_request, 
+    jwt_required, get_jwt_identity, get_jwt,
     unset_jwt_cookies, set_access_cookies, set_refresh_cookies, 
     create_access_token, create_refresh_token
 )
 from helpers import hash_password, verify_password
-from routes.auth_routes import add_to_blocklist
+from routes.auth_routes import add_to_blocklist, get_request_jtis
+from export_stream import ExportStream, FORMATS as EXPORT_FORMATS
+from change_log import change, project_deleted, record_changes
+from project_events import publish_event
+
+logger = logging.getLogger(__name__)
 
 user_bp = Blueprint('user_bp', __name__)
 
@@ -62,7 +66,7 @@ def get_all_users():
 @jwt_required()
 def get_user():
     username = get_jwt_identity()
-    print(f"Fetching info for {username}...")
+    logger.debug("Fetching info for %s", username)
     connection = get_db_connection()
     if connection:
         cursor = connection.cursor()
@@ -122,7 +126,7 @@ def update_username():
                 stored_hash = user[3]
                 # print(f"stored hash: {stored_hash}")
                 # Check that current password matches stored password
-                if verify_password(current_password, stored_hash, bcrypt):
+                if verify_password(current_password, stored_hash):
                     # Check if new username already exists in table
                     query_b = "SELECT * FROM users WHERE username = %s"
                     cursor.execute(query_b, (new_username,))
@@ -137,27 +141,7 @@ def update_username():
                     connection.commit()
                     
                     # Logic from logout()
-                    try:
-                        # Try to verify the access token without requiring it
-                        verify_jwt_in_request(optional=True)
-                        access_token = get_jwt()
-                        if access_token:
-                            jti_access = access_token["jti"]
-                            add_to_blocklist(jti_access)
-                    except Exception:
-                        # Token might be expired, so skip blocklisting access token
-                        pass  
-
-                    try:
-                        # Try to verify the refresh token manually if present
-                        verify_jwt_in_request(optional=True, refresh=True)
-                        refresh_token = get_jwt(refresh=True)
-                        if refresh_token:
-                            jti_refresh = refresh_token["jti"]
-                            add_to_blocklist(jti_refresh)
-                    except Exception:
-                        # Token might be expired, so skip blocklisting refresh token
-                        pass  
+                    add_to_blocklist(get_request_jtis())
                     
                     response = jsonify({"message": "Logout successful"})
                     # Unset JWT cookies
@@ -211,9 +195,9 @@ def update_password():
                 stored_hash = user[3]
                 # print(f"stored hash: {stored_hash}")
                 # Check that current password matches stored password
-                if verify_password(current_password, stored_hash, bcrypt):
+                if verify_password(current_password, stored_hash):
                     # Hash new password
-                    hashed_new_password = hash_password(new_password, bcrypt)
+                    hashed_new_password = hash_password(new_password)
                     # Set new (hashed) password
                     query_b = "UPDATE users SET password = %s WHERE username = %s"
                     cursor.execute(query_b, (hashed_new_password, username,))
@@ -300,26 +284,61 @@ def delete_bio():
     # 500 Internal Server Error: Generic server-side failures
     return jsonify({"error": "Failed to connect to database"}), 500
 
+# EXPORT
+# The user's projects (owned and shared) with all their tasks, as a download:
+#   GET /user/export?format=ndjson|csv|json
+# Streamed from a single query and gzipped when the client accepts it.
+# Administrators may export another user with ?username=
+@user_bp.route('/user/export', methods=['GET'])
+@jwt_required()
+def export_user_data():
+    username = get_jwt_identity()
+    target = request.args.get('username', username)
+    if target != username and username not in current_app.config['ADMIN_USERS']:
+        # 403 Forbidden: Only administrators may export other users
+        return jsonify({"error": "Administrator access required"}), 403
+    format = request.args.get('format', 'ndjson')
+    if format not in EXPORT_FORMATS:
+        # 400 Bad Request: Unknown format
+        return jsonify({"error": f"format must be one of {', '.join(EXPORT_FORMATS)}"}), 400
+    slots = current_app.export_slots
+    if not slots.acquire(blocking=False):
+        # 503 Service Unavailable: Too many exports in progress
+        response = jsonify({"error": "Too many exports in progress, please try again"})
+        response.headers['Retry-After'] = "5"
+        return response, 503
+    connection = get_db_connection()
+    if not connection:
+        slots.release()
+        # 500 Internal Server Error: Generic server-side failures
+        return jsonify({"error": "Failed to connect to database"}), 500
+    gzip = request.accept_encodings['gzip'] > 0
+    writes = current_app.task_writes
+    body = ExportStream(
+        connection, slots, target, format, current_app.json.dumps,
+        fetch_rows=current_app.config['EXPORT_FETCH_ROWS'],
+        chunk_bytes=current_app.config['EXPORT_CHUNK_BYTES'],
+        gzip_level=current_app.config['EXPORT_GZIP_LEVEL'] if gzip else None,
+        merge=writes.merge if writes else None
+    )
+    # 200 OK: The export, streamed as it is read
+    response = Response(body, status=200, mimetype=EXPORT_FORMATS[format])
+    response.headers['Content-Disposition'] = f'attachment; filename="devstorm-export.{format}"'
+    response.headers['Vary'] = 'Accept-Encoding'
+    if gzip:
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
 # DELETE USER
 # TODO: Test this function's project deletion with respect to collaborators
 @user_bp.route('/user/delete', methods=['DELETE'])
 @jwt_required()
 def delete_user():
     username = get_jwt_identity()
-    # Mimic logout. Get current access token's jti
-    jti = get_jwt()['jti']
-    current_app.blocklist.set(jti, "", ex=timedelta(minutes=30))
+    # Mimic logout. Blocklist the current access token's jti, and the refresh
+    # token's if present
+    add_to_blocklist({get_jwt()['jti']: get_jwt()['exp'], **get_request_jtis()})
     connection = get_db_connection()
-    try:
-        # Try to verify the refresh token if present
-        verify_jwt_in_request(optional=True, refresh=True)
-        refresh_token = get_jwt(refresh=True)
-        if refresh_token:
-            jti_refresh = refresh_token["jti"]
-            current_app.blocklist.set(jti_refresh, "", ex=timedelta(minutes=30))
-    except Exception:
-        # Token might be expired, so skip blocklisting refresh token
-        pass 
     
     response = jsonify({"message": "User deleted successfully."})
     unset_jwt_cookies(response)
@@ -338,6 +357,9 @@ def delete_user():
                 query_b = "SELECT * FROM projects WHERE owner = %s"
                 cursor.execute(query_b, (username,))
                 projects = cursor.fetchall()
+                deleted_pids = []
+                deleted_task_ids = []
+                left_pids = []
                 # Check owned projects first
                 for project in projects:
                     pid = project[0]
@@ -356,14 +378,20 @@ def delete_user():
                         cursor.execute(query_c, (collaborator,))
                         if project_completed:
                             # Decrement collaborator's project_completed count
-                            query_d = "UPDATE users SET projects_completed = project_completed - 1 WHERE username = %s"
+                            query_d = "UPDATE users SET projects_completed = projects_completed - 1 WHERE username = %s"
                             cursor.execute(query_d, (collaborator,)) 
+                    if current_app.task_writes:
+                        cursor.execute("SELECT id FROM tasks WHERE pid = %s", (pid,))
+                        deleted_task_ids += [row[0] for row in cursor.fetchall()]
                     # Delete tasks before project, as they are linked to project through pid 
                     query_e = "DELETE FROM tasks where pid = %s"
                     cursor.execute(query_e, (pid,))
                     # Delete project
                     query_f = "DELETE FROM projects WHERE id = %s"
                     cursor.execute(query_f, (pid,))
+                    # Tell the collaborators' /sync the project is gone
+                    record_changes(cursor, project_deleted(pid, collaborator1, collaborator2))
+                    deleted_pids.append(pid)
                 # Next, check if the user has collabed on any projects
                 if user_project_count > len(projects):
                     # Compile a list of projects where user is listed as a collaborator
@@ -384,12 +412,27 @@ def delete_user():
                             cursor.execute(query_i, (pid,))
                         if collaborator2 == username:
                             query_j = "UPDATE projects SET collaborator2 = NULL WHERE id = %s"
-                            cursor.execute(query_j, (username,))
+                            cursor.execute(query_j, (pid,))
+                        # The rest of the team sees the collaborator slot emptied
+                        record_changes(cursor, [change(pid, "project", pid, "upsert")])
+                        left_pids.append(pid)
             # Finally, delete user
             query_k = "DELETE FROM users WHERE username = %s"
             cursor.execute(query_k, (username,))
             # Commit changes
             connection.commit()
+            if user_project_count != 0:
+                if current_app.task_writes:
+                    # Queued updates and cached owners of the deleted tasks
+                    current_app.task_writes.forget(*deleted_task_ids)
+                for pid in deleted_pids:
+                    try:
+                        current_app.idea_index.remove(pid)
+                    except Exception as e:
+                        logger.error("Error removing project %s from the idea index: %s", pid, e)
+                    publish_event(current_app.cache, pid, "project.deleted")
+                for pid in left_pids:
+                    publish_event(current_app.cache, pid, "project.updated", collaborator_removed=username)
             # 200 OK: For a successful request
             return response, 200
         except mysql.connector.Error as e:
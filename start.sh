@@ -30,5 +30,9 @@ fi
 
 # run redis-server in the background
 redis-server &
-# Run Flask application
-flask run 
\ No newline at end of file
+# Run Flask application: the development server with --dev, gunicorn otherwise
+if [[ $1 == "--dev" ]]; then
+    flask run
+else
+    exec gunicorn -c gunicorn.conf.py main:app
+fi
@@ -0,0 +1,274 @@
+# task_writes.py
+# Write coalescing for task status and priority. With TASK_WRITES_COALESCE on,
+# PUT /task/<id>/update-status and /update-priority are acknowledged once the
+# new value is in Redis; a background flusher applies whatever accumulated to
+# MySQL every TASK_WRITES_FLUSH_MS, as one multi-row UPDATE per column. A
+# task whose status is dragged across the board ten times in a second costs
+# one row update. Task reads overlay the values still waiting to be flushed,
+# so clients see their own writes immediately.
+#
+# Redis keys (in the cache database):
+#   tasks:pending    hash "<task id>:<column>" -> {"pid", "value", "ts"}. A
+#                    later write to the same task and column replaces the
+#                    earlier one (last write wins)
+#   tasks:flushing   the pending hash as taken by the flusher; deleted once
+#                    its updates are committed, so a crashed flush is redone
+#   tasks:flusher    held by the process currently flushing
+#   tasks:owner:<id> "<pid>:<owner>" of a task, so queued writes need no
+#                    MySQL round-trip for authorization
+#
+# Durability: an acknowledged write survives what Redis survives (its
+# persistence settings). TASK_WRITES_WAIT_REPLICAS > 0 also waits for that
+# many replicas to confirm, writing straight to MySQL when they do not. Past
+# TASK_WRITES_MAX_PENDING queued updates, and whenever Redis fails, updates
+# are written straight to MySQL as before.
+#
+# Ordering: tasks.status_ts and tasks.priority_ts hold the time the current
+# value was acknowledged. Direct writes set them (update_statement), and the
+# flusher only applies a queued value that is newer, so an update queued
+# before a direct write (still pending after a Redis blip, or taken by a
+# flush already under way) never overwrites it. Times come from the app
+# servers' clocks, which are assumed to agree to well within a user's
+# successive clicks. Deleting a task or project forgets its queued updates
+# and cached owner; anything a flush already read for it updates nothing and
+# records no change row.
+
+import json
+import logging
+import threading
+import time
+import uuid
+import mysql.connector
+import redis
+from db import get_db_connection
+from change_log import change, record_changes
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = "tasks:pending"
+FLUSHING_KEY = "tasks:flushing"
+FLUSHER_KEY = "tasks:flusher"
+OWNER_KEY = "tasks:owner:{}"
+
+COLUMNS = ("status", "priority")
+
+# SQL and arguments writing `column` = `value` to task `id` directly. Status
+# and priority also record when, so older queued values are not applied over it
+def update_statement(id, column, value):
+  if column in COLUMNS:
+    return f"UPDATE tasks SET {column} = %s, {column}_ts = %s WHERE id = %s", (value, time.time(), id)
+  return f"UPDATE tasks SET {column} = %s WHERE id = %s", (value, id)
+
+class TaskWrites:
+  def __init__(self, app, cache, flush_ms=500, batch_size=500, max_pending=50000,
+               wait_replicas=0, wait_ms=50, owner_ttl=300):
+    self.app = app
+    self.cache = cache
+    self.interval = flush_ms / 1000
+    # Updates applied per MySQL transaction
+    self.batch_size = batch_size
+    self.max_pending = max_pending
+    self.wait_replicas = wait_replicas
+    self.wait_ms = wait_ms
+    # Seconds a task's project and owner are cached
+    self.owner_ttl = owner_ttl
+    self.stats = {"queued": 0, "write_through": 0, "redis_errors": 0, "flushes": 0, "flushed": 0,
+                  "flush_errors": 0, "last_flush_lag_seconds": 0.0, "max_flush_lag_seconds": 0.0}
+    self._token = uuid.uuid4().hex
+    self._stop = threading.Event()
+    self._thread = None
+
+  # (pid, owner) of task `id` if cached, else None
+  def owner(self, id):
+    try:
+      cached = self.cache.get(OWNER_KEY.format(id))
+    except redis.RedisError as e:
+      self._redis_failed(e)
+      return None
+    if cached is None:
+      return None
+    pid, owner = cached.split(":", 1)
+    return int(pid), owner
+
+  def remember_owner(self, id, pid, owner):
+    try:
+      self.cache.set(OWNER_KEY.format(id), f"{pid}:{owner}", ex=self.owner_ttl)
+    except redis.RedisError as e:
+      self._redis_failed(e)
+
+  # Queue `column` = `value` for task `id` of project `pid`. Returns False if
+  # the caller must write it to MySQL itself
+  def queue(self, pid, id, column, value):
+    field = f"{id}:{column}"
+    entry = json.dumps({"pid": pid, "value": value, "ts": time.time()})
+    try:
+      if self.cache.hlen(PENDING_KEY) >= self.max_pending:
+        # Too far behind: drop any queued value so it cannot overwrite this one
+        self.cache.hdel(PENDING_KEY, field)
+        self.stats["write_through"] += 1
+        return False
+      self.cache.hset(PENDING_KEY, field, entry)
+      if self.wait_replicas and self.cache.wait(self.wait_replicas, self.wait_ms) < self.wait_replicas:
+        # Not on enough replicas yet; the queued copy is written again later
+        self.stats["write_through"] += 1
+        return False
+    except redis.RedisError as e:
+      self._redis_failed(e)
+      return False
+    self.stats["queued"] += 1
+    return True
+
+  # The tasks are gone: drop their queued updates, including those taken by a
+  # flush under way, and their cached owners
+  def forget(self, *ids):
+    if not ids:
+      return
+    fields = [f"{id}:{column}" for id in ids for column in COLUMNS]
+    try:
+      pipe = self.cache.pipeline(transaction=False)
+      pipe.hdel(PENDING_KEY, *fields)
+      pipe.hdel(FLUSHING_KEY, *fields)
+      pipe.delete(*(OWNER_KEY.format(id) for id in ids))
+      pipe.execute()
+    except redis.RedisError as e:
+      self._redis_failed(e)
+
+  # Overlay queued values on task dicts ({"id", "status", "priority", ...}),
+  # in place. Values being flushed are older than those still pending
+  def merge(self, tasks):
+    if not tasks:
+      return tasks
+    fields = [f"{task['id']}:{column}" for task in tasks for column in COLUMNS]
+    try:
+      pipe = self.cache.pipeline(transaction=False)
+      pipe.hmget(FLUSHING_KEY, fields)
+      pipe.hmget(PENDING_KEY, fields)
+      flushing, pending = pipe.execute()
+    except redis.RedisError as e:
+      self._redis_failed(e)
+      return tasks
+    for values in (flushing, pending):
+      for i, raw in enumerate(values):
+        if raw is not None:
+          task = tasks[i // len(COLUMNS)]
+          task[COLUMNS[i % len(COLUMNS)]] = json.loads(raw)["value"]
+    return tasks
+
+  def _redis_failed(self, error):
+    self.stats["redis_errors"] += 1
+    logger.warning("Task writes: Redis error, writing to MySQL directly: %s", error)
+
+  # Hold (or renew) the flusher lock. Returns True if this process flushes
+  def _hold_lock(self):
+    if self.cache.set(FLUSHER_KEY, self._token, nx=True, ex=30):
+      return True
+    if self.cache.get(FLUSHER_KEY) == self._token:
+      self.cache.expire(FLUSHER_KEY, 30)
+      return True
+    return False
+
+  # Apply [(id, column, pid, value, ts)] in one transaction. A value is only
+  # written over one acknowledged earlier, and only tasks that still exist get
+  # a change row: an "upsert" after a task's "delete" would bring it back for
+  # /sync clients
+  def _apply(self, updates):
+    connection = get_db_connection()
+    if not connection:
+      raise mysql.connector.Error("Failed to connect to database")
+    cursor = connection.cursor()
+    try:
+      tasks = {id: pid for id, _, pid, _, _ in updates}
+      # Lock the rows that are left, so none is deleted before the commit
+      cursor.execute(f"SELECT id FROM tasks WHERE id IN ({', '.join(['%s'] * len(tasks))}) FOR UPDATE",
+                     tuple(tasks))
+      existing = {row[0] for row in cursor.fetchall()}
+      updates = [update for update in updates if update[0] in existing]
+      for column in COLUMNS:
+        rows = [(id, value, ts) for id, update_column, _, value, ts in updates if update_column == column]
+        if not rows:
+          continue
+        version = f"{column}_ts"
+        # Assignments run left to right: the value's CASE sees the old version
+        values = " ".join([f"WHEN %s THEN IF(COALESCE({version}, 0) < %s, %s, {column})"] * len(rows))
+        versions = " ".join([f"WHEN %s THEN GREATEST(COALESCE({version}, 0), %s)"] * len(rows))
+        ids = ", ".join(["%s"] * len(rows))
+        cursor.execute(
+          f"UPDATE tasks SET {column} = CASE id {values} END, {version} = CASE id {versions} END "
+          f"WHERE id IN ({ids})",
+          tuple(arg for id, value, ts in rows for arg in (id, ts, value))
+          + tuple(arg for id, _, ts in rows for arg in (id, ts))
+          + tuple(id for id, _, _ in rows)
+        )
+      record_changes(cursor, [change(pid, "task", id, "upsert") for id, pid in tasks.items() if id in existing])
+      connection.commit()
+    except mysql.connector.Error:
+      connection.rollback()
+      raise
+    finally:
+      cursor.close()
+      connection.close()
+
+  # Take everything pending and write it to MySQL. Returns updates applied
+  def flush(self):
+    # A leftover tasks:flushing is a flush that never finished: redo it first
+    if not self.cache.exists(FLUSHING_KEY):
+      try:
+        self.cache.rename(PENDING_KEY, FLUSHING_KEY)
+      except redis.ResponseError:
+        # Nothing pending
+        return 0
+    updates = []
+    for field, raw in self.cache.hgetall(FLUSHING_KEY).items():
+      id, column = field.split(":", 1)
+      entry = json.loads(raw)
+      updates.append((int(id), column, entry["pid"], entry["value"], entry["ts"]))
+    for start in range(0, len(updates), self.batch_size):
+      self._apply(updates[start:start + self.batch_size])
+    self.cache.delete(FLUSHING_KEY)
+    if updates:
+      # Seconds from acknowledging a write to committing it
+      now = time.time()
+      lag = max(now - ts for _, _, _, _, ts in updates)
+      self.stats["flushes"] += 1
+      self.stats["flushed"] += len(updates)
+      self.stats["last_flush_lag_seconds"] = round(lag, 3)
+      self.stats["max_flush_lag_seconds"] = max(self.stats["max_flush_lag_seconds"], round(lag, 3))
+    return len(updates)
+
+  def run(self):
+    with self.app.app_context():
+      while not self._stop.wait(self.interval):
+        try:
+          if self._hold_lock():
+            self.flush()
+        except Exception as e:
+          # Pending updates stay in Redis and are retried on the next tick
+          self.stats["flush_errors"] += 1
+          logger.warning("Task writes: flush failed: %s", e)
+          self._stop.wait(1)
+      try:
+        if self._hold_lock():
+          self.flush()
+          self.cache.delete(FLUSHER_KEY)
+      except Exception as e:
+        logger.warning("Task writes: final flush failed: %s", e)
+
+  def start(self):
+    if self._thread is None or not self._thread.is_alive():
+      self._stop.clear()
+      self._thread = threading.Thread(target=self.run, name="task-writes", daemon=True)
+      self._thread.start()
+
+  def stop(self):
+    self._stop.set()
+
+  # Queued updates and flush counters
+  def get_stats(self):
+    try:
+      pipe = self.cache.pipeline(transaction=False)
+      pipe.hlen(PENDING_KEY)
+      pipe.hlen(FLUSHING_KEY)
+      pending, flushing = pipe.execute()
+    except redis.RedisError:
+      pending = flushing = None
+    return {"pending": pending, "flushing": flushing, **self.stats}
@@ -0,0 +1,132 @@
+# test_circuit_breaker.py
+# CircuitBreaker state transitions, and the breaker as driven by
+# create_chat_completion when the half-open probe hits a non-retryable error.
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import groq
+import httpx
+import pytest
+import ai_client
+from ai_client import CircuitBreaker
+
+class Clock:
+  def __init__(self):
+    self.now = 1000.0
+
+  def __call__(self):
+    return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+  clock = Clock()
+  monkeypatch.setattr(ai_client.time, "monotonic", clock)
+  return clock
+
+# A breaker that has just opened after `threshold` failures
+def opened(threshold=3, reset_timeout=30):
+  breaker = CircuitBreaker(threshold, reset_timeout)
+  for _ in range(threshold):
+    assert breaker.allow_request()
+    breaker.record_failure()
+  assert breaker.state == CircuitBreaker.OPEN
+  return breaker
+
+# A breaker in half-open state whose single probe has been let through
+def probing(clock):
+  breaker = opened()
+  clock.now += 30
+  assert breaker.allow_request()
+  assert breaker.state == CircuitBreaker.HALF_OPEN
+  return breaker
+
+def test_closed_until_threshold(clock):
+  breaker = CircuitBreaker(3, 30)
+  breaker.record_failure()
+  breaker.record_failure()
+  assert breaker.state == CircuitBreaker.CLOSED
+  assert breaker.allow_request()
+  breaker.record_failure()
+  assert breaker.state == CircuitBreaker.OPEN
+  assert breaker.snapshot()["times_opened"] == 1
+
+def test_success_resets_failure_count(clock):
+  breaker = CircuitBreaker(3, 30)
+  breaker.record_failure()
+  breaker.record_failure()
+  breaker.record_success()
+  breaker.record_failure()
+  assert breaker.state == CircuitBreaker.CLOSED
+
+def test_open_rejects_until_reset_timeout(clock):
+  breaker = opened()
+  assert not breaker.allow_request()
+  assert breaker.retry_after() == 30
+  clock.now += 29
+  assert not breaker.allow_request()
+  assert breaker.retry_after() == pytest.approx(1)
+
+def test_half_open_lets_one_probe_through(clock):
+  breaker = probing(clock)
+  assert not breaker.allow_request()
+  assert breaker.retry_after() == 0
+
+def test_half_open_probe_success_closes(clock):
+  breaker = probing(clock)
+  breaker.record_success()
+  assert breaker.state == CircuitBreaker.CLOSED
+  assert breaker.allow_request()
+  assert breaker.snapshot()["consecutive_failures"] == 0
+
+def test_half_open_probe_failure_reopens(clock):
+  breaker = probing(clock)
+  breaker.record_failure()
+  assert breaker.state == CircuitBreaker.OPEN
+  assert breaker.snapshot()["times_opened"] == 2
+  assert not breaker.allow_request()
+  clock.now += 30
+  assert breaker.allow_request()
+
+def test_half_open_released_probe_lets_next_call_probe(clock):
+  breaker = probing(clock)
+  breaker.release_probe()
+  assert breaker.state == CircuitBreaker.HALF_OPEN
+  assert breaker.allow_request()
+  assert not breaker.allow_request()
+
+def test_release_probe_outside_half_open_does_nothing(clock):
+  breaker = opened()
+  breaker.release_probe()
+  assert breaker.state == CircuitBreaker.OPEN
+  assert not breaker.allow_request()
+
+def bad_request():
+  request = httpx.Request("POST", "https://api.groq.com/openai/v1/chat/completions")
+  response = httpx.Response(400, request=request)
+  return groq.BadRequestError("bad request", response=response, body=None)
+
+class FailingClient:
+  def __init__(self, error):
+    self.error = error
+    self.chat = self
+    self.completions = self
+
+  def with_options(self, **kwargs):
+    return self
+
+  def create(self, **kwargs):
+    raise self.error
+
+def test_non_retryable_probe_does_not_wedge_breaker(clock, monkeypatch):
+  breaker = probing(clock)
+  # Hand the probe back so create_chat_completion takes it itself
+  breaker.release_probe()
+  monkeypatch.setattr(ai_client, "breaker", breaker)
+  monkeypatch.setattr(ai_client, "get_client", lambda: FailingClient(bad_request()))
+  with pytest.raises(groq.BadRequestError):
+    ai_client.create_chat_completion([{"role": "user", "content": "hi"}])
+  assert breaker.state == CircuitBreaker.HALF_OPEN
+  assert breaker.allow_request()
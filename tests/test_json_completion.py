@@ -0,0 +1,88 @@
+# test_json_completion.py
+# Output Groq rejects in JSON mode (400 json_validate_failed) goes through the
+# same tolerant parser and re-prompt as output it returns, and task generation
+# output with no tasks counts as a failed generation.
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import groq
+import httpx
+import pytest
+from ai_output import parse_project_idea, parse_tasks_lists, AIOutputError
+from routes import ai_routes
+
+# Truncated mid-list: the local repair closes it
+TRUNCATED_IDEA = ('{"project_title": "Habit tracker", "description": "Track habits",'
+                  ' "languages": ["Python"], "steps": ["Build it"], "scale_up_ideas": ["Sync')
+
+VALID_IDEA = ('{"project_title": "Habit tracker", "description": "Track habits",'
+              ' "languages": ["Python"], "steps": ["Build it"], "scale_up_ideas": ["Sync"]}')
+
+def bad_request(code, failed_generation=None):
+  request = httpx.Request("POST", "https://api.groq.com/openai/v1/chat/completions")
+  response = httpx.Response(400, request=request)
+  body = {"error": {"message": "Failed to generate JSON", "type": "invalid_request_error", "code": code}}
+  if failed_generation is not None:
+    body["error"]["failed_generation"] = failed_generation
+  return groq.BadRequestError("bad request", response=response, body=body)
+
+class Completion:
+  def __init__(self, content):
+    message = type("Message", (), {"content": content})
+    self.choices = [type("Choice", (), {"message": message})]
+
+# Stands in for create_chat_completion: raises or returns each outcome in turn
+class Scripted:
+  def __init__(self, *outcomes):
+    self.outcomes = list(outcomes)
+    self.calls = []
+
+  def __call__(self, **kwargs):
+    self.calls.append(kwargs)
+    outcome = self.outcomes.pop(0)
+    if isinstance(outcome, Exception):
+      raise outcome
+    return Completion(outcome)
+
+def test_rejected_output_is_repaired_locally(monkeypatch):
+  scripted = Scripted(bad_request("json_validate_failed", TRUNCATED_IDEA))
+  monkeypatch.setattr(ai_routes, "create_chat_completion", scripted)
+  idea = ai_routes.complete_and_parse([{"role": "user", "content": "idea"}], parse_project_idea, "project_idea")
+  assert idea.scale_up_ideas == ["Sync"]
+  assert len(scripted.calls) == 1
+
+def test_unrepairable_rejected_output_is_reprompted(monkeypatch):
+  scripted = Scripted(bad_request("json_validate_failed", "Sure! Here is your idea."), VALID_IDEA)
+  monkeypatch.setattr(ai_routes, "create_chat_completion", scripted)
+  idea = ai_routes.complete_and_parse([{"role": "user", "content": "idea"}], parse_project_idea, "project_idea")
+  assert idea.project_title == "Habit tracker"
+  assert scripted.calls[1]["endpoint"] == "project_idea_repair"
+  assert "Sure! Here is your idea." in scripted.calls[1]["messages"][-2]["content"]
+
+def test_rejected_repair_is_parsed_too(monkeypatch):
+  scripted = Scripted(bad_request("json_validate_failed", "no json"), bad_request("json_validate_failed", "still none"))
+  monkeypatch.setattr(ai_routes, "create_chat_completion", scripted)
+  with pytest.raises(AIOutputError):
+    ai_routes.complete_and_parse([{"role": "user", "content": "idea"}], parse_project_idea, "project_idea")
+
+def test_other_bad_requests_propagate(monkeypatch):
+  scripted = Scripted(bad_request("model_decommissioned"))
+  monkeypatch.setattr(ai_routes, "create_chat_completion", scripted)
+  with pytest.raises(groq.BadRequestError):
+    ai_routes.complete_and_parse([{"role": "user", "content": "idea"}], parse_project_idea, "project_idea")
+
+def test_empty_tasks_lists_are_reprompted(monkeypatch):
+  tasks = '{"tasks_lists": [{"title": "Step 1", "tasks": ["Set up the repo"]}]}'
+  scripted = Scripted('{"tasks_lists": []}', tasks)
+  monkeypatch.setattr(ai_routes, "create_chat_completion", scripted)
+  tasks_lists = ai_routes.complete_and_parse([{"role": "user", "content": "tasks"}], parse_tasks_lists, "taskgen")
+  assert tasks_lists == [{"title": "Step 1", "tasks": ["Set up the repo"]}]
+  assert scripted.calls[1]["endpoint"] == "taskgen_repair"
+
+def test_tasks_lists_without_tasks_fail(monkeypatch):
+  scripted = Scripted("[]", '{"tasks_lists": [{"title": "Step 1", "tasks": []}]}')
+  monkeypatch.setattr(ai_routes, "create_chat_completion", scripted)
+  assert ai_routes.prompt_ai_to_generate_tasks("tasks") is None